@@ -1,12 +1,11 @@
 import sys
 import os
-from PyQt5.QtWidgets import QApplication, QMainWindow, QHBoxLayout, QVBoxLayout, QWidget, QStackedWidget, QPushButton
+from PyQt5.QtWidgets import QApplication, QMainWindow, QHBoxLayout, QVBoxLayout, QWidget, QStackedWidget, QPushButton, QProgressBar
 from PyQt5.QtGui import QIcon
-from src.widgets.piechart import PieChartWidget
-from src.widgets.chatbox import ChatboxWidget
+from PyQt5.QtCore import QThread, QTimer
 from src.widgets.tradebook_table import TradeBookTable
 from src.widgets.welcome import WelcomeWidget
-from src.lib.controller import Controller
+from src.lib.controller_worker import ControllerWorker
 from src.widgets.holdings import HoldingsWidget
 
 
@@ -17,8 +16,6 @@ class MainWindow(QMainWindow):
         self.setGeometry(100, 100, 1920, 1080)
         self.setWindowIcon(QIcon("assets/portfolio360.webp"))  # Set application icon
 
-        self.controller = Controller()
-
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
         main_layout = QVBoxLayout(central_widget)
@@ -37,14 +34,37 @@ class MainWindow(QMainWindow):
         self.pages = QStackedWidget()
         main_layout.addWidget(self.pages)
 
-        # Page 1: HoldingsWidget
+        # Page 1: HoldingsWidget, populated once the holdings are computed
         self.holdings_widget = HoldingsWidget()
-        self.holdings_widget.set_holdings(self.controller.current_holdings, self.controller.past_holdings)
         self.pages.addWidget(self.holdings_widget)
 
-        # Page 2: Dashboard (existing widgets)
-        dashboard_page = QWidget()
-        dashboard_layout = QHBoxLayout(dashboard_page)
+        # Page 2: Dashboard, built when it is first shown since its charts and web view are slow to import
+        self.dashboard_page = None
+        self.tradebook_table = None
+        self.tradebook = None       # Latest tradebook from the pipeline, shown once the dashboard is built
+
+        # Show HoldingsWidget by default
+        self.pages.setCurrentWidget(self.holdings_widget)
+
+        # Progress of the controller pipeline
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumWidth(300)
+        self.progress_bar.setRange(0, 0)    # Busy until the number of symbols is known
+        self.statusBar().addPermanentWidget(self.progress_bar)
+        self.statusBar().showMessage("Loading tradebook...")
+        self.worker_thread = None
+        self.closing = False        # Set once the window was closed while the pipeline was running
+        QTimer.singleShot(0, self.start_pipeline)   # Once the event loop runs, so its imports do not hold up the first window
+
+    def build_dashboard_page(self):
+        """
+        Build the dashboard page and add it to the pages, importing its widgets on first use.
+        """
+        from src.widgets.piechart import PieChartWidget
+        from src.widgets.chatbox import ChatboxWidget
+
+        self.dashboard_page = QWidget()
+        dashboard_layout = QHBoxLayout(self.dashboard_page)
 
         # Left layout for PieChartWidget and ChatboxWidget
         left_layout = QVBoxLayout()
@@ -65,22 +85,87 @@ class MainWindow(QMainWindow):
         right_layout = QHBoxLayout()
         dashboard_layout.addLayout(right_layout)
 
-        # Add TradeBookTable
+        # Add TradeBookTable, populated with the latest tradebook from the pipeline
         self.tradebook_table = TradeBookTable()
-        sample_trades = self.controller.adjusted_tradebook
-        self.tradebook_table.populateTable(sample_trades)
         right_layout.addWidget(self.tradebook_table)
-
-        self.pages.addWidget(dashboard_page)
-
-        # Show HoldingsWidget by default
-        self.pages.setCurrentWidget(self.holdings_widget)
+        if self.tradebook is not None:
+            self.tradebook_table.populateTable(self.tradebook)
+
+        self.pages.addWidget(self.dashboard_page)
+
+    def start_pipeline(self):
+        """
+        Run the controller pipeline on a worker thread, the pages are populated as its stages complete.
+        """
+        self.worker_thread = QThread(self)
+        self.worker = ControllerWorker()
+        self.worker.moveToThread(self.worker_thread)
+        self.worker_thread.started.connect(self.worker.run)
+        self.worker.tradebook_loaded.connect(self.on_tradebook_loaded)
+        self.worker.market_data_progress.connect(self.on_market_data_progress)
+        self.worker.index_loaded.connect(self.on_index_loaded)
+        self.worker.holdings_computed.connect(self.on_holdings_computed)
+        self.worker.failed.connect(self.on_pipeline_failed)
+        self.worker.finished.connect(self.worker_thread.quit)
+        self.worker_thread.start()
+
+    def on_tradebook_loaded(self, tradebook):
+        self.show_tradebook(tradebook)
+        self.statusBar().showMessage("Loading market data...")
+
+    def on_market_data_progress(self, done: int, total: int):
+        self.progress_bar.setRange(0, total)
+        self.progress_bar.setValue(done)
+        self.statusBar().showMessage(f"Loading market data {done}/{total}...")
+
+    def on_index_loaded(self):
+        self.progress_bar.setRange(0, 0)
+        self.statusBar().showMessage("Computing holdings...")
+
+    def on_holdings_computed(self, current_holdings, past_holdings, adjusted_tradebook):
+        self.holdings_widget.set_holdings(current_holdings, past_holdings)
+        self.show_tradebook(adjusted_tradebook)     # Adds the bonus shares of stock splits
+        self.progress_bar.hide()
+        self.statusBar().clearMessage()
+
+    def show_tradebook(self, tradebook):
+        self.tradebook = tradebook
+        if self.tradebook_table is not None:
+            self.tradebook_table.populateTable(tradebook)
+
+    def on_pipeline_failed(self, message: str):
+        if self.closing:
+            return
+        self.progress_bar.hide()
+        self.statusBar().showMessage(f"Error loading portfolio: {message}")
+
+    def closeEvent(self, event):
+        # The thread must not be destroyed while the pipeline runs. Cancel it and close once it has
+        # finished its current step, rather than blocking the event loop until then.
+        if self.worker_thread is not None and self.worker_thread.isRunning():
+            if not self.closing:
+                self.closing = True
+                self.worker.cancel()
+                self.worker_thread.finished.connect(self.close_after_pipeline)
+                self.centralWidget().setEnabled(False)
+                self.progress_bar.setRange(0, 0)
+                self.progress_bar.show()
+                self.statusBar().showMessage("Finishing the current step before closing...")
+            event.ignore()
+            return
+        super().closeEvent(event)
+
+    def close_after_pipeline(self):
+        self.worker_thread.wait()   # finished is emitted right before the thread ends, so this returns at once
+        self.close()
 
     def show_holdings_page(self):
         self.pages.setCurrentWidget(self.holdings_widget)
 
     def show_dashboard_page(self):
-        self.pages.setCurrentIndex(1)  # Dashboard is the second page
+        if self.dashboard_page is None:
+            self.build_dashboard_page()
+        self.pages.setCurrentWidget(self.dashboard_page)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,49 @@
+"""
+Benchmark the bulk market data writes against the previous row-by-row inserts.
+Run from the repository root:
+    python -m benchmarks.bench_bulk_writes [years]
+"""
+import os
+import sys
+import time
+import tempfile
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_index_frame
+
+def legacy_insert_index_into_db(index_data: pd.DataFrame):
+    """
+    The previous row-by-row insert, kept here as the benchmark baseline.
+    """
+    from src.database.connection import connect, now
+    connection, cursor = connect()
+    cursor.execute("CREATE TABLE IF NOT EXISTS IndexData (date DATE PRIMARY KEY, nifty50 REAL, bsesensex REAL, niftybank REAL, fetched_at TEXT)")
+    fetched_at = now()
+    for _, row in index_data.iterrows():
+        cursor.execute("""
+            INSERT OR REPLACE INTO IndexData (
+                date, nifty50, bsesensex, niftybank, fetched_at
+            ) VALUES (?, ?, ?, ?, ?)
+        """, (row['date'].strftime("%Y-%m-%d"), row['nifty50'], row['bsesensex'], row['niftybank'], fetched_at))
+    cursor.close()
+
+def timed(label: str, func, *args):
+    start = time.perf_counter()
+    func(*args)
+    print(f"{label:<8} {(time.perf_counter() - start) * 1000:8.1f}ms")
+
+if __name__ == "__main__":
+    years = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    index_data = synthetic_index_frame(years)
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, "metadata"))
+        os.chdir(directory)
+
+        from src.database import create_tables
+        from src.database.index import upsert_index_frame, get_index_from_db
+        create_tables()
+        print(f"{len(index_data)} index rows")
+        timed("legacy", legacy_insert_index_into_db, index_data)
+        timed("bulk", upsert_index_frame, index_data)
+        timed("rerun", upsert_index_frame, index_data)
+        assert len(get_index_from_db()) == len(index_data)
@@ -0,0 +1,44 @@
+"""
+Measure starting the controller cold, warm without the snapshot (every stage reads its caches and the
+database) and warm from the snapshot, with unchanged tradebook files and fresh market data.
+Run from the repository root:
+    python -m benchmarks.bench_controller_snapshot [rows] [symbols]
+"""
+import io
+import os
+import sys
+import json
+import time
+import tempfile
+import contextlib
+import pandas as pd
+
+from benchmarks.synthetic import write_synthetic_tradebook, write_synthetic_fixtures
+
+def timed_start(label: str, use_snapshot: bool):
+    from src.lib.controller import Controller
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        controller = Controller(refresh=False)
+        controller.refresh(use_snapshot=use_snapshot)
+    print(f"{label:<18} {time.perf_counter() - start:8.3f}s  {len(controller.current_holdings)} current holdings")
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    number_of_symbols = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    with tempfile.TemporaryDirectory() as directory:
+        write_synthetic_fixtures(os.path.join(directory, "fixtures"), [f"SYM{ind}" for ind in range(number_of_symbols)])
+        os.environ["PORTFOLIO360_MARKET_DATA_FIXTURES"] = os.path.join(directory, "fixtures")
+        os.makedirs(os.path.join(directory, "metadata"))
+        os.chdir(directory)
+
+        write_synthetic_tradebook("tradebook.csv", rows, symbols=number_of_symbols)
+        pd.DataFrame({'Instrument': [], 'Qty.': [], 'Avg. cost': []}).to_csv("holdings.csv", index=False)
+        with open("metadata/user_data.json", "w") as json_file:
+            json.dump({"name": "", "email": "", "tradebook": [os.path.join(directory, "tradebook.csv")], "manual_tradebook": "", "holdings": "holdings.csv"}, json_file)
+
+        from src.lib.controller_snapshot import CONTROLLER_SNAPSHOT_PATH
+        timed_start("cold", use_snapshot=False)
+        timed_start("warm, no snapshot", use_snapshot=False)
+        timed_start("warm, snapshot", use_snapshot=True)
+        print(f"snapshot size {os.path.getsize(CONTROLLER_SNAPSHOT_PATH) / 2 ** 20:.1f} MB")
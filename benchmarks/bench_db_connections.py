@@ -0,0 +1,56 @@
+"""
+Measure a warm start of get_stock_info_store: the batched reads over shared per-thread connections,
+against reading every symbol with its own queries, and against opening a new connection for every DAO call.
+Run from the repository root:
+    python -m benchmarks.bench_db_connections [symbols]
+"""
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+
+from benchmarks.synthetic import write_synthetic_fixtures
+
+def legacy_connect(database: str = None):
+    """
+    The previous connect(), which opened a fresh connection on every call.
+    """
+    from src.database.connection import MARKET_DATA_DATABASE
+    connection = sqlite3.connect(database or MARKET_DATA_DATABASE, autocommit=True)
+    return connection, connection.cursor()
+
+def count_opens():
+    opened = []
+    original_connect = sqlite3.connect
+    def counting_connect(*args, **kwargs):
+        opened.append(args[0])
+        return original_connect(*args, **kwargs)
+    sqlite3.connect = counting_connect
+    return opened
+
+def timed_warm_start(label: str, load, symbols: list):
+    opened = count_opens()
+    start = time.perf_counter()
+    load(symbols)
+    print(f"{label:<10} {time.perf_counter() - start:8.3f}s  {len(opened)} connections opened")
+
+if __name__ == "__main__":
+    number_of_symbols = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    symbols = [f"SYM{ind}" for ind in range(number_of_symbols)]
+    with tempfile.TemporaryDirectory() as directory:
+        write_synthetic_fixtures(os.path.join(directory, "fixtures"), symbols)
+        os.environ["PORTFOLIO360_MARKET_DATA_FIXTURES"] = os.path.join(directory, "fixtures")
+        os.makedirs(os.path.join(directory, "metadata"))
+        os.chdir(directory)
+
+        from src.database import create_tables, dividend, fetch_log, stock_info, stock_split
+        from src.lib.get_stock_info import get_stock_info_store, get_stock_info
+        create_tables()
+        get_stock_info_store(symbols)   # Cold start fills the database
+
+        timed_warm_start("batched", get_stock_info_store, symbols)
+        timed_warm_start("per-symbol", lambda symbols: [get_stock_info(symbol) for symbol in symbols], symbols)
+        for module in (dividend, fetch_log, stock_info, stock_split):
+            module.connect = legacy_connect
+        timed_warm_start("legacy", lambda symbols: [get_stock_info(symbol) for symbol in symbols], symbols)
@@ -0,0 +1,61 @@
+"""
+Benchmark the holdings engine in-process against the process pool, and the start-up cost of the pool,
+which sets how many symbols a book needs before the pool pays off (PARALLEL_HOLDINGS_THRESHOLD).
+Run from the repository root:
+    python -m benchmarks.bench_holdings_engine [symbols] [rows] [workers]
+"""
+import os
+import sys
+import time
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.synthetic import write_synthetic_tradebook, synthetic_index_frame, synthetic_stock_info
+
+def timed(label: str, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {elapsed:8.2f}s  ({len(result)} holdings)")
+    return result, elapsed
+
+def pool_start_up(workers: int, index_data) -> float:
+    """
+    Time to start a pool like the holdings engine's and run one trivial task on every worker.
+    """
+    from src.lib.generate_holdings import POOL_START_METHOD, _init_worker
+    from src.models.index_series import IndexSeries
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(POOL_START_METHOD),
+                             initializer=_init_worker, initargs=(IndexSeries.from_frame(index_data),)) as executor:
+        list(executor.map(abs, range(workers)))
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    number_of_symbols = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 200_000
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count()
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, "metadata"))
+        os.chdir(directory)
+
+        from src.lib.get_tradebook import load_tradebook
+        from src.lib.generate_holdings import generate_holdings_from_tradebook
+        write_synthetic_tradebook("tradebook.csv", rows, symbols=number_of_symbols)
+        tradebook = load_tradebook(["tradebook.csv"], "")
+        symbols = tradebook.symbols()
+        stock_info = {symbol: synthetic_stock_info(symbol) for symbol in symbols}
+        index_data = synthetic_index_frame(10)
+
+        serial, serial_time = timed("serial", generate_holdings_from_tradebook, symbols, tradebook, index_data, stock_info, max_workers=1)
+        parallel, parallel_time = timed(f"{workers} workers", generate_holdings_from_tradebook, symbols, tradebook, index_data, stock_info, max_workers=workers)
+        assert [holding.realized_profit for holding in serial] == [holding.realized_profit for holding in parallel]
+        print(f"speedup    {serial_time / parallel_time:8.2f}x")
+
+        # The pool saves (1 - 1 / workers) of the serial time per symbol and costs its start-up once
+        start_up = pool_start_up(workers, index_data)
+        per_symbol = serial_time / len(symbols)
+        print(f"pool start-up {start_up:5.2f}s, {per_symbol * 1000:.2f}ms per symbol in-process")
+        if workers > 1:
+            print(f"break-even    {start_up / (per_symbol * (1 - 1 / workers)):5.0f} symbols")
@@ -0,0 +1,49 @@
+"""
+Benchmark the tradebook loader against the previous iterrows based implementation.
+Run from the repository root:
+    python -m benchmarks.bench_load_tradebook [rows]
+"""
+import os
+import sys
+import time
+import datetime
+import tempfile
+import pandas as pd
+
+from src.models.trade import Trade
+from src.lib.get_tradebook import load_tradebook
+from benchmarks.synthetic import write_synthetic_tradebook
+
+def legacy_load_tradebook(tradebook_files):
+    """
+    The previous row-by-row loader, kept here as the benchmark baseline.
+    """
+    tradebook_df = pd.concat([pd.read_csv(file) for file in tradebook_files], ignore_index=True)
+    tradebook_df = tradebook_df.sort_values(by="order_execution_time")
+    tradebook_df['symbol'] = tradebook_df['symbol'].str.split('-').str[0]
+    tradebook = []
+    for trade in tradebook_df.iterrows():
+        tradebook.append(Trade(
+            order_id = trade[1]['order_id'],
+            symbol = trade[1]['symbol'],
+            quantity = trade[1]['quantity'],
+            price = trade[1]['price'],
+            typ = trade[1]['trade_type'],
+            timestamp = datetime.datetime.strptime(trade[1]['order_execution_time'], "%Y-%m-%dT%H:%M:%S")
+        ))
+    return tradebook
+
+def timed(label: str, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    print(f"{label:<10} {time.perf_counter() - start:8.2f}s  ({len(result)} trades)")
+    return result
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "tradebook.csv")
+        write_synthetic_tradebook(path, rows)
+        legacy = timed("legacy", legacy_load_tradebook, [path])
+        current = timed("current", load_tradebook, [path], "")
+        assert [t.timestamp for t in legacy] == [t.timestamp for t in current]
@@ -0,0 +1,78 @@
+"""
+Benchmark parsing one tradebook file per fiscal year in-process against the process pool, for the
+in-memory loader and for the streaming path used by the ledger sync. The concatenate and re-sort
+loader is the baseline of both.
+Run from the repository root:
+    python -m benchmarks.bench_parallel_parse [files] [rows per file] [workers]
+"""
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import write_synthetic_tradebook
+
+def write_fiscal_year_files(directory: str, number_of_files: int, rows: int):
+    """
+    One tradebook per fiscal year, April to March, like the files picked on the tradebook selection page.
+    """
+    files = []
+    for year in range(number_of_files):
+        path = os.path.join(directory, f"tradebook-FY{2015 + year}.csv")
+        write_synthetic_tradebook(path, rows, seed=year)
+        tradebook_df = pd.read_csv(path)
+        start = np.datetime64(f"{2015 + year}-04-01T09:15:00")
+        offsets = np.random.default_rng(year).integers(0, 365 * 24 * 3600, size=rows).astype("timedelta64[s]")
+        tradebook_df['order_execution_time'] = np.datetime_as_string(np.sort(start + offsets), unit="s")
+        tradebook_df['order_id'] += year * rows
+        tradebook_df.to_csv(path, index=False)
+        files.append(path)
+    return files
+
+def concat_and_sort(files):
+    """
+    The previous loader, kept here as the benchmark baseline: read the files one after another, concatenate
+    them and sort the concatenation.
+    """
+    from src.models.trade_table import TradeTable
+    tradebook_df = pd.concat([pd.read_csv(file, dtype={'order_id': str, 'trade_id': str}) for file in files], ignore_index=True)
+    tradebook_df = tradebook_df.sort_values(by="order_execution_time", kind="stable")
+    return TradeTable.from_frame(pd.DataFrame({
+        'order_id': tradebook_df['order_id'],
+        'trade_id': tradebook_df['trade_id'],
+        'symbol': tradebook_df['symbol'].str.split('-').str[0],
+        'quantity': tradebook_df['quantity'],
+        'price': tradebook_df['price'],
+        'typ': tradebook_df['trade_type'],
+        'timestamp': pd.to_datetime(tradebook_df['order_execution_time'], format="%Y-%m-%dT%H:%M:%S"),
+        'remarks': ""
+    }))
+
+def timed(label: str, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    print(f"{label:<22} {time.perf_counter() - start:8.2f}s")
+    return result
+
+if __name__ == "__main__":
+    number_of_files = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 200_000
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count()
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, "metadata"))
+        os.chdir(directory)
+
+        from src.lib.get_tradebook import load_tradebook
+        from src.lib.stream_tradebook import stream_tradebook
+        files = write_fiscal_year_files(directory, number_of_files, rows)
+        print(f"{number_of_files} files x {rows} rows, {workers} workers")
+
+        baseline = timed("concat and sort", concat_and_sort, files)
+        serial = timed("load, in-process", load_tradebook, files, "", max_workers=1)
+        parallel = timed(f"load, {workers} workers", load_tradebook, files, "", max_workers=workers)
+        assert np.array_equal(baseline.timestamps, parallel.timestamps) and np.array_equal(serial.symbol_codes, parallel.symbol_codes)
+
+        timed("stream, in-process", lambda: sum(len(batch) for batch in stream_tradebook(files, max_workers=1)))
+        timed(f"stream, {workers} workers", lambda: sum(len(batch) for batch in stream_tradebook(files, max_workers=workers)))
@@ -0,0 +1,96 @@
+"""
+Benchmark the portfolio metrics engine on a synthetic book: every holding held over ten years of
+daily closes, with random fundamentals.
+Run from the repository root:
+    python -m benchmarks.bench_portfolio_analytics [holdings] [years]
+"""
+import os
+import sys
+import time
+import dataclasses
+import tempfile
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_index_frame, synthetic_stock_info
+
+SECTORS = ["IT", "Banks", "Energy", "FMCG", "Pharma", "Auto"]
+
+def synthetic_book(number_of_holdings: int, years: int, seed: int = 0):
+    """
+    Holdings with a few quantity changes each and their daily valuation on the business days of the index frame.
+    """
+    from src.models.holding import Holding, make_trend
+    from src.models.portfolio_valuation import PortfolioValuation
+
+    rng = np.random.default_rng(seed)
+    index_data = synthetic_index_frame(years, seed)
+    dates = pd.to_datetime(index_data['date']).to_numpy(dtype="datetime64[D]")
+    closes = 100 * np.exp(rng.normal(0.0003, 0.015, (len(dates), number_of_holdings)).cumsum(axis=0))
+    change_rows = np.sort(rng.integers(0, len(dates), (4, number_of_holdings)), axis=0)
+    change_rows[0] = 0
+    step_quantities = rng.integers(1, 500, (4, number_of_holdings)).astype(np.float64)
+    quantities = np.zeros((len(dates), number_of_holdings))
+    for step in range(4):
+        rows = np.arange(len(dates))[:, None] >= change_rows[step]
+        quantities = np.where(rows, step_quantities[step], quantities)
+
+    holdings = []
+    for column in range(number_of_holdings):
+        symbol = f"SYM{column}"
+        info = synthetic_stock_info(symbol, seed)
+        info = dataclasses.replace(
+            info, previous_close=float(closes[-1, column]), sector=str(rng.choice(SECTORS)), industry=f"Industry{rng.integers(20)}",
+            market_cap=int(rng.integers(10 ** 9, 10 ** 12)), beta=float(rng.uniform(0.5, 1.5)), trailing_pe=float(rng.uniform(-10, 60)),
+            forward_pe=float(rng.uniform(5, 50)), price_to_book=float(rng.uniform(1, 10)), dividend_yield=float(rng.uniform(0, 3)),
+            trailing_eps=float(rng.uniform(-5, 50)), forward_eps=float(rng.uniform(1, 60)), ebitda_margins=float(rng.uniform(0, 0.4))
+        )
+        trend_rows = change_rows[:, column]
+        quantity = quantities[-1, column]
+        holdings.append(Holding(
+            symbol = symbol,
+            quantity = quantity,
+            investment = quantity * closes[0, column],
+            current_price = info.previous_close,
+            quantity_trend = make_trend(dates[trend_rows], step_quantities[:, column]),
+            stock_info = info
+        ))
+
+    values = quantities * closes
+    valuation = PortfolioValuation(dates, [holding.symbol for holding in holdings], quantities, closes, values, values.sum(axis=1))
+    return holdings, valuation, index_data
+
+def reference_returns(valuation) -> np.ndarray:
+    """
+    Time-weighted daily returns with pandas, for checking the engine.
+    """
+    held = pd.DataFrame(valuation.quantities).shift(1) * pd.DataFrame(valuation.closes)
+    returns = held.sum(axis=1) / pd.Series(valuation.total).shift(1) - 1
+    return returns.iloc[1:].to_numpy()
+
+if __name__ == "__main__":
+    number_of_holdings = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    years = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, "metadata"))
+        os.chdir(directory)
+
+        from src.lib.portfolio_analytics import PortfolioAnalytics
+        from src.models.index_series import IndexSeries
+        holdings, valuation, index_data = synthetic_book(number_of_holdings, years)
+        index_series = IndexSeries.from_frame(index_data)
+        print(f"{number_of_holdings} holdings x {len(valuation.dates)} days")
+
+        start = time.perf_counter()
+        analytics = PortfolioAnalytics(holdings, valuation, index_series)
+        portfolio = analytics.portfolio()
+        print(f"{'all metrics':<14} {time.perf_counter() - start:8.3f}s")
+
+        start = time.perf_counter()
+        analytics.portfolio()
+        print(f"{'cached':<14} {time.perf_counter() - start:8.3f}s")
+
+        assert np.allclose(analytics.daily_returns, reference_returns(valuation))
+        for name in ("annualized_return", "annualized_volatility", "sharpe_ratio", "sortino_ratio", "beta", "alpha",
+                     "max_drawdown", "tracking_error", "information_ratio", "turnover_ratio", "trailing_pe", "concentration_ratio"):
+            print(f"{name:<24} {getattr(portfolio, name):12.4f}")
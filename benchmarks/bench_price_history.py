@@ -0,0 +1,55 @@
+"""
+Benchmark the local price history store: bulk append of ten years of daily bars per symbol, then
+streaming reads of the full history and of a one year range.
+Run from the repository root:
+    python -m benchmarks.bench_price_history [symbols]
+"""
+import os
+import sys
+import time
+import datetime
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+def synthetic_bars(dates: pd.DatetimeIndex, rng: np.random.Generator) -> pd.DataFrame:
+    close = 100 * np.exp(rng.normal(0.0003, 0.015, len(dates)).cumsum())
+    return pd.DataFrame({
+        "Open": close, "High": close * 1.01, "Low": close * 0.99, "Close": close,
+        "Volume": rng.integers(10 ** 3, 10 ** 6, len(dates))
+    }, index=pd.DatetimeIndex(dates, name="Date"))
+
+def timed(label: str, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    print(f"{label:<12} {time.perf_counter() - start:8.2f}s")
+    return result
+
+if __name__ == "__main__":
+    number_of_symbols = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    symbols = [f"SYM{ind}" for ind in range(number_of_symbols)]
+    dates = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=252 * 10)
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, "metadata"))
+        os.chdir(directory)
+
+        from src.database import create_tables
+        from src.database.price_history import insert_price_history_bulk, get_price_history_range
+        create_tables()
+        def append_all():
+            for symbol in symbols:
+                insert_price_history_bulk(symbol, synthetic_bars(dates, rng))
+        timed("append", append_all)
+        print(f"{'database':<12} {os.path.getsize('metadata/trading_agent.db') / 2 ** 20:8.1f}MB  ({number_of_symbols * len(dates)} bars)")
+
+        def read(start):
+            return sum(len(bars) for _, bars in get_price_history_range(symbols, start))
+        print(f"{'':<12} {timed('read all', read, None)} bars")
+        print(f"{'':<12} {timed('read 1y', read, datetime.date.today() - datetime.timedelta(days=365))} bars")
+
+        tracemalloc.start()
+        read(None)
+        print(f"{'peak memory':<12} {tracemalloc.get_traced_memory()[1] / 2 ** 20:8.1f}MB  (read all)")
+        tracemalloc.stop()
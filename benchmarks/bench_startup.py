@@ -0,0 +1,85 @@
+"""
+Measure application startup: an `-X importtime` report of importing app.py, and the wall time from
+process start to the first window shown, with the deferred modules imported lazily (as the app does)
+and eagerly up front (as it did before).
+Run from the repository root:
+    python -m benchmarks.bench_startup [slowest imports to list]
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+
+# Modules which the app imports when their page or feature is first used
+DEFERRED_MODULES = (
+    "PyQt5.QtWebEngineWidgets", "PyQt5.QtChart", "matplotlib.backends.backend_qt5agg", "pandas", "yfinance",
+    "src.lib.controller",
+)
+
+FIRST_WINDOW = """
+import os, sys, time
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QTimer
+for module in sys.argv[1:]:
+    __import__(module)
+import app
+application = QApplication(sys.argv[:1])
+window = app.MainWindow()
+window.show()
+def shown():
+    print(time.time(), flush=True)
+    os._exit(0)
+QTimer.singleShot(0, shown)
+application.exec_()
+"""
+
+def parse_importtime(stderr: str):
+    """
+    Parse an `-X importtime` report into (module, self, cumulative) rows in microseconds, and the
+    total time of the modules imported at the top level.
+    """
+    rows, total = [], 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((module.strip(), int(self_us), int(cumulative_us)))
+        if not module.startswith("  "):    # Nested imports are indented below their importer
+            total += int(cumulative_us)
+    return rows, total
+
+def import_report(environment: dict, slowest: int):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], env=environment, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"import app failed: {result.stderr.strip().splitlines()[-1]}")
+        return
+    rows, total = parse_importtime(result.stderr)
+    print(f"import app  {total / 1000:8.1f}ms  {len(rows)} modules")
+    for module, self_us, cumulative_us in sorted(rows, key=lambda row: -row[2])[:slowest]:
+        print(f"    {module:<50} {cumulative_us / 1000:8.1f}ms")
+    imported = {module for module, _, _ in rows}
+    print(f"deferred modules imported: {[module for module in DEFERRED_MODULES if module in imported] or 'none'}")
+
+def first_window(label: str, environment: dict, modules: tuple):
+    start = time.time()
+    result = subprocess.run([sys.executable, "-c", FIRST_WINDOW, *modules], env=environment, capture_output=True, text=True)
+    if result.returncode != 0 or not result.stdout.strip():
+        print(f"{label:<8} failed: {(result.stderr.strip().splitlines() or ['no output'])[-1]}")
+        return
+    print(f"{label:<8} {float(result.stdout.split()[-1]) - start:8.3f}s to first window")
+
+if __name__ == "__main__":
+    slowest = int(sys.argv[1]) if len(sys.argv) > 1 else 15
+    repository = os.getcwd()
+    environment = {**os.environ, "PYTHONPATH": repository, "QT_QPA_PLATFORM": os.environ.get("QT_QPA_PLATFORM", "offscreen")}
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, "metadata"))
+        with open(os.path.join(directory, "metadata", "user_data.json"), "w") as json_file:
+            json.dump({"name": "", "email": "", "tradebook": [], "manual_tradebook": "", "holdings": ""}, json_file)
+        os.chdir(directory)
+
+        import_report(environment, slowest)
+        first_window("lazy", environment, ())
+        first_window("eager", environment, DEFERRED_MODULES)
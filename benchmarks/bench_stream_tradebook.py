@@ -0,0 +1,53 @@
+"""
+Benchmark the peak memory of loading tradebook files into one sorted frame against streaming them
+through sorted runs and the k-way merge. Each path runs in a fresh process so peak RSS is comparable.
+Run from the repository root:
+    python -m benchmarks.bench_stream_tradebook [files] [rows per file]
+"""
+import os
+import sys
+import time
+import resource
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import write_synthetic_tradebook
+
+def load_concatenated(files):
+    """
+    The previous loader: read every file whole, concatenate and sort globally.
+    """
+    tradebook_df = pd.concat([pd.read_csv(file) for file in files], ignore_index=True)
+    tradebook_df['timestamp'] = pd.to_datetime(tradebook_df['order_execution_time'], format="%Y-%m-%dT%H:%M:%S")
+    tradebook_df = tradebook_df.sort_values('timestamp', kind="stable")
+    return len(tradebook_df)
+
+def load_streamed(files):
+    from src.lib.stream_tradebook import stream_tradebook
+    return sum(len(batch) for batch in stream_tradebook(files))
+
+def measure(mode: str, files):
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    rows = load_concatenated(files) if mode == "concat" else load_streamed(files)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{mode:<8} {elapsed:8.2f}s  peak RSS {peak / 1024:8.1f} MB  (+{(peak - baseline) / 1024:.1f} MB)  {rows} rows")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] in ("concat", "stream"):
+        measure(sys.argv[1], sys.argv[2:])
+        sys.exit()
+
+    number_of_files = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 500_000
+    with tempfile.TemporaryDirectory() as directory:
+        files = [os.path.join(directory, f"tradebook_{year}.csv") for year in range(number_of_files)]
+        for seed, file in enumerate(files):
+            write_synthetic_tradebook(file, rows, seed=seed)
+        size = sum(os.path.getsize(file) for file in files)
+        print(f"{number_of_files} files, {number_of_files * rows} rows, {size / 2 ** 20:.0f} MB of CSV")
+        for mode in ("concat", "stream"):
+            subprocess.run([sys.executable, "-m", "benchmarks.bench_stream_tradebook", mode, *files], check=True)
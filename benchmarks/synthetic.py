@@ -0,0 +1,85 @@
+"""
+Synthetic tradebooks and market data fixtures shared by the benchmarks.
+"""
+import os
+import json
+import dataclasses
+import numpy as np
+import pandas as pd
+
+from src.models.stock_info import StockInfo, Dividend
+
+INDEX_TICKERS = ["^NSEI", "^BSESN", "^NSEBANK"]
+
+def write_synthetic_tradebook(path: str, rows: int, seed: int = 0, symbols: int = 500):
+    """
+    Write a Zerodha style tradebook CSV with random fills of `symbols` stocks spread across ~10 years.
+    """
+    rng = np.random.default_rng(seed)
+    start = np.datetime64("2015-04-01T09:15:00")
+    offsets = rng.integers(0, 10 * 365 * 24 * 3600, size=rows).astype("timedelta64[s]")
+    pd.DataFrame({
+        "symbol": np.char.add("SYM", rng.integers(0, symbols, size=rows).astype(str)),
+        "isin": "INE000000000",
+        "trade_date": "",
+        "exchange": "NSE",
+        "segment": "EQ",
+        "series": "EQ",
+        "trade_type": np.where(rng.random(rows) < 0.6, "buy", "sell"),
+        "auction": False,
+        "quantity": rng.integers(1, 500, size=rows),
+        "price": rng.uniform(10, 5000, size=rows).round(2),
+        "trade_id": np.arange(rows),
+        "order_id": np.arange(rows) + 10 ** 15,
+        "order_execution_time": np.datetime_as_string(start + offsets, unit="s"),
+    }).to_csv(path, index=False)
+
+def write_synthetic_fixtures(directory: str, symbols: list, start: str = "2015-01-01", end: str = "2025-06-30", seed: int = 0):
+    """
+    Write FixtureProvider snapshots with random walk prices for the symbols (as NSE tickers) and the indices.
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start, end)
+    for ticker in [f"{symbol}.NS" for symbol in symbols] + INDEX_TICKERS:
+        close = 100 * np.exp(rng.normal(0.0003, 0.015, len(dates)).cumsum())
+        fixture = {
+            "info": {
+                "symbol": ticker, "longName": ticker, "industry": "Unknown", "sector": str(rng.choice(["IT", "Banks", "Energy", "FMCG"])),
+                "previousClose": float(close[-1]), "marketCap": int(rng.integers(10 ** 9, 10 ** 12)), "beta": float(rng.uniform(0.5, 1.5)),
+                "trailingPE": float(rng.uniform(5, 50)), "forwardPE": float(rng.uniform(5, 50)), "priceToBook": float(rng.uniform(1, 10)),
+                "dividendYield": float(rng.uniform(0, 3))
+            },
+            "splits": {"2019-05-06": 2.0} if rng.random() < 0.1 else {},
+            "dividends": {date.strftime("%Y-%m-%d"): float(rng.uniform(1, 10)) for date in dates[::250]},
+            "history": {
+                "Date": dates.strftime("%Y-%m-%d").tolist(), "Open": close.tolist(), "High": close.tolist(),
+                "Low": close.tolist(), "Close": close.tolist(), "Volume": rng.integers(10 ** 3, 10 ** 6, len(dates)).tolist()
+            }
+        }
+        with open(os.path.join(directory, f"{ticker}.json"), "w") as file:
+            json.dump(fixture, file)
+
+def synthetic_index_frame(years: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Random walk closes of the three indices for the last `years` years of business days, in the wide layout of get_index_data.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=252 * years)
+    return pd.DataFrame({
+        'date': dates.date,
+        'nifty50': 15000 * np.cumprod(1 + rng.normal(0, 0.01, len(dates))),
+        'bsesensex': 50000 * np.cumprod(1 + rng.normal(0, 0.01, len(dates))),
+        'niftybank': 35000 * np.cumprod(1 + rng.normal(0, 0.01, len(dates)))
+    })
+
+def synthetic_stock_info(symbol: str, seed: int = 0) -> StockInfo:
+    """
+    StockInfo with zeroed fundamentals, a random previous close and a yearly dividend for the last ten years.
+    """
+    rng = np.random.default_rng([seed, sum(symbol.encode())])
+    fields = {field.name: 0 for field in dataclasses.fields(StockInfo) if field.name not in ("stock_splits", "dividends")}
+    fields.update(symbol=symbol, symbol_yf=f"{symbol}.NS", name=symbol, city="Unknown", industry="Unknown", sector="Unknown",
+                  previous_close=float(rng.uniform(10, 5000)))
+    dividends = [Dividend(ex_date=date.date(), amount=float(rng.uniform(1, 10))) for date in pd.date_range(end=pd.Timestamp.today(), periods=10, freq="YS")]
+    return StockInfo(**fields, dividends=dividends)
@@ -1,9 +1,48 @@
-from .dividend import create_dividend_table
-from .index import create_index_table
-from .stock_info import create_stock_info_table
-from .stock_split import create_stock_split_table
-
-create_stock_info_table()
-create_stock_split_table()
-create_dividend_table()
-create_index_table()
\ No newline at end of file
+import sqlite3
+
+from .connection import connect, MARKET_DATA_DATABASE, LEDGER_DATABASE
+
+SCHEMA_VERSION = 5     # Bump whenever a create_* function changes, so existing databases run them again
+
+def create_tables() -> bool:
+    """
+    Create the tables of the market data and ledger databases. Call once at startup, before any other
+    database access.
+    A database whose user_version is already SCHEMA_VERSION is skipped after a single query. Otherwise all
+    of its tables are created in one transaction. The table modules are imported here rather than
+    when the package is imported, since most of them import pandas.
+    Returns:
+        bool: True if the tables exist, False otherwise.
+    """
+    from .dividend import create_dividend_table
+    from .fetch_log import create_fetch_log_table
+    from .holding_state import create_holding_state_table
+    from .index import create_index_table
+    from .price_history import create_price_history_table
+    from .stock_info import create_stock_info_table
+    from .stock_split import create_stock_split_table
+    from .trade_ledger import create_trade_ledger_table
+
+    schema = {
+        MARKET_DATA_DATABASE: (create_stock_info_table, create_stock_split_table, create_dividend_table, create_index_table,
+                               create_fetch_log_table, create_price_history_table),
+        LEDGER_DATABASE: (create_trade_ledger_table, create_holding_state_table),
+    }
+    for database, create_functions in schema.items():
+        connection, cursor = connect(database)
+        try:
+            cursor.execute("PRAGMA user_version")
+            if cursor.fetchone()[0] >= SCHEMA_VERSION:
+                continue
+            cursor.execute("BEGIN")
+            for create_table in create_functions:
+                create_table()
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            cursor.execute("COMMIT")
+        except sqlite3.Error as e:
+            if connection.in_transaction:
+                cursor.execute("ROLLBACK")
+            exit(f"Error creating tables in {database}: {e}")
+        finally:
+            cursor.close()
+    return True
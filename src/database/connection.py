@@ -1,19 +1,77 @@
 import datetime
+import platform
 import sqlite3
-from typing import List
+import threading
+from typing import Iterator, List
 
-DATE_TODAY = datetime.datetime.now().date().strftime("%Y-%m-%d")
+MARKET_DATA_DATABASE = "metadata/trading_agent.db"    # Persistent, rows are refreshed once their TTL expires
+LEDGER_DATABASE = "metadata/trade_ledger.db"    # Persistent, holds user trades rather than market data
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"    # Format of the fetched_at columns
 
-def connect() -> List:
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",        # Readers do not block the writer, needed by the concurrent fetchers
+    "PRAGMA synchronous = NORMAL",      # Safe with WAL, avoids an fsync on every commit
+    "PRAGMA cache_size = -16000",       # 16 MB page cache per connection
+    "PRAGMA temp_store = MEMORY",
+)
+
+MAX_QUERY_PARAMETERS = 500     # Symbols bound per `IN (...)` query, well below SQLite's variable limit
+
+_local = threading.local()
+
+def now() -> str:
+    """
+    Current time in the format of the fetched_at columns.
+    """
+    return datetime.datetime.now().strftime(TIMESTAMP_FORMAT)
+
+def fresh_since(max_age: datetime.timedelta) -> str:
+    """
+    Oldest fetched_at value which is still fresh for the given TTL.
+    """
+    return (datetime.datetime.now() - max_age).strftime(TIMESTAMP_FORMAT)
+
+def chunks(items: List, size: int = MAX_QUERY_PARAMETERS) -> Iterator[List]:
+    """
+    Split the parameters of an `IN (...)` query into chunks of at most `size` items.
+    """
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def connect(database: str = None) -> List:
     """
     Connect to the SQLite database.
+    Every thread keeps one open connection per database file which is reused by all calls, so callers
+    must close the returned cursor but never the connection. Callers connect before their `try` block,
+    as connect exits with its own error message when the connection cannot be opened.
+    Args:
+        database (str): Path of the database file, defaults to the market data database.
     Returns:
         connection: sqlite3.Connection
         cursor: sqlite3.Cursor
     """
+    database = database or MARKET_DATA_DATABASE
+    if not hasattr(_local, "connections"):
+        _local.connections = {}
+    connections = _local.connections
     try:
-        connection = sqlite3.connect(f"metadata/trading_agent_{DATE_TODAY}.db", autocommit=True)
-        cursor = connection.cursor()
-        return connection, cursor
+        connection = connections.get(database)
+        if connection is None:
+            try:
+                connection = sqlite3.connect(database, autocommit=True, timeout=30)
+            except TypeError:
+                exit(f"Error connecting to the database: sqlite3.connect has no autocommit parameter, Python 3.12 or newer is needed (running {platform.python_version()})")
+            for pragma in PRAGMAS:
+                connection.execute(pragma)
+            connections[database] = connection
+        return connection, connection.cursor()
     except sqlite3.Error as e:
-        exit(f"Error connecting to the database: {e}")
\ No newline at end of file
+        exit(f"Error connecting to the database: {e}")
+
+def close_connections():
+    """
+    Close the connections opened by the current thread.
+    """
+    for connection in getattr(_local, "connections", {}).values():
+        connection.close()
+    _local.connections = {}
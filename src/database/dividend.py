@@ -1,9 +1,12 @@
 import sqlite3
 import datetime
-from typing import List
-from .connection import connect
+from typing import Dict, List
+import pandas as pd
+from .connection import connect, now, chunks
 from src.models.stock_info import Dividend
 
+DIVIDEND_TTL = datetime.timedelta(days=7)     # Dividends are announced well in advance, refreshed weekly
+
 def create_dividend_table() -> bool:
     """
     Create the Dividend table in the database.
@@ -11,21 +14,23 @@ def create_dividend_table() -> bool:
     Returns:
         bool: True if the table was created successfully, False otherwise.
     """
+    connection, cursor = connect()
     try:
-        connection, cursor = connect()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS Dividend (
                 symbol TEXT,
                 ex_date DATE,
                 amount REAL,
+                fetched_at TEXT,
                 PRIMARY KEY (symbol, ex_date)
             )
         """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS DividendSymbol ON Dividend (symbol, ex_date, amount)")    # Covers the per-symbol reads
         return True
     except sqlite3.Error as e:
         exit(f"Error creating Dividend table: {e}")
     finally:
-        connection.close()
+        cursor.close()
 
 def insert_dividend_into_db(symbol: str, ex_date: datetime.date, amount: float) -> bool:
     """
@@ -37,15 +42,43 @@ def insert_dividend_into_db(symbol: str, ex_date: datetime.date, amount: float)
     Returns:
         bool: True if the dividend was inserted successfully, False otherwise.
     """
+    connection, cursor = connect()
     try:
-        connection, cursor = connect()
         ex_date_str = datetime.datetime.strftime(ex_date, "%Y-%m-%d")
-        cursor.execute("INSERT INTO Dividend (symbol, ex_date, amount) VALUES (?, ?, ?)", (symbol, ex_date_str, amount))
+        cursor.execute("INSERT OR REPLACE INTO Dividend (symbol, ex_date, amount, fetched_at) VALUES (?, ?, ?, ?)", (symbol, ex_date_str, amount, now()))
         return True
     except sqlite3.Error as e:
         exit(f"Error inserting dividend into database: {e}")
     finally:
-        connection.close()
+        cursor.close()
+
+def insert_dividends_bulk(symbol: str, dividends: pd.DataFrame) -> bool:
+    """
+    Insert all dividends of a stock into the database in a single transaction.
+    Dividends already stored for an ex-date are updated, so refetching a symbol is idempotent.
+    Args:
+        symbol (str): Stock symbol.
+        dividends (pd.DataFrame): DataFrame with the columns ex_date and amount.
+    Returns:
+        bool: True if the dividends were inserted successfully, False otherwise.
+    """
+    connection, cursor = connect()
+    try:
+        fetched_at = now()
+        ex_dates = pd.to_datetime(dividends['ex_date']).dt.strftime("%Y-%m-%d")
+        cursor.execute("BEGIN")
+        cursor.executemany("""
+            INSERT INTO Dividend (symbol, ex_date, amount, fetched_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT (symbol, ex_date) DO UPDATE SET amount = excluded.amount, fetched_at = excluded.fetched_at
+        """, ((symbol, ex_date, amount, fetched_at) for ex_date, amount in zip(ex_dates, dividends['amount'].tolist())))
+        cursor.execute("COMMIT")
+        return True
+    except sqlite3.Error as e:
+        if connection.in_transaction:
+            cursor.execute("ROLLBACK")
+        exit(f"Error inserting dividends into database: {e}")
+    finally:
+        cursor.close()
 
 def get_dividends_from_db(symbol: str) -> List[Dividend]:
     """
@@ -55,8 +88,8 @@ def get_dividends_from_db(symbol: str) -> List[Dividend]:
     Returns:
         List[Dividend]: List of Dividend objects for the given stock symbol.
     """
+    connection, cursor = connect()
     try:
-        connection, cursor = connect()
         cursor.execute("SELECT ex_date, amount FROM Dividend WHERE symbol = ?", (symbol,))
         rows = cursor.fetchall()
         dividends = [Dividend(ex_date=datetime.datetime.strptime(row[0], "%Y-%m-%d").date(), amount=row[1]) for row in rows]
@@ -64,4 +97,28 @@ def get_dividends_from_db(symbol: str) -> List[Dividend]:
     except sqlite3.Error as e:
         exit(f"Error fetching dividends from database: {e}")
     finally:
-        connection.close()
+        cursor.close()
+
+def get_dividends_many(symbols: List[str]) -> Dict[str, List[Dividend]]:
+    """
+    Get the dividends of many symbols from the database, with one query per chunk of symbols.
+    Args:
+        symbols (List[str]): Stock symbols.
+    Returns:
+        Dict[str, List[Dividend]]: Dictionary mapping every given symbol to its dividends in date order.
+    """
+    connection, cursor = connect()
+    try:
+        dividends = {symbol: [] for symbol in symbols}
+        for chunk in chunks(list(symbols)):
+            cursor.execute(
+                f"SELECT symbol, ex_date, amount FROM Dividend WHERE symbol IN ({', '.join('?' * len(chunk))}) ORDER BY symbol, ex_date",
+                chunk
+            )
+            for symbol, ex_date, amount in cursor.fetchall():
+                dividends[symbol].append(Dividend(ex_date=datetime.date.fromisoformat(ex_date), amount=amount))
+        return dividends
+    except sqlite3.Error as e:
+        exit(f"Error fetching dividends from database: {e}")
+    finally:
+        cursor.close()
@@ -0,0 +1,119 @@
+import sqlite3
+import datetime
+from typing import List, Optional, Set
+from .connection import connect, now, fresh_since, chunks, TIMESTAMP_FORMAT
+
+def create_fetch_log_table() -> bool:
+    """
+    Create the FetchLog table in the database.
+    FetchLog stores when a dataset (splits, dividends, index, ...) of a symbol was last fetched, so that
+    freshness is known even for symbols whose dataset has no rows.
+    Returns:
+        bool: True if the table was created successfully, False otherwise.
+    """
+    connection, cursor = connect()
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS FetchLog (
+                symbol TEXT,
+                dataset TEXT,
+                fetched_at TEXT,
+                PRIMARY KEY (symbol, dataset)
+            )
+        """)
+        return True
+    except sqlite3.Error as e:
+        exit(f"Error creating FetchLog table: {e}")
+    finally:
+        cursor.close()
+
+def mark_fetched(symbol: str, dataset: str) -> bool:
+    """
+    Record that a dataset of a symbol was fetched just now.
+    Args:
+        symbol (str): Stock symbol, or index name.
+        dataset (str): Name of the dataset, e.g. "splits" or "dividends".
+    Returns:
+        bool: True if the fetch was recorded successfully, False otherwise.
+    """
+    connection, cursor = connect()
+    try:
+        cursor.execute("INSERT OR REPLACE INTO FetchLog (symbol, dataset, fetched_at) VALUES (?, ?, ?)", (symbol, dataset, now()))
+        return True
+    except sqlite3.Error as e:
+        exit(f"Error recording fetch in database: {e}")
+    finally:
+        cursor.close()
+
+def is_fresh(symbol: str, dataset: str, max_age: datetime.timedelta) -> bool:
+    """
+    Check whether a dataset of a symbol was fetched within its TTL.
+    Args:
+        symbol (str): Stock symbol, or index name.
+        dataset (str): Name of the dataset, e.g. "splits" or "dividends".
+        max_age (datetime.timedelta): TTL of the dataset.
+    Returns:
+        bool: True if the dataset was fetched within max_age, False otherwise.
+    """
+    connection, cursor = connect()
+    try:
+        cursor.execute("SELECT 1 FROM FetchLog WHERE symbol = ? AND dataset = ? AND fetched_at >= ?", (symbol, dataset, fresh_since(max_age)))
+        return cursor.fetchone() is not None
+    except sqlite3.Error as e:
+        exit(f"Error checking fetch log in database: {e}")
+    finally:
+        cursor.close()
+
+def get_fresh_symbols(symbols: List[str], dataset: str, max_age: datetime.timedelta) -> Set[str]:
+    """
+    Get the symbols whose dataset was fetched within its TTL, with one query per chunk of symbols.
+    Args:
+        symbols (List[str]): Stock symbols, or index names.
+        dataset (str): Name of the dataset, e.g. "splits" or "dividends".
+        max_age (datetime.timedelta): TTL of the dataset.
+    Returns:
+        Set[str]: Symbols among the given ones whose dataset is fresh.
+    """
+    connection, cursor = connect()
+    try:
+        oldest = fresh_since(max_age)
+        fresh_symbols = set()
+        for chunk in chunks(list(symbols)):
+            cursor.execute(
+                f"SELECT symbol FROM FetchLog WHERE dataset = ? AND fetched_at >= ? AND symbol IN ({', '.join('?' * len(chunk))})",
+                (dataset, oldest, *chunk)
+            )
+            fresh_symbols.update(row[0] for row in cursor.fetchall())
+        return fresh_symbols
+    except sqlite3.Error as e:
+        exit(f"Error checking fetch log in database: {e}")
+    finally:
+        cursor.close()
+
+def get_oldest_fetch(symbols: List[str], dataset: str) -> Optional[datetime.datetime]:
+    """
+    Get when the least recently fetched dataset of the symbols was fetched, the first of them goes stale
+    one TTL later. Uses one query per chunk of symbols.
+    Args:
+        symbols (List[str]): Stock symbols, or index names.
+        dataset (str): Name of the dataset, e.g. "splits" or "dividends".
+    Returns:
+        datetime.datetime: Oldest fetched_at among the symbols, None if any of them was never fetched.
+    """
+    connection, cursor = connect()
+    try:
+        oldest = None
+        for chunk in chunks(sorted(set(symbols))):
+            cursor.execute(
+                f"SELECT COUNT(*), MIN(fetched_at) FROM FetchLog WHERE dataset = ? AND symbol IN ({', '.join('?' * len(chunk))})",
+                (dataset, *chunk)
+            )
+            count, fetched_at = cursor.fetchone()
+            if count != len(chunk):
+                return None
+            oldest = fetched_at if oldest is None else min(oldest, fetched_at)
+        return datetime.datetime.strptime(oldest, TIMESTAMP_FORMAT) if oldest else None
+    except sqlite3.Error as e:
+        exit(f"Error checking fetch log in database: {e}")
+    finally:
+        cursor.close()
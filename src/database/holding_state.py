@@ -0,0 +1,80 @@
+import pickle
+import sqlite3
+from typing import Dict, List
+
+from .connection import connect, chunks, LEDGER_DATABASE
+from src.models.holding_state import HoldingState
+
+HOLDING_STATE_VERSION = 2   # Bump when HoldingState or the trade replay changes, older states are then ignored
+
+def create_holding_state_table() -> bool:
+    """
+    Create the HoldingState table in the ledger database.
+    HoldingState stores the replayed position of every symbol, so that only new trades are replayed.
+    Returns:
+        bool: True if the table was created successfully, False otherwise.
+    """
+    connection, cursor = connect(LEDGER_DATABASE)
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS HoldingState (
+                symbol TEXT PRIMARY KEY,
+                version INTEGER,
+                trade_count INTEGER,
+                digest TEXT,
+                state BLOB
+            )
+        """)
+        return True
+    except sqlite3.Error as e:
+        exit(f"Error creating HoldingState table: {e}")
+    finally:
+        cursor.close()
+
+def get_holding_states(symbols: List[str]) -> Dict[str, HoldingState]:
+    """
+    Get the saved holding states of the given symbols.
+    Args:
+        symbols (List[str]): NSE symbols of the stocks.
+    Returns:
+        Dict[str, HoldingState]: Dictionary mapping symbols to their saved state, without symbols that have none.
+    """
+    connection, cursor = connect(LEDGER_DATABASE)
+    try:
+        states = {}
+        for chunk in chunks(list(symbols)):
+            cursor.execute(
+                f"SELECT symbol, state FROM HoldingState WHERE version = ? AND symbol IN ({', '.join('?' * len(chunk))})",
+                (HOLDING_STATE_VERSION, *chunk)
+            )
+            for symbol, state in cursor.fetchall():
+                states[symbol] = pickle.loads(state)
+        return states
+    except sqlite3.Error as e:
+        exit(f"Error fetching holding states from database: {e}")
+    finally:
+        cursor.close()
+
+def save_holding_states(states: List[HoldingState]) -> bool:
+    """
+    Save holding states in a single transaction, replacing the previous state of their symbols.
+    Args:
+        states (List[HoldingState]): States to save.
+    Returns:
+        bool: True if the states were saved successfully, False otherwise.
+    """
+    connection, cursor = connect(LEDGER_DATABASE)
+    try:
+        cursor.execute("BEGIN")
+        cursor.executemany(
+            "INSERT OR REPLACE INTO HoldingState (symbol, version, trade_count, digest, state) VALUES (?, ?, ?, ?, ?)",
+            ((state.symbol, HOLDING_STATE_VERSION, state.trade_count, state.digest, pickle.dumps(state)) for state in states)
+        )
+        cursor.execute("COMMIT")
+        return True
+    except sqlite3.Error as e:
+        if connection.in_transaction:
+            cursor.execute("ROLLBACK")
+        exit(f"Error saving holding states into database: {e}")
+    finally:
+        cursor.close()
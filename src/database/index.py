@@ -1,68 +1,125 @@
 import sqlite3
+import datetime
+from typing import Dict, List
 import pandas as pd
-from .connection import connect
+from .connection import connect, chunks
+
+INDEX_TTL = datetime.timedelta(days=1)     # Index closes are append-only, new bars are fetched daily
 
 def create_index_table():
     """
-    Create the IndexData table in the database.
-    IndexData table stores the data for market indices like Nifty50, BSE Sensex, and Nifty Bank.
+    Create the IndexPrice table in the database.
+    IndexPrice table stores the daily closes of market indices like Nifty50, BSE Sensex, and Nifty Bank, one
+    row per index and date, so new indices need no schema change.
+    Closes stored by older versions in the wide IndexData table are moved over once.
     Returns:
         bool: True if the table was created successfully, False otherwise.
     """
+    connection, cursor = connect()
     try:
-        connection, cursor = connect()
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS IndexData (
-                date DATE PRIMARY KEY,
-                nifty50 REAL,
-                bsesensex REAL,
-                niftybank REAL
-            )
+            CREATE TABLE IF NOT EXISTS IndexPrice (
+                index_name TEXT,
+                date TEXT,
+                close REAL,
+                PRIMARY KEY (index_name, date)
+            ) WITHOUT ROWID
         """)
+
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'IndexData'")
+        if cursor.fetchone():
+            own_transaction = not connection.in_transaction     # Otherwise the move is part of the caller's transaction, e.g. in create_tables
+            if own_transaction:
+                cursor.execute("BEGIN")
+            for index_name in ('nifty50', 'bsesensex', 'niftybank'):
+                cursor.execute(f"""
+                    INSERT OR IGNORE INTO IndexPrice (index_name, date, close)
+                    SELECT ?, date, {index_name} FROM IndexData WHERE {index_name} IS NOT NULL
+                """, (index_name,))
+            cursor.execute("DROP TABLE IndexData")
+            if own_transaction:
+                cursor.execute("COMMIT")
         return True
     except sqlite3.Error as e:
-        exit(f"Error creating IndexData table: {e}")
+        if connection.in_transaction:
+            cursor.execute("ROLLBACK")
+        exit(f"Error creating IndexPrice table: {e}")
     finally:
-        connection.close()
+        cursor.close()
 
-def insert_index_into_db(index_data: pd.DataFrame) -> bool:
+def upsert_index_frame(index_data: pd.DataFrame) -> bool:
     """
-    Insert index data into the IndexData table in the database.
+    Insert index closes into the IndexPrice table in a single transaction.
+    Dates which are already stored are updated with the new closes, so overlapping refetches are idempotent.
     Args:
-        index_data (pd.DataFrame): DataFrame containing index data with columns - date, nifty50, bsesensex, niftybank.
+        index_data (pd.DataFrame): DataFrame with a date column and one column of closes per index, named after the index.
     Returns:
         bool: True if the data was inserted successfully, False otherwise.
     """
+    connection, cursor = connect()
     try:
-        connection, cursor = connect()
-        for _, row in index_data.iterrows():
-            cursor.execute("""
-                INSERT OR REPLACE INTO IndexData (
-                    date, nifty50, bsesensex, niftybank
-                ) VALUES (?, ?, ?, ?)
-            """, (row['date'], row['nifty50'], row['bsesensex'], row['niftybank']))
+        rows = index_data.assign(date=pd.to_datetime(index_data['date']).dt.strftime("%Y-%m-%d")).melt(
+            id_vars='date', var_name='index_name', value_name='close'
+        ).dropna(subset=['close'])
+        cursor.execute("BEGIN")
+        cursor.executemany("""
+            INSERT INTO IndexPrice (index_name, date, close) VALUES (?, ?, ?)
+            ON CONFLICT (index_name, date) DO UPDATE SET close = excluded.close
+        """, rows[['index_name', 'date', 'close']].itertuples(index=False, name=None))
+        cursor.execute("COMMIT")
         return True
     except sqlite3.Error as e:
+        if connection.in_transaction:
+            cursor.execute("ROLLBACK")
         exit(f"Error inserting index data into database: {e}")
     finally:
-        connection.close()
+        cursor.close()
 
-def get_index_from_db() -> pd.DataFrame:
+def get_last_index_dates(index_names: List[str]) -> Dict[str, datetime.date]:
     """
-    Fetch all index data from the IndexData table in the database.
+    Get the date of the latest stored close of every index.
+    Args:
+        index_names (List[str]): Names of the indices.
+    Returns:
+        Dict[str, datetime.date]: Dictionary mapping indices with stored closes to their latest date.
+    """
+    connection, cursor = connect()
+    try:
+        last_dates = {}
+        for chunk in chunks(list(index_names)):
+            cursor.execute(
+                f"SELECT index_name, MAX(date) FROM IndexPrice WHERE index_name IN ({', '.join('?' * len(chunk))}) GROUP BY index_name",
+                chunk
+            )
+            for index_name, last_date in cursor.fetchall():
+                last_dates[index_name] = datetime.date.fromisoformat(last_date)
+        return last_dates
+    except sqlite3.Error as e:
+        exit(f"Error fetching index dates from database: {e}")
+    finally:
+        cursor.close()
+
+def get_index_from_db(index_names: List[str] = ('nifty50', 'bsesensex', 'niftybank')) -> pd.DataFrame:
+    """
+    Fetch the closes of the given indices from the IndexPrice table in the database, in the wide layout.
+    Args:
+        index_names (List[str]): Names of the indices, one column each.
     Returns:
-        pd.DataFrame: DataFrame containing all index data with columns - date, nifty50, bsesensex, niftybank.
+        pd.DataFrame: DataFrame with a date column and one column of closes per index, ordered by date.
+            Closes are NaN on dates where only other indices traded.
     """
+    connection, cursor = connect()
     try:
-        connection, cursor = connect()
-        cursor.execute("SELECT * FROM IndexData")
-        rows = cursor.fetchall()
-        columns = [column[0] for column in cursor.description]
-        index_data = pd.DataFrame(rows, columns=columns)
-        index_data['date'] = pd.to_datetime(index_data['date'])
-        index_data['date'] = index_data['date'].dt.date
+        cursor.execute(
+            f"SELECT index_name, date, close FROM IndexPrice WHERE index_name IN ({', '.join('?' * len(index_names))})",
+            tuple(index_names)
+        )
+        index_prices = pd.DataFrame(cursor.fetchall(), columns=['index_name', 'date', 'close'])
+        index_data = index_prices.pivot(index='date', columns='index_name', values='close').reindex(columns=list(index_names))
+        index_data = index_data.sort_index().reset_index().rename_axis(columns=None)
+        index_data['date'] = pd.to_datetime(index_data['date']).dt.date
         return index_data
     except sqlite3.Error as e:
         exit(f"Error fetching index data from database: {e}")
     finally:
-        connection.close()
+        cursor.close()
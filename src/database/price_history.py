@@ -0,0 +1,225 @@
+import sqlite3
+import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from .connection import connect, chunks
+
+PRICE_HISTORY_TTL = datetime.timedelta(days=1)     # A new daily bar is available every trading day
+PRICE_HISTORY_COLUMNS = ("open", "high", "low", "close", "volume")
+UNADJUSTED_DIVIDENDS_VERSION = 3    # Schema version from which stored closes are no longer adjusted for dividends
+
+def create_price_history_table() -> bool:
+    """
+    Create the PriceHistory table in the database.
+    PriceHistory stores the daily OHLCV bars of every stock, clustered by symbol and date, and
+    PriceHistoryStart the earliest date its history was requested from, which may be before its first bar,
+    with the key of the splits its bars are adjusted for.
+    Bars stored by older versions were also adjusted for dividends, they are dropped once so that the
+    whole history is fetched again.
+    Returns:
+        bool: True if the table was created successfully, False otherwise.
+    """
+    connection, cursor = connect()
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS PriceHistory (
+                symbol TEXT,
+                date TEXT,
+                open REAL,
+                high REAL,
+                low REAL,
+                close REAL,
+                volume INTEGER,
+                PRIMARY KEY (symbol, date)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS PriceHistoryStart (
+                symbol TEXT PRIMARY KEY,
+                start TEXT,
+                split_key TEXT
+            )
+        """)
+        cursor.execute("PRAGMA table_info(PriceHistoryStart)")
+        if "split_key" not in [row[1] for row in cursor.fetchall()]:
+            # The basis of bars stored before is unknown, a NULL key makes them fetched again
+            cursor.execute("ALTER TABLE PriceHistoryStart ADD COLUMN split_key TEXT")
+
+        cursor.execute("PRAGMA user_version")
+        if cursor.fetchone()[0] < UNADJUSTED_DIVIDENDS_VERSION:
+            cursor.execute("DELETE FROM PriceHistory")
+            cursor.execute("DELETE FROM PriceHistoryStart")
+            cursor.execute("DELETE FROM FetchLog WHERE dataset = 'prices'")
+        return True
+    except sqlite3.Error as e:
+        exit(f"Error creating PriceHistory table: {e}")
+    finally:
+        cursor.close()
+
+def insert_price_history_bulk(symbol: str, history: pd.DataFrame) -> bool:
+    """
+    Insert the daily bars of a stock into the database in a single transaction.
+    Bars already stored for a date are updated, so overlapping fetches are idempotent.
+    Args:
+        symbol (str): NSE symbol for the stock.
+        history (pd.DataFrame): DataFrame indexed by date with the columns Open, High, Low, Close, Volume.
+    Returns:
+        bool: True if the bars were inserted successfully, False otherwise.
+    """
+    connection, cursor = connect()
+    try:
+        rows = history[["Open", "High", "Low", "Close", "Volume"]].assign(
+            symbol=symbol, date=pd.to_datetime(history.index).strftime("%Y-%m-%d")
+        )[["symbol", "date", "Open", "High", "Low", "Close", "Volume"]]
+        cursor.execute("BEGIN")
+        cursor.executemany("""
+            INSERT INTO PriceHistory (symbol, date, open, high, low, close, volume) VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (symbol, date) DO UPDATE SET
+                open = excluded.open,
+                high = excluded.high,
+                low = excluded.low,
+                close = excluded.close,
+                volume = excluded.volume
+        """, rows.itertuples(index=False, name=None))
+        cursor.execute("COMMIT")
+        return True
+    except sqlite3.Error as e:
+        if connection.in_transaction:
+            cursor.execute("ROLLBACK")
+        exit(f"Error inserting price history into database: {e}")
+    finally:
+        cursor.close()
+
+def delete_price_history(symbol: str) -> bool:
+    """
+    Delete the stored daily bars of a stock.
+    Args:
+        symbol (str): NSE symbol for the stock.
+    Returns:
+        bool: True if the bars were deleted successfully, False otherwise.
+    """
+    connection, cursor = connect()
+    try:
+        cursor.execute("DELETE FROM PriceHistory WHERE symbol = ?", (symbol,))
+        return True
+    except sqlite3.Error as e:
+        exit(f"Error deleting price history from database: {e}")
+    finally:
+        cursor.close()
+
+def set_requested_start(symbol: str, start: datetime.date, split_key: str) -> bool:
+    """
+    Record that the history of a stock was fetched from a date on, adjusted for the given splits. An
+    earlier recorded start with the same split key is kept, as the bars from it on are already stored.
+    Args:
+        symbol (str): NSE symbol for the stock.
+        start (datetime.date): First date the history was fetched from.
+        split_key (str): Key of the splits the fetched bars are adjusted for.
+    Returns:
+        bool: True if the start was recorded successfully, False otherwise.
+    """
+    connection, cursor = connect()
+    try:
+        cursor.execute("""
+            INSERT INTO PriceHistoryStart (symbol, start, split_key) VALUES (?, ?, ?)
+            ON CONFLICT (symbol) DO UPDATE SET
+                start = CASE WHEN split_key IS excluded.split_key THEN MIN(start, excluded.start) ELSE excluded.start END,
+                split_key = excluded.split_key
+        """, (symbol, start.strftime("%Y-%m-%d"), split_key))
+        return True
+    except sqlite3.Error as e:
+        exit(f"Error recording price history start in database: {e}")
+    finally:
+        cursor.close()
+
+def get_requested_starts(symbols: List[str]) -> Dict[str, Tuple[datetime.date, Optional[str]]]:
+    """
+    Get the earliest date the history of every stock was fetched from, and the key of the splits its
+    stored bars are adjusted for.
+    Args:
+        symbols (List[str]): NSE symbols of the stocks.
+    Returns:
+        Dict[str, Tuple[datetime.date, Optional[str]]]: Dictionary mapping symbols whose history was fetched to their
+            earliest requested start and split key, None if the key is unknown.
+    """
+    connection, cursor = connect()
+    try:
+        requested_starts = {}
+        for chunk in chunks(list(symbols)):
+            cursor.execute(f"SELECT symbol, start, split_key FROM PriceHistoryStart WHERE symbol IN ({', '.join('?' * len(chunk))})", chunk)
+            for symbol, start, split_key in cursor.fetchall():
+                requested_starts[symbol] = (datetime.date.fromisoformat(start), split_key)
+        return requested_starts
+    except sqlite3.Error as e:
+        exit(f"Error fetching price history starts from database: {e}")
+    finally:
+        cursor.close()
+
+def get_bar_date_ranges(symbols: List[str]) -> Dict[str, Tuple[datetime.date, datetime.date]]:
+    """
+    Get the dates of the first and last stored bar of every symbol.
+    Args:
+        symbols (List[str]): NSE symbols of the stocks.
+    Returns:
+        Dict[str, Tuple[datetime.date, datetime.date]]: Dictionary mapping symbols with stored bars to their first and last bar dates.
+    """
+    connection, cursor = connect()
+    try:
+        bar_date_ranges = {}
+        for chunk in chunks(list(symbols)):
+            cursor.execute(
+                f"SELECT symbol, MIN(date), MAX(date) FROM PriceHistory WHERE symbol IN ({', '.join('?' * len(chunk))}) GROUP BY symbol",
+                chunk
+            )
+            for symbol, first_date, last_date in cursor.fetchall():
+                bar_date_ranges[symbol] = (datetime.date.fromisoformat(first_date), datetime.date.fromisoformat(last_date))
+        return bar_date_ranges
+    except sqlite3.Error as e:
+        exit(f"Error fetching price history ranges from database: {e}")
+    finally:
+        cursor.close()
+
+def get_price_history_range(symbols: List[str], start: datetime.date = None, end: datetime.date = None,
+                            columns: Tuple[str, ...] = PRICE_HISTORY_COLUMNS) -> Iterator[Tuple[str, np.ndarray]]:
+    """
+    Read the daily bars of many stocks within a date range.
+    The bars of a symbol are a contiguous range of the (symbol, date) key, so every symbol is read with
+    a single range scan and only the bars of one symbol are held at a time.
+    Args:
+        symbols (List[str]): NSE symbols of the stocks.
+        start (datetime.date): First date of the range, unbounded if not given.
+        end (datetime.date): Last date of the range, unbounded if not given.
+        columns (Tuple[str, ...]): Bar columns to read, any of PRICE_HISTORY_COLUMNS.
+    Yields:
+        Tuple[str, np.ndarray]: Symbol and its bars in date order, as a structured array with a datetime64[D]
+            `date` field followed by the requested columns. Symbols without bars in the range are skipped.
+    """
+    if any(column not in PRICE_HISTORY_COLUMNS for column in columns):
+        raise ValueError(f"Unknown price history column, expected any of {PRICE_HISTORY_COLUMNS}")
+    dtype = np.dtype([("date", "datetime64[D]")] + [(column, np.float64) for column in columns])
+    start = (start or datetime.date.min).strftime("%Y-%m-%d")
+    end = (end or datetime.date.max).strftime("%Y-%m-%d")
+
+    connection, cursor = connect()
+    try:
+        for symbol in symbols:
+            cursor.execute(
+                f"SELECT date, {', '.join(columns)} FROM PriceHistory WHERE symbol = ? AND date BETWEEN ? AND ? ORDER BY date",
+                (symbol, start, end)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                continue
+
+            dates, *values = zip(*rows)
+            bars = np.empty(len(rows), dtype=dtype)
+            bars["date"] = np.array(dates, dtype="datetime64[D]")
+            for column, column_values in zip(columns, values):
+                bars[column] = column_values
+            yield symbol, bars
+    except sqlite3.Error as e:
+        exit(f"Error fetching price history from database: {e}")
+    finally:
+        cursor.close()
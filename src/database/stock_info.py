@@ -1,5 +1,7 @@
 import sqlite3
-from .connection import connect
+import datetime
+from typing import Dict, List, Optional
+from .connection import connect, now, fresh_since, chunks, TIMESTAMP_FORMAT
 from src.models.stock_info import StockInfo
 
 def create_stock_info_table() -> bool:
@@ -9,8 +11,8 @@ def create_stock_info_table() -> bool:
     Returns:
         bool: True if the table was created successfully, False otherwise.
     """
+    connection, cursor = connect()
     try:
-        connection, cursor = connect()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS StockInfo (
                 symbol TEXT PRIMARY KEY,
@@ -57,27 +59,30 @@ def create_stock_info_table() -> bool:
                 target_low_price REAL,
                 target_mean_price REAL,
                 dividend_yield REAL,
-                five_year_average_dividend_yield REAL
+                five_year_average_dividend_yield REAL,
+                fetched_at TEXT
             )
         """)
         return True
     except sqlite3.Error as e:
         exit(f"Error creating StockInfo table: {e}")
     finally:
-        connection.close()
+        cursor.close()
+
+STOCK_INFO_TTL = datetime.timedelta(days=1)    # Fundamentals and prices are refreshed daily
 
 def insert_stock_info_into_db(stock_info: StockInfo) -> bool:
     """
-    Insert a StockInfo object into the database.
+    Insert a StockInfo object into the database, replacing any stale row of the symbol.
     Args:
         stock_info (StockInfo): StockInfo object to insert into the database
     Returns:
         bool: True if the StockInfo object was inserted successfully, False otherwise.
     """
+    connection, cursor = connect()
     try:
-        connection, cursor = connect()
         cursor.execute("""
-            INSERT INTO StockInfo (
+            INSERT OR REPLACE INTO StockInfo (
                 symbol, symbol_yf, name, city, industry, sector, previous_close, volume, 
                 average_volume_10days, average_volume_3months, fifty_two_week_low, 
                 fifty_two_week_high, fifty_two_week_change, market_cap, book_value, 
@@ -88,7 +93,7 @@ def insert_stock_info_into_db(stock_info: StockInfo) -> bool:
                 total_revenue, revenue_per_share, gross_profit, revenue_growth, 
                 gross_margins, ebitda_margins, operating_margins, eps_trailing_12months, 
                 eps_forward, eps_current_year, target_high_price, target_low_price, 
-                target_mean_price, dividend_yield, five_year_average_dividend_yield
+                target_mean_price, dividend_yield, five_year_average_dividend_yield, fetched_at
             ) VALUES (
                 :symbol, :symbol_yf, :name, :city, :industry, :sector, :previous_close, :volume, 
                 :average_volume_10days, :average_volume_3months, :fifty_two_week_low, 
@@ -100,33 +105,91 @@ def insert_stock_info_into_db(stock_info: StockInfo) -> bool:
                 :total_revenue, :revenue_per_share, :gross_profit, :revenue_growth, 
                 :gross_margins, :ebitda_margins, :operating_margins, :eps_trailing_12months, 
                 :eps_forward, :eps_current_year, :target_high_price, :target_low_price, 
-                :target_mean_price, :dividend_yield, :five_year_average_dividend_yield
+                :target_mean_price, :dividend_yield, :five_year_average_dividend_yield, :fetched_at
             )
-        """, stock_info.__dict__)
+        """, {**stock_info.__dict__, "fetched_at": now()})
         return True
     except sqlite3.Error as e:
         exit(f"Error inserting stock info into database: {e}")
     finally:
-        connection.close()
+        cursor.close()
 
-def get_stock_info_from_db(symbol: str) -> StockInfo:
+def get_stock_info_from_db(symbol: str, max_age: datetime.timedelta = STOCK_INFO_TTL) -> StockInfo:
     """
     Get a StockInfo object from the database.
     Args:
         symbol (str): Stock symbol to get from the database
+        max_age (datetime.timedelta): Rows fetched longer ago than this are treated as missing
     Returns:
-        StockInfo: StockInfo object from the database
+        StockInfo: StockInfo object from the database, or None if missing or stale
     """
+    connection, cursor = connect()
     try:
-        connection, cursor = connect()
-        cursor.execute("SELECT * FROM StockInfo WHERE symbol = ?", (symbol,))
+        cursor.execute("SELECT * FROM StockInfo WHERE symbol = ? AND fetched_at >= ?", (symbol, fresh_since(max_age)))
         row = cursor.fetchone()
         if row:
             columns = [column[0] for column in cursor.description]
-            stock_info = StockInfo(**dict(zip(columns, row)))
+            row = dict(zip(columns, row))
+            row.pop("fetched_at")
+            stock_info = StockInfo(**row)
             return stock_info
         return None
     except Exception as e:
         exit(f"Error getting stock info from database: {e}")
     finally:
-        connection.close()
+        cursor.close()
+
+def get_stock_info_many(symbols: List[str], max_age: datetime.timedelta = STOCK_INFO_TTL) -> Dict[str, StockInfo]:
+    """
+    Get the StockInfo objects of many symbols from the database, with one query per chunk of symbols.
+    Args:
+        symbols (List[str]): Stock symbols to get from the database
+        max_age (datetime.timedelta): Rows fetched longer ago than this are treated as missing
+    Returns:
+        Dict[str, StockInfo]: Dictionary mapping symbols to StockInfo objects, without missing or stale symbols
+    """
+    connection, cursor = connect()
+    try:
+        oldest = fresh_since(max_age)
+        stock_infos = {}
+        for chunk in chunks(list(symbols)):
+            cursor.execute(
+                f"SELECT * FROM StockInfo WHERE symbol IN ({', '.join('?' * len(chunk))}) AND fetched_at >= ?",
+                (*chunk, oldest)
+            )
+            columns = [column[0] for column in cursor.description]
+            for row in cursor.fetchall():
+                row = dict(zip(columns, row))
+                row.pop("fetched_at")
+                stock_infos[row["symbol"]] = StockInfo(**row)
+        return stock_infos
+    except Exception as e:
+        exit(f"Error getting stock info from database: {e}")
+    finally:
+        cursor.close()
+
+def get_oldest_stock_info_fetch(symbols: List[str]) -> Optional[datetime.datetime]:
+    """
+    Get when the least recently fetched StockInfo row of the symbols was fetched, with one query per chunk of symbols.
+    Args:
+        symbols (List[str]): Stock symbols
+    Returns:
+        datetime.datetime: Oldest fetched_at among the symbols, None if any of them is not in the database
+    """
+    connection, cursor = connect()
+    try:
+        oldest = None
+        for chunk in chunks(sorted(set(symbols))):
+            cursor.execute(
+                f"SELECT COUNT(*), MIN(fetched_at) FROM StockInfo WHERE symbol IN ({', '.join('?' * len(chunk))})",
+                chunk
+            )
+            count, fetched_at = cursor.fetchone()
+            if count != len(chunk):
+                return None
+            oldest = fetched_at if oldest is None else min(oldest, fetched_at)
+        return datetime.datetime.strptime(oldest, TIMESTAMP_FORMAT) if oldest else None
+    except Exception as e:
+        exit(f"Error getting stock info from database: {e}")
+    finally:
+        cursor.close()
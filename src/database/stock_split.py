@@ -1,10 +1,13 @@
 import sqlite3
 import datetime
-from typing import List
+from typing import Dict, List
+import pandas as pd
 
-from .connection import connect
+from .connection import connect, now, chunks
 from src.models.stock_info import StockSplit
 
+STOCK_SPLIT_TTL = datetime.timedelta(days=7)     # Splits are announced well in advance, refreshed weekly
+
 def create_stock_split_table():
     """
     Create the StockSplit table in the database.
@@ -12,21 +15,23 @@ def create_stock_split_table():
     Returns:
         bool: True if the table was created successfully, False otherwise.
     """
+    connection, cursor = connect()
     try:
-        connection, cursor = connect()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS StockSplit (
                 symbol TEXT,
                 split_date DATE,
                 ratio REAL,
+                fetched_at TEXT,
                 PRIMARY KEY (symbol, split_date)
             )
         """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS StockSplitSymbol ON StockSplit (symbol, split_date, ratio)")    # Covers the per-symbol reads
         return True
     except sqlite3.Error as e:
         exit(f"Error creating StockSplit table: {e}")
     finally:
-        connection.close()
+        cursor.close()
 
 def insert_stock_split_into_db(symbol: str, split_date: datetime.date, ratio: float) -> bool:
     """
@@ -38,15 +43,43 @@ def insert_stock_split_into_db(symbol: str, split_date: datetime.date, ratio: fl
     Returns:
         bool: True if the stock split was inserted successfully, False otherwise.
     """
+    connection, cursor = connect()
     try:
-        connection, cursor = connect()
         split_date_str = datetime.datetime.strftime(split_date, "%Y-%m-%d")
-        cursor.execute("INSERT INTO StockSplit (symbol, split_date, ratio) VALUES (?, ?, ?)", (symbol, split_date_str, ratio))
+        cursor.execute("INSERT OR REPLACE INTO StockSplit (symbol, split_date, ratio, fetched_at) VALUES (?, ?, ?, ?)", (symbol, split_date_str, ratio, now()))
         return True
     except sqlite3.Error as e:
         exit(f"Error inserting stock split into database: {e}")
     finally:
-        connection.close()
+        cursor.close()
+
+def insert_splits_bulk(symbol: str, stock_splits: pd.DataFrame) -> bool:
+    """
+    Insert all stock splits of a stock into the database in a single transaction.
+    Splits already stored for a date are updated, so refetching a symbol is idempotent.
+    Args:
+        symbol (str): NSE symbol for the stock.
+        stock_splits (pd.DataFrame): DataFrame with the columns split_date and ratio.
+    Returns:
+        bool: True if the stock splits were inserted successfully, False otherwise.
+    """
+    connection, cursor = connect()
+    try:
+        fetched_at = now()
+        split_dates = pd.to_datetime(stock_splits['split_date']).dt.strftime("%Y-%m-%d")
+        cursor.execute("BEGIN")
+        cursor.executemany("""
+            INSERT INTO StockSplit (symbol, split_date, ratio, fetched_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT (symbol, split_date) DO UPDATE SET ratio = excluded.ratio, fetched_at = excluded.fetched_at
+        """, ((symbol, split_date, ratio, fetched_at) for split_date, ratio in zip(split_dates, stock_splits['ratio'].tolist())))
+        cursor.execute("COMMIT")
+        return True
+    except sqlite3.Error as e:
+        if connection.in_transaction:
+            cursor.execute("ROLLBACK")
+        exit(f"Error inserting stock splits into database: {e}")
+    finally:
+        cursor.close()
 
 def get_stock_splits_from_db(symbol: str) -> List[StockSplit]:
     """
@@ -56,8 +89,8 @@ def get_stock_splits_from_db(symbol: str) -> List[StockSplit]:
     Returns:
         List[StockSplit]: List of StockSplit objects for the given stock symbol.
     """
+    connection, cursor = connect()
     try:
-        connection, cursor = connect()
         cursor.execute("SELECT split_date, ratio FROM StockSplit WHERE symbol = ?", (symbol,))
         rows = cursor.fetchall()
         stock_splits = [StockSplit(split_date=datetime.datetime.strptime(row[0], "%Y-%m-%d").date(), ratio=row[1]) for row in rows]
@@ -65,4 +98,28 @@ def get_stock_splits_from_db(symbol: str) -> List[StockSplit]:
     except sqlite3.Error as e:
         exit(f"Error fetching stock splits from database: {e}")
     finally:
-        connection.close()
+        cursor.close()
+
+def get_stock_splits_many(symbols: List[str]) -> Dict[str, List[StockSplit]]:
+    """
+    Get the stock splits of many symbols from the database, with one query per chunk of symbols.
+    Args:
+        symbols (List[str]): NSE symbols of the stocks.
+    Returns:
+        Dict[str, List[StockSplit]]: Dictionary mapping every given symbol to its stock splits in date order.
+    """
+    connection, cursor = connect()
+    try:
+        stock_splits = {symbol: [] for symbol in symbols}
+        for chunk in chunks(list(symbols)):
+            cursor.execute(
+                f"SELECT symbol, split_date, ratio FROM StockSplit WHERE symbol IN ({', '.join('?' * len(chunk))}) ORDER BY symbol, split_date",
+                chunk
+            )
+            for symbol, split_date, ratio in cursor.fetchall():
+                stock_splits[symbol].append(StockSplit(split_date=datetime.date.fromisoformat(split_date), ratio=ratio))
+        return stock_splits
+    except sqlite3.Error as e:
+        exit(f"Error fetching stock splits from database: {e}")
+    finally:
+        cursor.close()
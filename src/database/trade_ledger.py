@@ -0,0 +1,244 @@
+import sqlite3
+from typing import Dict, Iterable, List
+import pandas as pd
+
+from .connection import connect, LEDGER_DATABASE
+
+LEDGER_COLUMNS = ['order_id', 'trade_id', 'symbol', 'quantity', 'price', 'trade_type', 'executed_at', 'remarks', 'source']
+
+def create_trade_ledger_table() -> bool:
+    """
+    Create the TradeLedger, LedgerFill, LedgerSource and DirtySymbol tables in the ledger database.
+    TradeLedger stores every fill ever ingested, keyed by its order id and trade id.
+    LedgerFill links every fill to all the files containing it, so a fill is only removed with the last of them.
+    LedgerSource stores the fingerprint of every ingested file so unchanged files are skipped.
+    DirtySymbol stores symbols whose trades changed since the holdings were last computed.
+    Returns:
+        bool: True if the tables were created successfully, False otherwise.
+    """
+    connection, cursor = connect(LEDGER_DATABASE)
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS TradeLedger (
+                order_id TEXT,
+                trade_id TEXT,
+                symbol TEXT,
+                quantity REAL,
+                price REAL,
+                trade_type TEXT,
+                executed_at TEXT,
+                remarks TEXT,
+                source TEXT,
+                PRIMARY KEY (order_id, trade_id)
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS TradeLedgerSource ON TradeLedger (source)")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS LedgerSource (
+                path TEXT PRIMARY KEY,
+                fingerprint TEXT
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS DirtySymbol (
+                symbol TEXT PRIMARY KEY
+            )
+        """)
+
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'LedgerFill'")
+        links_exist = cursor.fetchone() is not None
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS LedgerFill (
+                order_id TEXT,
+                trade_id TEXT,
+                source TEXT,
+                PRIMARY KEY (order_id, trade_id, source)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS LedgerFillSource ON LedgerFill (source)")
+        if not links_exist:
+            # Ledgers of older versions only know the first file of every fill, forgetting the fingerprints
+            # has every file read once more to link the fills it shares with other files
+            cursor.execute("INSERT OR IGNORE INTO LedgerFill (order_id, trade_id, source) SELECT order_id, trade_id, source FROM TradeLedger")
+            cursor.execute("DELETE FROM LedgerSource")
+        return True
+    except sqlite3.Error as e:
+        exit(f"Error creating TradeLedger tables: {e}")
+    finally:
+        cursor.close()
+
+def get_ledger_sources() -> Dict[str, str]:
+    """
+    Get the fingerprints of all files ingested into the ledger.
+    Returns:
+        Dict[str, str]: Dictionary mapping file paths to their fingerprint at ingestion time.
+    """
+    connection, cursor = connect(LEDGER_DATABASE)
+    try:
+        cursor.execute("SELECT path, fingerprint FROM LedgerSource")
+        return dict(cursor.fetchall())
+    except sqlite3.Error as e:
+        exit(f"Error fetching ledger sources from database: {e}")
+    finally:
+        cursor.close()
+
+def _unlink_source(cursor, source: str) -> List[str]:
+    """
+    Unlink the fills of a source file inside the caller's transaction. Fills which no other file
+    contains are removed, the others are attributed to one of their remaining files.
+    Args:
+        cursor: Cursor of the ledger database, in a transaction.
+        source (str): Path of the file the trades were read from.
+    Returns:
+        List[str]: Symbols of the removed fills.
+    """
+    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS UnlinkedFill (order_id TEXT, trade_id TEXT, PRIMARY KEY (order_id, trade_id))")
+    cursor.execute("DELETE FROM UnlinkedFill")
+    cursor.execute("INSERT INTO UnlinkedFill SELECT order_id, trade_id FROM LedgerFill WHERE source = ?", (source,))
+    cursor.execute("DELETE FROM LedgerFill WHERE source = ?", (source,))
+
+    orphaned = """
+        (order_id, trade_id) IN (SELECT order_id, trade_id FROM UnlinkedFill)
+        AND NOT EXISTS (
+            SELECT 1 FROM LedgerFill AS fill
+            WHERE fill.order_id = TradeLedger.order_id AND fill.trade_id = TradeLedger.trade_id
+        )
+    """
+    cursor.execute(f"SELECT DISTINCT symbol FROM TradeLedger WHERE {orphaned}")
+    dirty_symbols = [row[0] for row in cursor.fetchall()]
+    cursor.execute(f"DELETE FROM TradeLedger WHERE {orphaned}")
+    cursor.execute("""
+        UPDATE TradeLedger SET source = (
+            SELECT MIN(fill.source) FROM LedgerFill AS fill
+            WHERE fill.order_id = TradeLedger.order_id AND fill.trade_id = TradeLedger.trade_id
+        )
+        WHERE source = ?
+    """, (source,))
+    cursor.execute("DELETE FROM UnlinkedFill")
+    return dirty_symbols
+
+def ingest_trades_into_ledger(source: str, fingerprint: str, trade_batches: Iterable[pd.DataFrame], replace: bool = False) -> List[str]:
+    """
+    Append the trades of a source file to the ledger in a single transaction.
+    Trades are staged batch by batch, so a streamed file is never held in memory as a whole.
+    Fills already present in the ledger are ignored by key but linked to the source as well, and the
+    symbols of newly added fills are marked dirty. With `replace`, the previous trades of the source
+    are unlinked first, which is used for files without stable order ids such as the manual trades file.
+    Args:
+        source (str): Path of the file the trades were read from.
+        fingerprint (str): Fingerprint of the file, stored to skip it while it is unchanged.
+        trade_batches (Iterable[pd.DataFrame]): DataFrames with the columns listed in LEDGER_COLUMNS except source.
+        replace (bool): Whether to replace all trades previously ingested from the source.
+    Returns:
+        List[str]: Symbols whose trades changed.
+    """
+    connection, cursor = connect(LEDGER_DATABASE)
+    try:
+        cursor.execute("BEGIN")
+        cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS LedgerStaging ({', '.join(LEDGER_COLUMNS)})")
+        cursor.execute("DELETE FROM LedgerStaging")
+        for trades_df in trade_batches:
+            cursor.executemany(
+                f"INSERT INTO LedgerStaging VALUES ({', '.join('?' * len(LEDGER_COLUMNS))})",
+                trades_df.assign(source=source)[LEDGER_COLUMNS].itertuples(index=False, name=None)
+            )
+
+        dirty_symbols = set()
+        if replace:
+            dirty_symbols.update(_unlink_source(cursor, source))
+
+        cursor.execute("""
+            SELECT DISTINCT symbol FROM LedgerStaging AS staged
+            WHERE NOT EXISTS (
+                SELECT 1 FROM TradeLedger AS ledger
+                WHERE ledger.order_id = staged.order_id AND ledger.trade_id = staged.trade_id
+            )
+        """)
+        dirty_symbols.update(row[0] for row in cursor.fetchall())
+
+        cursor.execute(f"INSERT OR IGNORE INTO TradeLedger ({', '.join(LEDGER_COLUMNS)}) SELECT * FROM LedgerStaging")
+        cursor.execute("INSERT OR IGNORE INTO LedgerFill (order_id, trade_id, source) SELECT order_id, trade_id, source FROM LedgerStaging")
+        cursor.executemany("INSERT OR IGNORE INTO DirtySymbol (symbol) VALUES (?)", ((symbol,) for symbol in dirty_symbols))
+        cursor.execute("INSERT OR REPLACE INTO LedgerSource (path, fingerprint) VALUES (?, ?)", (source, fingerprint))
+        cursor.execute("DELETE FROM LedgerStaging")
+        cursor.execute("COMMIT")
+        return sorted(dirty_symbols)
+    except sqlite3.Error as e:
+        if connection.in_transaction:
+            cursor.execute("ROLLBACK")
+        exit(f"Error ingesting {source} into the trade ledger: {e}")
+    finally:
+        cursor.close()
+
+def remove_source_from_ledger(source: str) -> List[str]:
+    """
+    Remove a source file from the ledger, e.g. a tradebook file the user no longer selects.
+    Its fills are removed unless another ingested file contains them too.
+    Args:
+        source (str): Path of the file the trades were read from.
+    Returns:
+        List[str]: Symbols whose trades changed.
+    """
+    connection, cursor = connect(LEDGER_DATABASE)
+    try:
+        cursor.execute("BEGIN")
+        dirty_symbols = _unlink_source(cursor, source)
+        cursor.execute("DELETE FROM LedgerSource WHERE path = ?", (source,))
+        cursor.executemany("INSERT OR IGNORE INTO DirtySymbol (symbol) VALUES (?)", ((symbol,) for symbol in dirty_symbols))
+        cursor.execute("COMMIT")
+        return dirty_symbols
+    except sqlite3.Error as e:
+        if connection.in_transaction:
+            cursor.execute("ROLLBACK")
+        exit(f"Error removing {source} from the trade ledger: {e}")
+    finally:
+        cursor.close()
+
+def get_trades_from_ledger() -> pd.DataFrame:
+    """
+    Get every trade in the ledger.
+    Returns:
+        pd.DataFrame: DataFrame with the columns order_id, symbol, quantity, price, typ, timestamp, remarks.
+    """
+    connection, cursor = connect(LEDGER_DATABASE)
+    try:
+        cursor.execute("SELECT order_id, symbol, quantity, price, trade_type, executed_at, remarks FROM TradeLedger")
+        trades_df = pd.DataFrame(cursor.fetchall(), columns=['order_id', 'symbol', 'quantity', 'price', 'typ', 'timestamp', 'remarks'])
+        trades_df['timestamp'] = pd.to_datetime(trades_df['timestamp'], format="%Y-%m-%d %H:%M:%S")
+        return trades_df
+    except sqlite3.Error as e:
+        exit(f"Error fetching trades from the trade ledger: {e}")
+    finally:
+        cursor.close()
+
+def get_dirty_symbols() -> List[str]:
+    """
+    Get the symbols whose trades changed since the holdings were last computed.
+    Returns:
+        List[str]: Dirty symbols.
+    """
+    connection, cursor = connect(LEDGER_DATABASE)
+    try:
+        cursor.execute("SELECT symbol FROM DirtySymbol")
+        return [row[0] for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        exit(f"Error fetching dirty symbols from database: {e}")
+    finally:
+        cursor.close()
+
+def clear_dirty_symbols(symbols: List[str]) -> bool:
+    """
+    Mark symbols as clean once their holdings have been recomputed.
+    Args:
+        symbols (List[str]): Symbols to mark clean.
+    Returns:
+        bool: True if the symbols were cleared successfully, False otherwise.
+    """
+    connection, cursor = connect(LEDGER_DATABASE)
+    try:
+        cursor.executemany("DELETE FROM DirtySymbol WHERE symbol = ?", ((symbol,) for symbol in symbols))
+        return True
+    except sqlite3.Error as e:
+        exit(f"Error clearing dirty symbols in database: {e}")
+    finally:
+        cursor.close()
@@ -1,27 +1,110 @@
 import json
+from typing import Callable
 
-from src.lib.get_tradebook import generate_adjusted_tradebook, load_tradebook
+from src.lib.get_tradebook import generate_adjusted_tradebook, sync_trade_ledger, load_tradebook_from_ledger
 from src.lib.get_stock_info import get_stock_info_store, get_index_data
 from src.lib.generate_holdings import generate_holdings_from_tradebook
 from src.lib.get_holdings import load_holdings
+from src.lib.generate_valuation import generate_portfolio_valuation
+from src.lib.portfolio_analytics import PortfolioAnalytics
+from src.lib.controller_snapshot import load_controller_snapshot, save_controller_snapshot, SNAPSHOT_ATTRIBUTES
+from src.models.index_series import IndexSeries
+from src.models.portfolio import Portfolio
+from src.database import create_tables
+from src.database.trade_ledger import get_dirty_symbols, clear_dirty_symbols
+from src.database.holding_state import get_holding_states, save_holding_states
+
+STAGE_TRADEBOOK = "tradebook"          # Trades are loaded from the ledger
+STAGE_MARKET_DATA = "market_data"      # Stock information of n of N symbols is loaded
+STAGE_INDEX = "index"                  # Index closes are loaded
+STAGE_HOLDINGS = "holdings"            # Holdings are computed
 
 class Controller:
-    def __init__(self):
+    def __init__(self, refresh: bool = True):
         user_data = json.loads(open("metadata/user_data.json").read())
         self.name = user_data["name"]
         self.email = user_data["email"]
         self.tradebook_files = user_data["tradebook"]
         self.manual_trades_file = user_data["manual_tradebook"]
         self.holdings_file = user_data["holdings"]
-        
-        self.tradebook = load_tradebook(self.tradebook_files, self.manual_trades_file)
-        self.symbols = set(entry.symbol for entry in self.tradebook)
-        self.stock_info_store = get_stock_info_store(self.symbols)
-        self.adjusted_tradebook = generate_adjusted_tradebook(self.tradebook, self.stock_info_store)
-        self.index_returns = get_index_data()
-        self.calculated_holdings = generate_holdings_from_tradebook(self.symbols, self.adjusted_tradebook, self.index_returns, self.stock_info_store)
+
+        create_tables()
         self.actual_holdings = load_holdings(self.holdings_file)
-        
+        if refresh:     # Otherwise the caller runs refresh, e.g. on a background thread
+            self.refresh()
+
+    def refresh(self, progress: Callable[[str, int, int], None] = None, use_snapshot: bool = True):
+        """
+        Ingest new or changed tradebook files and recompute the holdings.
+        Holdings are computed from their saved state, so symbols without new trades are not replayed
+        and symbols with new trades only replay the new ones. The computed state is saved as a snapshot,
+        which is restored instead while the files are unchanged and the market data is still fresh.
+        Args:
+            progress (Callable[[str, int, int], None]): Called with the stage, the work done and the total work
+                as every stage completes. The attributes a stage fills are set before it is reported.
+            use_snapshot (bool): Restore the snapshot if it is valid, otherwise always recompute.
+        """
+        progress = progress or (lambda stage, done, total: None)
+        self.source_files = self.tradebook_files + ([self.manual_trades_file] if self.manual_trades_file != "" else [])
+        snapshot = load_controller_snapshot(self.source_files) if use_snapshot else None
+        if snapshot is not None:
+            for attribute in SNAPSHOT_ATTRIBUTES:
+                setattr(self, attribute, snapshot[attribute])
+            self._portfolio = None
+            progress(STAGE_TRADEBOOK, 1, 1)
+            progress(STAGE_MARKET_DATA, len(self.symbols), len(self.symbols))
+            progress(STAGE_INDEX, 1, 1)
+            progress(STAGE_HOLDINGS, 1, 1)
+            return
+
+        sync_trade_ledger(self.tradebook_files, self.manual_trades_file)
+        self.dirty_symbols = get_dirty_symbols()
+        self.tradebook = load_tradebook_from_ledger()
+        self.symbols = set(self.tradebook.symbols())
+        progress(STAGE_TRADEBOOK, 1, 1)
+
+        self.stock_info_store = get_stock_info_store(self.symbols, progress=lambda done, total: progress(STAGE_MARKET_DATA, done, total))
+        self.adjusted_tradebook = generate_adjusted_tradebook(self.tradebook, self.stock_info_store, self.source_files)
+        self.index_returns = get_index_data()
+        progress(STAGE_INDEX, 1, 1)
+
+        # Only symbols with new trades in the ledger (or new splits) are checked and replayed
+        holding_states = get_holding_states(self.symbols)
+        saved_keys = {symbol: (state.digest, state.split_key) for symbol, state in holding_states.items()}
+        self.calculated_holdings = generate_holdings_from_tradebook(self.symbols, self.adjusted_tradebook, self.index_returns, self.stock_info_store,
+                                                                    holding_states, dirty_symbols=self.dirty_symbols)
+        save_holding_states([state for symbol, state in holding_states.items() if saved_keys.get(symbol) != (state.digest, state.split_key)])
+        clear_dirty_symbols(self.dirty_symbols)
+
         # Separate holdings into current and past holdings
         self.current_holdings = [holding for holding in self.calculated_holdings if holding.quantity != 0]
-        self.past_holdings = [holding for holding in self.calculated_holdings if len(holding.realized_profit_history) != 0]
\ No newline at end of file
+        self.past_holdings = [holding for holding in self.calculated_holdings if len(holding.realized_profit_history) != 0]
+        self._portfolio = None
+        save_controller_snapshot({attribute: getattr(self, attribute) for attribute in SNAPSHOT_ATTRIBUTES}, self.source_files)
+        progress(STAGE_HOLDINGS, 1, 1)
+
+    @property
+    def portfolio(self) -> Portfolio:
+        """
+        Portfolio metrics of the calculated holdings, computed on first use after every refresh since they
+        need the daily price history of every holding.
+        """
+        if self._portfolio is None:
+            valuation = generate_portfolio_valuation(self.calculated_holdings)
+            self._portfolio = PortfolioAnalytics(self.calculated_holdings, valuation, IndexSeries.from_frame(self.index_returns)).portfolio()
+        return self._portfolio
+
+    def import_tradebook(self, tradebook_file: str):
+        """
+        Add a tradebook file, e.g. the fills of a new day, and refresh the holdings.
+        Args:
+            tradebook_file (str): Path of the tradebook CSV file
+        """
+        if tradebook_file not in self.tradebook_files:
+            self.tradebook_files.append(tradebook_file)
+            with open("metadata/user_data.json") as json_file:
+                user_data = json.load(json_file)
+            user_data["tradebook"] = self.tradebook_files
+            with open("metadata/user_data.json", "w") as json_file:
+                json.dump(user_data, json_file, indent=4)
+        self.refresh()
@@ -0,0 +1,119 @@
+import gc
+import os
+import pickle
+import hashlib
+import datetime
+from typing import Dict, List, Optional
+
+from src.lib.get_tradebook import ADJUSTED_TRADEBOOK_CACHE_VERSION
+from src.lib.get_stock_info import INDEX_TICKERS
+from src.database.fetch_log import get_oldest_fetch
+from src.database.stock_info import get_oldest_stock_info_fetch, STOCK_INFO_TTL
+from src.database.stock_split import STOCK_SPLIT_TTL
+from src.database.dividend import DIVIDEND_TTL
+from src.database.index import INDEX_TTL
+from src.database.holding_state import HOLDING_STATE_VERSION
+
+CONTROLLER_SNAPSHOT_VERSION = 1     # Bump whenever the snapshot attributes or the pipeline computing them change
+CONTROLLER_SNAPSHOT_PATH = "metadata/controller_snapshot.pkl"
+
+# Controller attributes computed by the pipeline, which are saved to and restored from the snapshot
+SNAPSHOT_ATTRIBUTES = (
+    'dirty_symbols', 'tradebook', 'symbols', 'stock_info_store', 'source_files', 'adjusted_tradebook',
+    'index_returns', 'calculated_holdings', 'current_holdings', 'past_holdings',
+)
+
+def get_snapshot_key(source_files: List[str]) -> str:
+    """
+    Compute the key of the controller snapshot, a hash of the paths and contents of the tradebook and
+    manual trades files together with the versions of everything the pipeline caches.
+    Args:
+        source_files (List[str]): Paths to the tradebook files and the manual trades file
+    Returns:
+        str: Hex digest identifying the inputs
+    """
+    digest = hashlib.sha256(f"v{CONTROLLER_SNAPSHOT_VERSION},{ADJUSTED_TRADEBOOK_CACHE_VERSION},{HOLDING_STATE_VERSION}".encode())
+    for file_path in source_files:
+        digest.update(file_path.encode())
+        with open(file_path, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+def get_market_data_expiry(symbols: List[str]) -> Optional[datetime.datetime]:
+    """
+    Get when the first of the market data used by the pipeline goes stale. Until then a recomputation
+    would read exactly the same stock info, splits, dividends and index closes from the database.
+    Args:
+        symbols (List[str]): Symbols of the tradebook
+    Returns:
+        datetime.datetime: Expiry of the market data, None if some of it was never fetched
+    """
+    fetches = [(get_oldest_fetch(list(INDEX_TICKERS), "index"), INDEX_TTL)]
+    if symbols:
+        fetches += [
+            (get_oldest_stock_info_fetch(symbols), STOCK_INFO_TTL),
+            (get_oldest_fetch(symbols, "splits"), STOCK_SPLIT_TTL),
+            (get_oldest_fetch(symbols, "dividends"), DIVIDEND_TTL),
+        ]
+    if any(fetched_at is None for fetched_at, ttl in fetches):
+        return None
+    return min(fetched_at + ttl for fetched_at, ttl in fetches)
+
+def save_controller_snapshot(state: Dict[str, object], source_files: List[str]) -> bool:
+    """
+    Atomically write the controller snapshot. Nothing is written if the state depends on market data
+    which could not be fetched, since a recomputation would try to fetch it again.
+    The header is pickled ahead of the state, so a stale snapshot is rejected without unpickling the state.
+    Args:
+        state (Dict[str, object]): Controller attributes in SNAPSHOT_ATTRIBUTES
+        source_files (List[str]): Paths to the tradebook files and the manual trades file
+    Returns:
+        bool: True if the snapshot was written, False otherwise
+    """
+    try:
+        if set(state['symbols']) - set(state['stock_info_store']):
+            return False
+        expires_at = get_market_data_expiry(sorted(state['symbols']))
+        if expires_at is None:
+            return False
+        header = {'version': CONTROLLER_SNAPSHOT_VERSION, 'key': get_snapshot_key(source_files), 'expires_at': expires_at}
+        with open(f"{CONTROLLER_SNAPSHOT_PATH}.tmp", "wb") as file:
+            pickle.dump(header, file, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{CONTROLLER_SNAPSHOT_PATH}.tmp", CONTROLLER_SNAPSHOT_PATH)
+        return True
+    except Exception as e:
+        print(f"Error saving controller snapshot {CONTROLLER_SNAPSHOT_PATH}: {e}")
+        return False
+
+def load_controller_snapshot(source_files: List[str]) -> Optional[Dict[str, object]]:
+    """
+    Load the controller snapshot if it was computed from the same files, by the same version of the
+    pipeline and its market data is still fresh.
+    Args:
+        source_files (List[str]): Paths to the tradebook files and the manual trades file
+    Returns:
+        Dict[str, object]: Controller attributes in SNAPSHOT_ATTRIBUTES, None if there is no valid snapshot
+    """
+    if not os.path.exists(CONTROLLER_SNAPSHOT_PATH):
+        return None
+    try:
+        with open(CONTROLLER_SNAPSHOT_PATH, "rb") as file:
+            header = pickle.load(file)
+            if header.get('version') != CONTROLLER_SNAPSHOT_VERSION or header.get('expires_at') <= datetime.datetime.now():
+                return None
+            if header.get('key') != get_snapshot_key(source_files):
+                return None
+            # The holdings unpickle into many small objects, which would trigger the cyclic garbage collector over and over
+            gc_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                state = pickle.load(file)
+            finally:
+                if gc_enabled:
+                    gc.enable()
+        return state if set(SNAPSHOT_ATTRIBUTES) <= set(state) else None
+    except Exception as e:
+        print(f"Error loading controller snapshot {CONTROLLER_SNAPSHOT_PATH}: {e}")
+        return None
@@ -0,0 +1,63 @@
+import threading
+from PyQt5.QtCore import QObject, pyqtSignal
+
+class PipelineCancelled(Exception):
+    """
+    Raised on the worker thread by the progress callback once the pipeline was cancelled.
+    """
+
+class ControllerWorker(QObject):
+    """
+    Creates the controller and runs its pipeline off the GUI thread, reporting every stage with a signal.
+    Move it to a QThread and connect the thread's started signal to `run`. The data of a stage is sent
+    with its signal, so slots never read controller attributes which the pipeline is still writing.
+    The controller module, and with it pandas and the database modules, is imported by `run` on the
+    worker thread, so it does not delay the first window.
+    The pipeline runs in a single slot, so the thread's event loop cannot stop it. `cancel` sets a flag
+    instead, which the pipeline checks every time it reports progress and then stops after the step it is in.
+    """
+    tradebook_loaded = pyqtSignal(object)               # Tradebook (TradeTable) before split adjustment
+    market_data_progress = pyqtSignal(int, int)         # Symbols with stock information, number of symbols
+    index_loaded = pyqtSignal()
+    holdings_computed = pyqtSignal(list, list, object)  # Current holdings, past holdings, adjusted tradebook
+    failed = pyqtSignal(str)
+    finished = pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        self.controller = None
+        self.cancelled = threading.Event()     # Set from the GUI thread, read on the worker thread
+
+    def cancel(self):
+        """
+        Stop the pipeline at its next progress report. Safe to call from any thread, `finished` is still emitted.
+        """
+        self.cancelled.set()
+
+    def run(self):
+        try:
+            from src.lib.controller import Controller
+            self.controller = Controller(refresh=False)
+            self.controller.refresh(progress=self.report)
+        except PipelineCancelled:
+            pass
+        except (Exception, SystemExit) as e:     # The database helpers exit on errors, which would end the thread silently
+            self.failed.emit(str(e))
+        finally:
+            self.finished.emit()
+
+    def report(self, stage: str, done: int, total: int):
+        """
+        Progress callback of `Controller.refresh`, called on the worker thread.
+        """
+        if self.cancelled.is_set():
+            raise PipelineCancelled()
+        from src.lib.controller import STAGE_TRADEBOOK, STAGE_MARKET_DATA, STAGE_INDEX, STAGE_HOLDINGS
+        if stage == STAGE_TRADEBOOK:
+            self.tradebook_loaded.emit(self.controller.tradebook)
+        elif stage == STAGE_MARKET_DATA:
+            self.market_data_progress.emit(done, total)
+        elif stage == STAGE_INDEX:
+            self.index_loaded.emit()
+        elif stage == STAGE_HOLDINGS:
+            self.holdings_computed.emit(self.controller.current_holdings, self.controller.past_holdings, self.controller.adjusted_tradebook)
@@ -1,57 +1,45 @@
-from datetime import timedelta, datetime
+from datetime import datetime
+from dataclasses import replace
+import numpy as np
 import pandas as pd
-from typing import List, Dict
-import copy
+from typing import Dict, Iterable, List, Tuple
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 from src.models.trade import Trade
-from src.models.holding import Holding
+from src.models.trade_table import TradeTable
+from src.models.index_series import IndexSeries, INDEX_NAMES, date_array
+from src.models.holding import Holding, make_trend
+from src.models.lot import OpenLot, LONG_TERM_HOLDING_PERIOD
+from src.models.holding_state import HoldingState
+from src.lib.match_lots import match_lots
 from src.models.stock_info import StockInfo
 
-def calculate_index_revenue_for_holding(holding: Holding, index_data: pd.DataFrame):
-    index_dict = {}
-    for _, row in index_data.iterrows():
-        index_dict[row["date"]] = [row["nifty50"], row["bsesensex"], row["niftybank"]]
-
-    holding.risk_free_return_trend.append([holding.investment_trend[0][0], 0])
-    holding.nifty50_return_trend.append([holding.investment_trend[0][0], 0])
-    holding.bsesensex_return_trend.append([holding.investment_trend[0][0], 0])
-    holding.niftybank_return_trend.append([holding.investment_trend[0][0], 0])
-
-    for ind in range(1, len(holding.investment_trend)):
-        last_date = holding.investment_trend[ind - 1][0]
-        current_date = holding.investment_trend[ind][0]
-        number_of_days = (holding.investment_trend[ind][0] - holding.investment_trend[ind - 1][0]).days
-
-        while last_date not in index_dict:
-            last_date -= timedelta(days=1)
-            while last_date.weekday() in (5, 6):
-                last_date -= timedelta(days=1)
-
-        if current_date in index_dict:
-            holding.risk_free_return_trend.append([current_date, holding.investment_trend[ind - 1][1] * number_of_days * 0.075 / 365])
-            holding.nifty50_return_trend.append([current_date, (index_dict[current_date][0] - index_dict[last_date][0]) * holding.investment_trend[ind - 1][1]])
-            holding.bsesensex_return_trend.append([current_date, (index_dict[current_date][1] - index_dict[last_date][1]) * holding.investment_trend[ind - 1][1]])
-            holding.niftybank_return_trend.append([current_date, (index_dict[current_date][2] - index_dict[last_date][2]) * holding.investment_trend[ind - 1][1]])
-        else:
-            print(f"Warning: Missing index data for current_date {current_date}. Skipping calculation for this period.")
-
-    last_available_date = index_data["date"].max()
-    number_of_days = (last_available_date - holding.investment_trend[-1][0]).days
-
-    last_date = holding.investment_trend[-1][0]
-    while last_date not in index_dict:
-        last_date -= timedelta(days=1)
-        while last_date.weekday() in (5, 6):
-            last_date -= timedelta(days=1)
-
-    # Ensure last_available_date exists in index_dict
-    if last_available_date in index_dict:
-        holding.risk_free_return_trend.append([last_available_date, holding.investment_trend[-1][1] * number_of_days * 0.075 / 365])
-        holding.nifty50_return_trend.append([last_available_date, (index_dict[last_available_date][0] - index_dict[last_date][0]) * holding.investment_trend[-1][1]])
-        holding.bsesensex_return_trend.append([last_available_date, (index_dict[last_available_date][1] - index_dict[last_date][1]) * holding.investment_trend[-1][1]])
-        holding.niftybank_return_trend.append([last_available_date, (index_dict[last_available_date][2] - index_dict[last_date][2]) * holding.investment_trend[-1][1]])
-    else:
-        print(f"Warning: Missing index data for last_available_date {last_available_date}. Skipping final calculation.")
+RISK_FREE_RATE = 0.075      # Annual return of the risk-free benchmark
+PARALLEL_HOLDINGS_THRESHOLD = 500     # Smaller books are computed in-process, spawning the pool takes about a second
+POOL_START_METHOD = "spawn"     # The pool is started from the controller's worker thread, forking a threaded process can deadlock
+
+def calculate_index_revenue_for_holding(holding: Holding, index_series: IndexSeries):
+    if len(index_series) == 0:
+        print(f"Warning: Missing index data. Skipping index returns for {holding.symbol}.")
+        return
+
+    # Every trend date is compared with the index closes on the latest trading day on or before it,
+    # the final period runs up to the last day with index data
+    dates = date_array([date for date, _ in holding.investment_trend] + [index_series.last_date])
+    investments = np.array([investment for _, investment in holding.investment_trend], dtype=np.float64)
+    prices = index_series.prices[index_series.asof_rows(dates)]
+
+    # Return of every period on the investment held during it, the first trend point is zero
+    number_of_days = np.diff(dates).astype(np.float64)
+    risk_free_returns = np.concatenate(([0.0], investments * number_of_days * RISK_FREE_RATE / 365))
+    index_returns = np.vstack((np.zeros(prices.shape[1]), np.diff(prices, axis=0) * investments[:, None]))
+
+    holding.risk_free_return_trend = make_trend(dates, risk_free_returns)
+    holding.nifty50_return_trend = make_trend(dates, index_returns[:, INDEX_NAMES.index('nifty50')])
+    holding.bsesensex_return_trend = make_trend(dates, index_returns[:, INDEX_NAMES.index('bsesensex')])
+    holding.niftybank_return_trend = make_trend(dates, index_returns[:, INDEX_NAMES.index('niftybank')])
 
 def calculate_dividend_revenue_for_holding(holding: Holding):
     dividends = holding.stock_info.dividends if holding.stock_info else []
@@ -71,93 +59,192 @@ def calculate_dividend_revenue_for_holding(holding: Holding):
         else:
             dividend_ptr += 1
 
-def generate_ltcg_stcg_for_holding(holding: Holding):
-    holding.running_trades = []
-    trades_copy = copy.deepcopy(holding.trades)
-    for current_trade in trades_copy:
-        while current_trade.quantity > 0:
-            if holding.running_trades == []:
-                holding.running_trades.append(current_trade)
-                break
-            
-            last_trade = holding.running_trades[0]
-            if last_trade.typ in ["buy", "bonus"] and current_trade.typ in ["buy", "bonus"]:
-                holding.running_trades.append(current_trade)
-                break
-            elif last_trade.typ == "sell" and current_trade.typ == "sell":
-                holding.running_trades.append(current_trade)
-                break
-            else:
-                matched_quantity = min(last_trade.quantity, current_trade.quantity)
-                last_trade.quantity -= matched_quantity
-                current_trade.quantity -= matched_quantity
-                if last_trade.quantity == 0:
-                    holding.running_trades.pop(0)
+def generate_ltcg_stcg_for_holding(holding: Holding, open_lots: Iterable[OpenLot]):
+    holding.running_trades = [replace(lot.trade, quantity=lot.quantity) for lot in open_lots]
 
     for trade in holding.running_trades:
-        if trade.timestamp < datetime.now() - timedelta(days=365):  # Long-term
+        if trade.timestamp < datetime.now() - LONG_TERM_HOLDING_PERIOD:  # Long-term
             holding.running_ltcg += trade.quantity * (holding.current_price - trade.price)
         else:  # Short-term
             holding.running_stcg += trade.quantity * (holding.current_price - trade.price)
 
-def generate_holdings_from_tradebook(symbols: List[str], tradebook: List[Trade], index_historical_data: pd.DataFrame, stock_info: Dict[str, StockInfo]) -> List[Holding]:
-    holdings = {symbol: Holding(symbol=symbol) for symbol in symbols}
-    for symbol in symbols:
-        if symbol in stock_info.keys():
-            holdings[symbol].stock_info = stock_info[symbol]
-
-    for trade in tradebook:
-        holdings[trade.symbol].trades.append(trade)
-    
-    for symbol in symbols:
-        current_position = None
-        holdings[symbol].trades.sort(key=lambda t: t.timestamp)
-        for trade in sorted(holdings[symbol].trades, key=lambda t: t.timestamp):
-            if holdings[symbol].quantity == 0:
-                current_position = 'buy' if trade.typ in ["buy", "bonus"] else 'sell'
-
-            if (current_position == 'buy' and trade.typ in ["buy", "bonus"]) or current_position == 'sell' and trade.typ == 'sell':
-                if trade.typ == 'buy' or trade.typ == 'bonus':
-                    holdings[symbol].quantity += trade.quantity
-                else:
-                    holdings[symbol].quantity -= trade.quantity
-
-                holdings[symbol].investment += abs(trade.quantity) * trade.price
-            
+    for lot in holding.realized_lots:
+        if lot.is_long_term:
+            holding.realized_ltcg += lot.gain
+        else:
+            holding.realized_stcg += lot.gain
+
+def replay_trades(state: HoldingState, trades: List[Trade]):
+    """
+    Continue the position walk of a symbol with trades executed after the ones already in the state.
+    Args:
+        state (HoldingState): State of the symbol, updated in place
+        trades (List[Trade]): New trades of the symbol in timestamp order
+    """
+    for trade in trades:
+        if state.quantity == 0:
+            state.current_position = 'buy' if trade.typ in ["buy", "bonus"] else 'sell'
+
+        if (state.current_position == 'buy' and trade.typ in ["buy", "bonus"]) or state.current_position == 'sell' and trade.typ == 'sell':
+            if trade.typ == 'buy' or trade.typ == 'bonus':
+                state.quantity += trade.quantity
             else:
-                if trade.typ == 'buy' or trade.typ == 'bonus':
-                    holdings[symbol].realized_profit_history.append([trade.timestamp, min(trade.quantity, -holdings[symbol].quantity) * (holdings[symbol].buy_average - trade.price)])
-                    holdings[symbol].quantity += trade.quantity
-                else:
-                    holdings[symbol].realized_profit_history.append([trade.timestamp, min(trade.quantity, holdings[symbol].quantity) * (trade.price - holdings[symbol].buy_average)])
-                    holdings[symbol].quantity -= trade.quantity
-
-                current_position = 'buy' if holdings[symbol].quantity >= 0 else 'sell'
-                holdings[symbol].realized_profit += holdings[symbol].realized_profit_history[-1][1]
-                holdings[symbol].investment = abs(holdings[symbol].investment - abs(trade.quantity) * holdings[symbol].buy_average)
-
-            if len(holdings[symbol].quantity_trend) > 0 and holdings[symbol].quantity_trend[-1][0] == trade.timestamp.date():
-                holdings[symbol].quantity_trend[-1][1] = holdings[symbol].quantity
-                holdings[symbol].investment_trend[-1][1] = holdings[symbol].investment
+                state.quantity -= trade.quantity
+
+            state.investment += abs(trade.quantity) * trade.price
+
+        else:
+            if trade.typ == 'buy' or trade.typ == 'bonus':
+                state.realized_profit_history.append([trade.timestamp, min(trade.quantity, -state.quantity) * (state.buy_average - trade.price)])
+                state.quantity += trade.quantity
             else:
-                holdings[symbol].quantity_trend.append([trade.timestamp.date(), holdings[symbol].quantity])
-                holdings[symbol].investment_trend.append([trade.timestamp.date(), holdings[symbol].investment])
-            holdings[symbol].buy_average = abs(holdings[symbol].investment / holdings[symbol].quantity) if holdings[symbol].quantity != 0 else 0
-
-        if symbol in stock_info.keys():
-            holdings[symbol].current_price = stock_info[symbol].previous_close
-            if current_position == 'buy' and holdings[symbol].quantity != 0:
-                holdings[symbol].unrealized_profit = (holdings[symbol].current_price - holdings[symbol].buy_average) * holdings[symbol].quantity
-            elif current_position == 'sell' and holdings[symbol].quantity != 0:
-                holdings[symbol].unrealized_profit = (holdings[symbol].buy_average - holdings[symbol].current_price) * holdings[symbol].quantity
-        
+                state.realized_profit_history.append([trade.timestamp, min(trade.quantity, state.quantity) * (trade.price - state.buy_average)])
+                state.quantity -= trade.quantity
+
+            state.current_position = 'buy' if state.quantity >= 0 else 'sell'
+            state.realized_profit += state.realized_profit_history[-1][1]
+            state.investment = abs(state.investment - abs(trade.quantity) * state.buy_average)
+
+        if len(state.quantity_trend) > 0 and state.quantity_trend[-1][0] == trade.timestamp.date():
+            state.quantity_trend[-1][1] = state.quantity
+            state.investment_trend[-1][1] = state.investment
         else:
-            holdings[symbol].current_price = "N/A"
-            holdings[symbol].unrealized_profit = "N/A"
+            state.quantity_trend.append([trade.timestamp.date(), state.quantity])
+            state.investment_trend.append([trade.timestamp.date(), state.investment])
+        state.buy_average = abs(state.investment / state.quantity) if state.quantity != 0 else 0
+        state.last_timestamp = trade.timestamp
+
+    state.open_lots, realized_lots = match_lots(trades, state.open_lots)
+    state.realized_lots.extend(realized_lots)
+
+def get_split_key(stock_info: StockInfo) -> str:
+    """
+    Key of the splits a symbol's trades are adjusted for, a state replayed with other splits is stale.
+    """
+    splits = sorted(stock_info.stock_splits, key=lambda split: split.split_date) if stock_info is not None else []
+    return ";".join(f"{split.split_date},{split.ratio}" for split in splits)
+
+def is_clean(state: HoldingState, trades: TradeTable, stock_info: StockInfo) -> bool:
+    """
+    Whether a saved state is still the state after all trades of a symbol, for a symbol which is not
+    dirty in the trade ledger. Its trades are then unchanged unless its splits changed.
+    """
+    return state is not None and state.trade_count == len(trades) and state.split_key == get_split_key(stock_info)
+
+def compute_holding(symbol: str, trades: TradeTable, stock_info: StockInfo, index_series: IndexSeries,
+                    state: HoldingState = None, clean: bool = False) -> Tuple[Holding, HoldingState]:
+    """
+    Compute the holding of a single symbol from its trades. Symbols are independent of each other,
+    so holdings can be computed in any order and in any process.
+    When a saved state is given and its trades are still the oldest trades of the symbol, only the
+    trades after them are replayed. Otherwise, e.g. when a split changed the adjusted trades or a
+    trade was inserted in the past, all trades are replayed.
+    Args:
+        symbol (str): NSE symbol of the stock
+        trades (TradeTable): Trades of the symbol in timestamp order
+        stock_info (StockInfo): Stock information of the symbol, None if unavailable
+        index_series (IndexSeries): Index closes shared by all holdings
+        state (HoldingState): State saved by a previous run, None to replay all trades
+        clean (bool): The state is known to cover exactly the trades, see `is_clean`, so they are
+            neither hashed nor replayed
+    Returns:
+        Holding: Holding of the symbol
+        HoldingState: State after replaying all trades of the symbol
+    """
+    if not clean:
+        if state is None or state.trade_count > len(trades) or state.split_key != get_split_key(stock_info) \
+                or trades.digest(state.trade_count) != state.digest:
+            state = HoldingState(symbol=symbol, split_key=get_split_key(stock_info))
+
+        if state.trade_count < len(trades):
+            replay_trades(state, list(trades.tail(state.trade_count)))
+            state.trade_count = len(trades)
+            state.digest = trades.digest()
+
+    holding = Holding(
+        symbol = symbol,
+        quantity = state.quantity,
+        buy_average = state.buy_average,
+        investment = state.investment,
+        trades = trades,      # Trade rows are only created when the view is iterated
+        investment_trend = state.investment_trend,
+        quantity_trend = state.quantity_trend,
+        realized_profit_history = state.realized_profit_history,
+        realized_profit = state.realized_profit,
+        realized_lots = state.realized_lots,
+        stock_info = stock_info
+    )
+
+    if stock_info is not None:
+        holding.current_price = stock_info.previous_close
+        if state.current_position == 'buy' and holding.quantity != 0:
+            holding.unrealized_profit = (holding.current_price - holding.buy_average) * holding.quantity
+        elif state.current_position == 'sell' and holding.quantity != 0:
+            holding.unrealized_profit = (holding.buy_average - holding.current_price) * holding.quantity
 
-        calculate_index_revenue_for_holding(holdings[symbol], index_historical_data)
-        calculate_dividend_revenue_for_holding(holdings[symbol])
-        generate_ltcg_stcg_for_holding(holdings[symbol])
-        
-    return list(holdings.values())
+    else:
+        holding.current_price = "N/A"
+        holding.unrealized_profit = "N/A"
+
+    calculate_index_revenue_for_holding(holding, index_series)
+    calculate_dividend_revenue_for_holding(holding)
+    generate_ltcg_stcg_for_holding(holding, state.open_lots)
+
+    return holding, state
+
+_index_series = None    # Index closes of a worker process, set once by the pool initializer
+
+def _init_worker(index_series: IndexSeries):
+    global _index_series
+    _index_series = index_series
+
+def _compute_holding_in_worker(task) -> Tuple[Holding, HoldingState]:
+    symbol, trades, stock_info, state, clean = task
+    return compute_holding(symbol, trades, stock_info, _index_series, state, clean)
+
+def generate_holdings_from_tradebook(symbols: List[str], tradebook: TradeTable, index_historical_data: pd.DataFrame, stock_info: Dict[str, StockInfo],
+                                     states: Dict[str, HoldingState] = None, max_workers: int = None,
+                                     dirty_symbols: Iterable[str] = None) -> List[Holding]:
+    """
+    Compute the holdings of all symbols in the tradebook.
+    Large books are split by symbol and computed on a process pool, every worker receives the index
+    closes once when it starts and then only the trades, stock info and saved state of its symbols.
+    Books with fewer than PARALLEL_HOLDINGS_THRESHOLD symbols are computed in-process, where starting
+    the pool would cost more than it saves. The workers are spawned rather than forked, since the pool
+    is started from a thread of a process with other threads (Qt, SQLite connections, fetchers) whose
+    locks a forked child would inherit in whatever state they are in.
+    Args:
+        symbols (List[str]): Symbols to compute holdings for
+        tradebook (TradeTable): Adjusted tradebook
+        index_historical_data (pd.DataFrame): Index closes with the columns date, nifty50, bsesensex, niftybank
+        stock_info (Dict[str, StockInfo]): Stock information by symbol
+        states (Dict[str, HoldingState]): Saved states by symbol, only new trades of these symbols are
+            replayed. Updated in place with the state of every symbol after its trades.
+        max_workers (int): Number of worker processes, defaults to the number of CPUs. 1 disables the pool.
+        dirty_symbols (Iterable[str]): Symbols whose trades changed in the trade ledger since the states were
+            saved. The saved state of any other symbol is reused without checking its trades, unless its
+            splits changed. None checks the trades of every symbol.
+    Returns:
+        List[Holding]: Holdings in the order of `symbols`
+    """
+    index_series = IndexSeries.from_frame(index_historical_data)    # Shared by all holdings
+    saved_states = states if states is not None else {}
+    dirty_symbols = set(dirty_symbols) if dirty_symbols is not None else None
+    tasks = []
+    for symbol in symbols:
+        trades, info, state = tradebook.for_symbol(symbol), stock_info.get(symbol), saved_states.get(symbol)
+        clean = dirty_symbols is not None and symbol not in dirty_symbols and is_clean(state, trades, info)
+        tasks.append((symbol, trades, info, state, clean))
 
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(tasks) < PARALLEL_HOLDINGS_THRESHOLD:
+        results = [compute_holding(symbol, trades, info, index_series, state, clean) for symbol, trades, info, state, clean in tasks]
+    else:
+        chunksize = max(1, len(tasks) // (max_workers * 4))
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(POOL_START_METHOD),
+                                 initializer=_init_worker, initargs=(index_series,)) as executor:
+            results = list(executor.map(_compute_holding_in_worker, tasks, chunksize=chunksize))
+
+    if states is not None:
+        states.update((state.symbol, state) for _, state in results)
+    return [holding for holding, _ in results]
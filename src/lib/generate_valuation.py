@@ -0,0 +1,97 @@
+import datetime
+from typing import Dict, List, Tuple
+import numpy as np
+
+from src.models.holding import Holding
+from src.models.index_series import date_array
+from src.models.portfolio_valuation import PortfolioValuation
+from src.models.stock_info import StockSplit
+from src.lib.get_stock_info import get_closes_store
+from src.lib.generate_holdings import get_split_key
+
+def asof_join(dates: np.ndarray, source_dates: np.ndarray, source_values: np.ndarray, before: float) -> np.ndarray:
+    """
+    Value of the latest source date on or before each date.
+    Args:
+        dates (np.ndarray): Dates to look up, datetime64[D]
+        source_dates (np.ndarray): Dates of the source values, datetime64[D] ascending
+        source_values (np.ndarray): Source values
+        before (float): Value of the dates before the first source date
+    Returns:
+        np.ndarray: float64 value for every date
+    """
+    rows = np.searchsorted(source_dates, dates, side="right") - 1
+    values = np.asarray(source_values, dtype=np.float64)[np.maximum(rows, 0)] if len(source_values) else np.zeros(len(dates))
+    return np.where(rows >= 0, values, before)
+
+def split_factors(dates: np.ndarray, stock_splits: List[StockSplit]) -> np.ndarray:
+    """
+    Product of the ratios of the splits after each date, which converts a quantity held on that date into
+    shares of today. Closes adjusted for the same splits value every day on the same basis, and the bonus
+    shares of a split leave the quantity unchanged. Closes adjusted for fewer splits are off by the missing
+    ratios, which is why `get_closes_store` fetches a history again when the splits of its stock change.
+    Args:
+        dates (np.ndarray): Dates to look up, datetime64[D]
+        stock_splits (List[StockSplit]): Splits of the stock
+    Returns:
+        np.ndarray: float64 factor for every date, 1 from the last split on
+    """
+    stock_splits = sorted(stock_splits, key=lambda split: split.split_date)
+    split_dates = date_array([split.split_date for split in stock_splits])
+    later_ratios = np.append(np.cumprod([split.ratio for split in stock_splits][::-1])[::-1], 1.0)
+    return later_ratios[np.searchsorted(split_dates, dates, side="right")]
+
+def generate_portfolio_valuation(holdings: List[Holding], closes: Dict[str, Tuple[np.ndarray, np.ndarray]] = None,
+                                 end: datetime.date = None) -> PortfolioValuation:
+    """
+    Value every holding on every trading day from the first trade on.
+    The date axis is the union of the trading days of all price histories. Quantities are taken from the
+    quantity trend of each holding and closes from its price history, both joined as of each date.
+    The closes are adjusted for later splits, so quantities are scaled to the shares they became after
+    those splits (see `split_factors`) and value, return and turnover are continuous across a split.
+    Args:
+        holdings (List[Holding]): Holdings with their quantity trends
+        closes (Dict[str, Tuple[np.ndarray, np.ndarray]]): Close dates and closes by symbol, adjusted for the
+            splits in the stock information of each holding. Loaded through the local price history cache,
+            which is kept on the basis of those splits, when not given
+        end (datetime.date): Last date of the valuation, defaults to the last close
+    Returns:
+        PortfolioValuation: Daily quantities, closes and values of every holding, and the portfolio total
+    """
+    holdings = [holding for holding in holdings if len(holding.quantity_trend) > 0]
+    symbols = [holding.symbol for holding in holdings]
+    if not holdings:
+        empty = np.empty((0, 0))
+        return PortfolioValuation(np.array([], dtype="datetime64[D]"), [], empty, empty, empty, np.array([]))
+
+    start = min(holding.quantity_trend[0][0] for holding in holdings)
+    if closes is None:
+        tickers = {holding.symbol: holding.stock_info.symbol_yf if holding.stock_info else f"{holding.symbol}.NS" for holding in holdings}
+        split_keys = {holding.symbol: get_split_key(holding.stock_info) for holding in holdings}
+        closes = get_closes_store(tickers, start, split_keys)
+
+    dates = np.unique(np.concatenate([closes.get(symbol, (np.array([], dtype="datetime64[D]"), None))[0] for symbol in symbols]))
+    dates = dates[dates >= np.datetime64(start, "D")]
+    if end is not None:
+        dates = dates[dates <= np.datetime64(end, "D")]
+
+    quantities = np.zeros((len(dates), len(symbols)))
+    prices = np.full((len(dates), len(symbols)), np.nan)
+    for column, holding in enumerate(holdings):
+        trend_dates = date_array([date for date, _ in holding.quantity_trend])
+        quantities[:, column] = asof_join(dates, trend_dates, [quantity for _, quantity in holding.quantity_trend], before=0.0)
+        if holding.stock_info and holding.stock_info.stock_splits:
+            quantities[:, column] *= split_factors(dates, holding.stock_info.stock_splits)
+        if holding.symbol in closes:
+            close_dates, close_values = closes[holding.symbol]
+            prices[:, column] = asof_join(dates, close_dates, close_values, before=np.nan)
+
+    values = np.nan_to_num(quantities * prices)
+    return PortfolioValuation(
+        dates = dates,
+        symbols = symbols,
+        quantities = quantities,
+        closes = prices,
+        values = values,
+        total = values.sum(axis=1)
+    )
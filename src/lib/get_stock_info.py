@@ -1,63 +1,90 @@
-import yfinance as yf
-from typing import Dict
 import datetime
+from typing import Callable, Dict, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
 
 from src.models.stock_info import StockInfo, StockSplit, Dividend
-from src.database.stock_info import insert_stock_info_into_db, get_stock_info_from_db
-from src.database.stock_split import insert_stock_split_into_db, get_stock_splits_from_db
-from src.database.dividend import insert_dividend_into_db, get_dividends_from_db
-from src.database.index import insert_index_into_db, get_index_from_db
+from src.database.stock_info import insert_stock_info_into_db, get_stock_info_from_db, get_stock_info_many
+from src.database.stock_split import insert_splits_bulk, get_stock_splits_from_db, get_stock_splits_many, STOCK_SPLIT_TTL
+from src.database.dividend import insert_dividends_bulk, get_dividends_from_db, get_dividends_many, DIVIDEND_TTL
+from src.database.index import upsert_index_frame, get_last_index_dates, get_index_from_db, INDEX_TTL
+from src.database.price_history import (insert_price_history_bulk, delete_price_history, get_bar_date_ranges, get_price_history_range,
+                                        set_requested_start, get_requested_starts, PRICE_HISTORY_TTL)
+from src.database.fetch_log import mark_fetched, is_fresh, get_fresh_symbols
+from src.lib.market_data import get_market_data_provider
 
-DATE_TODAY = datetime.datetime.now().date().strftime("%Y-%m-%d")
+MARKET_DATA_CONCURRENCY = 8     # Number of symbols fetched in parallel
+INDEX_TICKERS = {'nifty50': "^NSEI", 'bsesensex': "^BSESN", 'niftybank': "^NSEBANK"}
 
-def get_stock_splits(symbol: str, stock: yf.Ticker) -> list[StockSplit]:
+def get_stock_splits(symbol: str, ticker: str) -> list[StockSplit]:
     """
     Fetch stock split data for a given stock symbol and store it in the database.
 
     Args:
         symbol (str): Stock symbol.
-        stock (yf.Ticker): yfinance Ticker object.
+        ticker (str): Market data provider symbol of the stock.
 
     Returns:
         list[StockSplit]: List of StockSplit objects.
     """
     try:
-        stock_splits_df = stock.get_splits().to_frame()
-        stock_splits = []
-        for row in stock_splits_df.iterrows():
-            stock_splits.append(StockSplit(split_date=row[0].date(), ratio=row[1]['Stock Splits']))
-            insert_stock_split_into_db(symbol=symbol, split_date=row[0].date(), ratio=row[1]['Stock Splits'])
+        stock_splits_df = get_market_data_provider().get_splits(ticker).rename("ratio").rename_axis("split_date").reset_index()
+        insert_splits_bulk(symbol, stock_splits_df)
+        stock_splits = [
+            StockSplit(split_date=split_date.date(), ratio=ratio)
+            for split_date, ratio in zip(stock_splits_df['split_date'], stock_splits_df['ratio'].tolist())
+        ]
+        mark_fetched(symbol, "splits")
         return stock_splits
     except Exception as e:
         print(f"Error fetching stock splits for {symbol}: {e}")
         return []
 
-def get_dividends(symbol: str, stock: yf.Ticker) -> list[Dividend]:
+def get_dividends(symbol: str, ticker: str) -> list[Dividend]:
     """
     Fetch dividend data for a given stock symbol and store it in the database.
 
     Args:
         symbol (str): Stock symbol.
-        stock (yf.Ticker): yfinance Ticker object.
+        ticker (str): Market data provider symbol of the stock.
 
     Returns:
         list[Dividend]: List of Dividend objects.
     """
     try:
-        dividends_df = stock.get_dividends().to_frame()
-        dividends = []
-        for row in dividends_df.iterrows():
-            insert_dividend_into_db(symbol=symbol, ex_date=row[0].date(), amount=row[1]['Dividends'])
-            dividends.append(Dividend(ex_date=row[0].date(), amount=row[1]['Dividends']))
+        dividends_df = get_market_data_provider().get_dividends(ticker).rename("amount").rename_axis("ex_date").reset_index()
+        insert_dividends_bulk(symbol, dividends_df)
+        dividends = [
+            Dividend(ex_date=ex_date.date(), amount=amount)
+            for ex_date, amount in zip(dividends_df['ex_date'], dividends_df['amount'].tolist())
+        ]
+        mark_fetched(symbol, "dividends")
         return dividends
     except Exception as e:
         print(f"Error fetching dividends for {symbol}: {e}")
         return []
 
+def load_stock_splits(symbol: str, ticker: str) -> list[StockSplit]:
+    """
+    Get stock splits from the database while they are within their TTL, otherwise refetch them.
+    """
+    if is_fresh(symbol, "splits", STOCK_SPLIT_TTL):
+        return get_stock_splits_from_db(symbol)
+    return get_stock_splits(symbol, ticker)
+
+def load_dividends(symbol: str, ticker: str) -> list[Dividend]:
+    """
+    Get dividends from the database while they are within their TTL, otherwise refetch them.
+    """
+    if is_fresh(symbol, "dividends", DIVIDEND_TTL):
+        return get_dividends_from_db(symbol)
+    return get_dividends(symbol, ticker)
+
 def get_stock_info(symbol: str) -> StockInfo:
     """
-    Fetch stock information for a given symbol. First, check the database; if not found, fetch from yfinance.
+    Fetch stock information for a given symbol. First, check the database; if not found or older than its TTL,
+    fetch from the market data provider. Splits and dividends have their own TTLs and are only refetched once stale.
 
     Args:
         symbol (str): Stock symbol.
@@ -68,35 +95,35 @@ def get_stock_info(symbol: str) -> StockInfo:
     def get_value(key, default=None):
         return stock_info.get(key, default)
 
-    # Check if data exists in the database
+    # Check if fresh data exists in the database
     try:
         stock_info = get_stock_info_from_db(symbol)
         if stock_info:
-            stock_info.stock_splits = get_stock_splits_from_db(symbol)
-            stock_info.dividends = get_dividends_from_db(symbol)
+            stock_info.stock_splits = load_stock_splits(symbol, stock_info.symbol_yf)
+            stock_info.dividends = load_dividends(symbol, stock_info.symbol_yf)
             print(f"Fetching {symbol} from database")
             return stock_info
     except Exception as e:
         print(f"Error fetching {symbol} from database: {e}")
 
-    # If data does not exist, fetch from yfinance
+    # If data does not exist, fetch from the market data provider
+    provider = get_market_data_provider()
     stock_info = None
-    stock = None
+    ticker = f"{symbol}.NS"  # NSE
     try:
-        stock = yf.Ticker(f"{symbol}.NS")  # NSE
-        stock_info = stock.info
+        stock_info = provider.get_info(ticker)
     except Exception as e:
         print(f"Error fetching {symbol} from NSE: {e}")
 
     if not stock_info:
+        ticker = f"{symbol}.BO"  # BSE
         try:
-            stock = yf.Ticker(f"{symbol}.BO")  # BSE
-            stock_info = stock.info
+            stock_info = provider.get_info(ticker)
         except Exception as e:
             print(f"Error fetching {symbol} from BSE: {e}")
             return None
 
-    print(f"Fetched {symbol} from yfinance")
+    print(f"Fetched {symbol} from {provider.host}")
     # Create StockInfo object with all required fields
     try:
         info = StockInfo(
@@ -106,8 +133,8 @@ def get_stock_info(symbol: str) -> StockInfo:
             city=get_value('city', 'Unknown'),
             industry=get_value('industry', 'Unknown'),
             sector=get_value('sector', 'Unknown'),
-            stock_splits=get_stock_splits(symbol, stock),
-            dividends=get_dividends(symbol, stock),
+            stock_splits=load_stock_splits(symbol, ticker),
+            dividends=load_dividends(symbol, ticker),
             previous_close=get_value('previousClose', 0.0),
             volume=get_value('volume', 0),
             average_volume_10days=get_value('averageVolume10days', 0),
@@ -154,49 +181,187 @@ def get_stock_info(symbol: str) -> StockInfo:
         print(f"Error creating StockInfo object for {symbol}: {e}")
         return None
 
-def get_stock_info_store(symbols: list[str]) -> Dict[str, StockInfo]:
+def get_fresh_stock_info_store(symbols: list[str]) -> Dict[str, StockInfo]:
+    """
+    Load the symbols whose stock info, splits and dividends are all within their TTL from the database,
+    with one batched query per table instead of several queries per symbol.
+
+    Args:
+        symbols (list[str]): List of stock symbols.
+
+    Returns:
+        Dict[str, StockInfo]: Dictionary mapping the fresh symbols to StockInfo objects.
+    """
+    stock_info_store = get_stock_info_many(symbols)
+    fresh_symbols = sorted(
+        set(stock_info_store)
+        & get_fresh_symbols(list(stock_info_store), "splits", STOCK_SPLIT_TTL)
+        & get_fresh_symbols(list(stock_info_store), "dividends", DIVIDEND_TTL)
+    )
+    stock_splits = get_stock_splits_many(fresh_symbols)
+    dividends = get_dividends_many(fresh_symbols)
+    for symbol in fresh_symbols:
+        stock_info_store[symbol].stock_splits = stock_splits[symbol]
+        stock_info_store[symbol].dividends = dividends[symbol]
+    return {symbol: stock_info_store[symbol] for symbol in fresh_symbols}
+
+def get_stock_info_store(symbols: list[str], max_workers: int = MARKET_DATA_CONCURRENCY, fetch_stock_info: Callable[[str], StockInfo] = get_stock_info,
+                         progress: Callable[[int, int], None] = None) -> Dict[str, StockInfo]:
     """
     Fetch stock information for multiple symbols and store them in a dictionary.
+    Symbols which are fresh in the database are loaded in bulk. The remaining symbols are fetched
+    concurrently on a bounded thread pool, while requests to each host are spaced out by the shared
+    rate limiter. The store is filled in sorted symbol order regardless of the order in which the
+    fetches complete.
 
     Args:
         symbols (list[str]): List of stock symbols.
+        max_workers (int): Maximum number of symbols fetched at the same time.
+        fetch_stock_info (Callable[[str], StockInfo]): Function fetching a single symbol, replaceable by a stub in tests.
+        progress (Callable[[int, int], None]): Called with the number of symbols done and the number of symbols,
+            once after the fresh symbols are loaded and after every fetched symbol.
 
     Returns:
         Dict[str, StockInfo]: Dictionary mapping symbols to StockInfo objects.
     """
-    stock_info_store = {}
-    for symbol in symbols:
-        stock_info = get_stock_info(symbol)
-        if stock_info:
-            stock_info_store[symbol] = stock_info
-    return stock_info_store
+    symbols = sorted(symbols)
+    stock_info_store = get_fresh_stock_info_store(symbols)
+    for symbol in stock_info_store:
+        print(f"Fetching {symbol} from database")
+
+    stale_symbols = [symbol for symbol in symbols if symbol not in stock_info_store]
+    progress = progress or (lambda done, total: None)
+    progress(len(symbols) - len(stale_symbols), len(symbols))
+    if stale_symbols:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            for done, (symbol, stock_info) in enumerate(zip(stale_symbols, executor.map(fetch_stock_info, stale_symbols)), start=len(symbols) - len(stale_symbols) + 1):
+                if stock_info:
+                    stock_info_store[symbol] = stock_info
+                progress(done, len(symbols))
+    return {symbol: stock_info_store[symbol] for symbol in symbols if symbol in stock_info_store}
+
+def get_price_history(symbol: str, ticker: str, start: datetime.date, split_key: str = "",
+                      bar_date_range: Tuple[datetime.date, datetime.date] = None,
+                      requested_start: Tuple[datetime.date, Optional[str]] = None) -> bool:
+    """
+    Fetch the daily bars of a stock from the market data provider and append them to the database.
+    Only bars from the last stored bar on are fetched (the last bar is refetched as it may have been
+    stored before the close), unless the history needed starts before the start it was fetched from.
+    That start is compared rather than the first stored bar, which is later for stocks listed after
+    `start` or with a shorter history at the provider.
+    The provider adjusts bars for the splits known when they are fetched, so when the splits of the
+    stock changed since, the stored bars are on an old basis and the whole history is fetched again.
+
+    Args:
+        symbol (str): Stock symbol.
+        ticker (str): Market data provider symbol of the stock.
+        start (datetime.date): First date of the history needed.
+        split_key (str): Key of the current splits of the stock, see `generate_holdings.get_split_key`.
+        bar_date_range (Tuple[datetime.date, datetime.date]): First and last stored bar dates, None if nothing is stored.
+        requested_start (Tuple[datetime.date, Optional[str]]): Earliest date the history was fetched from and the
+            split key of the stored bars, None if it was never fetched.
+
+    Returns:
+        bool: True if the bars were fetched and stored, False otherwise.
+    """
+    try:
+        rebased = requested_start is None or requested_start[1] != split_key
+        fetch_start = start
+        if not rebased and requested_start[0] <= start and bar_date_range is not None:
+            fetch_start = bar_date_range[1]
+        history = get_market_data_provider().get_price_history(ticker, start=fetch_start.strftime("%Y-%m-%d"))
+        if rebased:
+            delete_price_history(symbol)
+        insert_price_history_bulk(symbol, history)
+        set_requested_start(symbol, start, split_key)
+        mark_fetched(symbol, "prices")
+        return True
+    except Exception as e:
+        print(f"Error fetching price history for {symbol}: {e}")
+        return False
+
+def get_closes_store(tickers: Dict[str, str], start: datetime.date, split_keys: Dict[str, str] = None,
+                     max_workers: int = MARKET_DATA_CONCURRENCY) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Get the daily closes of multiple stocks from the local price history. Histories older than their TTL,
+    fetched from a later date than `start` or adjusted for other splits than the current ones, are first
+    brought up to date concurrently on a bounded thread pool, fetching only the missing bars unless the
+    splits changed.
+
+    Args:
+        tickers (Dict[str, str]): Dictionary mapping stock symbols to their market data provider symbols.
+        start (datetime.date): First date of the history needed.
+        split_keys (Dict[str, str]): Dictionary mapping stock symbols to the key of their current splits, no
+            splits for symbols which are left out.
+        max_workers (int): Maximum number of symbols fetched at the same time.
+
+    Returns:
+        Dict[str, Tuple[np.ndarray, np.ndarray]]: Dictionary mapping symbols to their close dates and closes from `start` on,
+            adjusted for the current splits.
+    """
+    symbols = sorted(tickers)
+    split_keys = {symbol: (split_keys or {}).get(symbol, "") for symbol in symbols}
+    fresh_symbols = get_fresh_symbols(symbols, "prices", PRICE_HISTORY_TTL)
+    requested_starts = get_requested_starts(symbols)
+    covered_symbols = {
+        symbol for symbol, (requested_start, split_key) in requested_starts.items()
+        if requested_start <= start and split_key == split_keys[symbol]
+    }
+    stale_symbols = [symbol for symbol in symbols if symbol not in fresh_symbols or symbol not in covered_symbols]
+    if stale_symbols:
+        bar_date_ranges = get_bar_date_ranges(stale_symbols)
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            list(executor.map(lambda symbol: get_price_history(symbol, tickers[symbol], start, split_keys[symbol], bar_date_ranges.get(symbol),
+                                                               requested_starts.get(symbol)), stale_symbols))
+
+    return {symbol: (bars["date"], bars["close"]) for symbol, bars in get_price_history_range(symbols, start, columns=("close",))}
+
+def get_index_history(index_name: str, ticker: str, last_date: datetime.date = None) -> bool:
+    """
+    Fetch the closes of an index from the market data provider and append them to the database.
+    Only closes from the last stored date on are fetched (the last close is refetched as it may have
+    been stored intraday), or the last 5 years if nothing is stored yet.
+
+    Args:
+        index_name (str): Name of the index, as in INDEX_TICKERS.
+        ticker (str): Market data provider symbol of the index.
+        last_date (datetime.date): Date of the latest stored close, None if nothing is stored.
+
+    Returns:
+        bool: True if the closes were fetched and stored, False otherwise.
+    """
+    try:
+        provider = get_market_data_provider()
+        if last_date is None:
+            history = provider.get_index_history(ticker, period="5y")
+        else:
+            history = provider.get_index_history(ticker, start=last_date.strftime("%Y-%m-%d"))
+        index_data = history[["Close"]].rename(columns={'Close': index_name}).rename_axis('date').reset_index()
+        upsert_index_frame(index_data)
+        mark_fetched(index_name, "index")
+        return True
+    except Exception as e:
+        print(f"Error fetching index data for {index_name}: {e}")
+        return False
 
 def get_index_data() -> pd.DataFrame:
     """
-    Fetch index data from the database. If not available, fetch from yfinance and store in the database.
+    Fetch index data from the database. Indices which were not refreshed within their TTL are first brought
+    up to date from the market data provider, fetching only the closes after the latest stored one.
+    More indices can be tracked by adding them to INDEX_TICKERS.
 
     Returns:
-        pd.DataFrame: DataFrame containing index data.
+        pd.DataFrame: DataFrame with a date column and one column of closes per index in INDEX_TICKERS.
     """
     try:
-        index_data = get_index_from_db()
-        if index_data.empty:
-            nifty50 = yf.Ticker("^NSEI").history(period="5y").reset_index()[["Date", "Close"]]
-            bsesensex = yf.Ticker("^BSESN").history(period="5y").reset_index()[["Date", "Close"]]
-            niftybank = yf.Ticker("^NSEBANK").history(period="5y").reset_index()[["Date", "Close"]]
-
-            index_data = pd.concat([
-                nifty50.set_index('Date').rename(columns={'Close': 'nifty50'}),
-                bsesensex.set_index('Date').rename(columns={'Close': 'bsesensex'}),
-                niftybank.set_index('Date').rename(columns={'Close': 'niftybank'})
-            ], axis=1).reset_index().drop_duplicates(subset=['Date']).set_index('Date').reset_index()
-
-            # Convert Date column to date type
-            index_data['Date'] = index_data['Date'].dt.date
-            index_data.rename(columns={'Date': 'date'}, inplace=True)
-
-            insert_index_into_db(index_data)
-        return index_data
+        index_names = list(INDEX_TICKERS)
+        fresh_indices = get_fresh_symbols(index_names, "index", INDEX_TTL)
+        stale_indices = [index_name for index_name in index_names if index_name not in fresh_indices]
+        if stale_indices:
+            last_dates = get_last_index_dates(stale_indices)
+            for index_name in stale_indices:
+                get_index_history(index_name, INDEX_TICKERS[index_name], last_dates.get(index_name))
+        return get_index_from_db(index_names)
     except Exception as e:
         print(f"Error fetching index data: {e}")
-        return pd.DataFrame()
\ No newline at end of file
+        return pd.DataFrame()
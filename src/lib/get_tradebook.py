@@ -1,140 +1,273 @@
 import os
-import csv
+import glob
+import hashlib
+import multiprocessing
 from uuid import uuid4
+import numpy as np
 import pandas as pd
-import datetime
 from typing import List, Dict
-from collections import defaultdict as defaultDict
+from concurrent.futures import ProcessPoolExecutor
 
-from src.models.trade import Trade
+from src.models.trade_table import TradeTable, TRADE_TYPES, BUY, SELL
 from src.models.stock_info import StockInfo
+from src.lib.stream_tradebook import read_tradebook_chunks, stream_tradebook_files, parse_workers, POOL_START_METHOD
+from src.database.trade_ledger import get_ledger_sources, ingest_trades_into_ledger, remove_source_from_ledger, get_trades_from_ledger
 
-DATE_TODAY = datetime.datetime.now().date().strftime("%Y-%m-%d")
+ADJUSTED_TRADEBOOK_CACHE_VERSION = 2   # Bump whenever the adjustment logic or the cached columns change
+ADJUSTED_TRADEBOOK_CACHE_PREFIX = "metadata/adjusted_tradebook_"
 
-def load_manual_trades(file_path: str) -> List[Trade]:
+TRADEBOOK_COLUMNS = ['order_id', 'trade_id', 'symbol', 'quantity', 'price', 'typ', 'timestamp', 'remarks']
+
+def load_manual_trades_frame(file_path: str) -> pd.DataFrame:
     """
-    Function to read the manual trades of the user. Manual trades consists of all the other ways
-    in which user obtains or sells stocks, other than the trades recorded in the tradebook.
-    This includes trades from IPOs, ESOPs, Gifts, etc.
+    Read the manual trades CSV into a normalized trades DataFrame. Manual trades are all the other ways
+    in which the user obtains or sells stocks, other than the trades recorded in the tradebook, e.g.
+    IPOs, ESOPs and gifts.
     Args:
         file_path (str): Path to the CSV file containing manual trades
     Returns:
-        List[Trade]: List of Trade objects representing manual trades
+        pd.DataFrame: DataFrame with the columns listed in TRADEBOOK_COLUMNS
     """
     manual_trades_df = pd.read_csv(file_path)
-    manual_trades_df['symbol'] = manual_trades_df['symbol'].str.split('-').str[0]     # Normalize symbols
-
-    manual_trades = []
-    for trade in manual_trades_df.iterrows():
-        manual_trades.append(Trade(
-            order_id = uuid4(),
-            symbol = trade[1]['symbol'],
-            quantity = abs(trade[1]['quantity']),
-            price = trade[1]['price'],
-            typ = 'buy' if trade[1]['quantity'] > 0 else 'sell',
-            timestamp = datetime.datetime.strptime(trade[1]['trade_date'], "%Y-%m-%d").replace(hour=0, minute=0, second=0),
-            remarks = trade[1]['remarks']
-        ))
-    return manual_trades
+    return pd.DataFrame({
+        'order_id': [uuid4() for _ in range(len(manual_trades_df))],
+        'trade_id': manual_trades_df.index.astype(str),
+        'symbol': manual_trades_df['symbol'].str.split('-').str[0],     # Normalize symbols
+        'quantity': manual_trades_df['quantity'].abs(),
+        'price': manual_trades_df['price'],
+        'typ': np.where(manual_trades_df['quantity'] > 0, 'buy', 'sell'),
+        'timestamp': pd.to_datetime(manual_trades_df['trade_date'], format="%Y-%m-%d"),
+        'remarks': manual_trades_df['remarks']
+    }, columns=TRADEBOOK_COLUMNS)
+
+def load_tradebook_frame(tradebook_files: List[str]) -> pd.DataFrame:
+    """
+    Read the tradebook files into a single normalized trades DataFrame.
+    Files are parsed in chunks with an explicit dtype schema, see `read_tradebook_chunks`.
+    Args:
+        tradebook_files (List[str]): List of paths to the tradebook files
+    Returns:
+        pd.DataFrame: DataFrame with the columns listed in TRADEBOOK_COLUMNS, unsorted
+    """
+    chunks = [chunk for file in tradebook_files for chunk in read_tradebook_chunks(file)]
+    if not chunks:
+        return pd.DataFrame(columns=TRADEBOOK_COLUMNS)
+    return pd.concat(chunks, ignore_index=True)[TRADEBOOK_COLUMNS]
+
+def parse_tradebook_file(file_path: str) -> TradeTable:
+    """
+    Parse a single tradebook file into a TradeTable, which is sorted by timestamp within every symbol.
+    Runs in the worker processes of `parse_tradebook_files`, the compact columns are all that is sent back.
+    """
+    return TradeTable.from_frame(load_tradebook_frame([file_path]))
+
+def parse_tradebook_files(tradebook_files: List[str], max_workers: int = None) -> List[TradeTable]:
+    """
+    Parse tradebook files concurrently, one file per task on a process pool, see `parse_workers`.
+    Args:
+        tradebook_files (List[str]): List of paths to the tradebook files
+        max_workers (int): Number of worker processes, defaults to the number of CPUs. 1 disables the pool.
+    Returns:
+        List[TradeTable]: Table of every file, in the order of `tradebook_files`
+    """
+    max_workers = parse_workers(tradebook_files, max_workers)
+    if max_workers <= 1:
+        return [parse_tradebook_file(file_path) for file_path in tradebook_files]
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(POOL_START_METHOD)) as executor:
+        return list(executor.map(parse_tradebook_file, tradebook_files))
 
-def load_tradebook(tradebook_files: List[str], manual_trades_file: str) -> List[Trade]:
+def load_tradebook(tradebook_files: List[str], manual_trades_file: str, max_workers: int = None) -> TradeTable:
     """
     Load the tradebook from the tradebook files and manual trades file.
+    Files are parsed concurrently and their presorted tables merged, see `TradeTable.concat`.
     Args:
         tradebook_files (List[str]): List of paths to the tradebook files
         manual_trades_file (str): Path to the manual trades file
+        max_workers (int): Number of processes parsing the tradebook files, 1 parses them in-process
+    Returns:
+        TradeTable: Columnar table of the tradebook, iterating yields Trade objects in timestamp order
+    """
+    tables = parse_tradebook_files(tradebook_files, max_workers)
+    if manual_trades_file != "":
+        tables.append(TradeTable.from_frame(load_manual_trades_frame(manual_trades_file)))
+    return TradeTable.concat(tables)    # Sorted by order execution time within every symbol
+
+def get_file_fingerprint(file_path: str) -> str:
+    """
+    Cheap fingerprint of a file used to detect whether it changed since it was ingested.
+    Args:
+        file_path (str): Path to the file
     Returns:
-        List[Trade]: List of Trade objects representing the tradebook
-    """
-    fiscal_year_trades = [pd.read_csv(file) for file in tradebook_files]    # Read all tradebook files for individual fiscal year
-    tradebook_df = pd.concat(fiscal_year_trades, ignore_index=True)    # Combine all tradebook files
-    tradebook_df = tradebook_df.sort_values(by="order_execution_time")    # Sort by order execution time
-    tradebook_df['symbol'] = tradebook_df['symbol'].str.split('-').str[0]     # Normalize symbols
-
-    tradebook = []
-    for trade in tradebook_df.iterrows():
-        tradebook.append(Trade(
-            order_id = trade[1]['order_id'],
-            symbol = trade[1]['symbol'],
-            quantity = trade[1]['quantity'],
-            price = trade[1]['price'],
-            typ = trade[1]['trade_type'],
-            timestamp = datetime.datetime.strptime(trade[1]['order_execution_time'], "%Y-%m-%dT%H:%M:%S")
+        str: Size and modification time of the file
+    """
+    stat = os.stat(file_path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+def to_ledger_frame(trades_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert a normalized trades DataFrame into the column layout of the trade ledger.
+    """
+    return pd.DataFrame({
+        'order_id': trades_df['order_id'].astype(str),
+        'trade_id': trades_df['trade_id'].astype(str),
+        'symbol': trades_df['symbol'],
+        'quantity': trades_df['quantity'].astype(float),
+        'price': trades_df['price'].astype(float),
+        'trade_type': trades_df['typ'],
+        'executed_at': trades_df['timestamp'].dt.strftime("%Y-%m-%d %H:%M:%S"),
+        'remarks': trades_df['remarks'].fillna("").astype(str)
+    })
+
+def sync_trade_ledger(tradebook_files: List[str], manual_trades_file: str) -> List[str]:
+    """
+    Bring the persistent trade ledger in sync with the tradebook files and manual trades file.
+    Only files which are new or changed since their last ingestion are read, fills already in the
+    ledger are skipped by key and files no longer selected are removed from the ledger.
+    Args:
+        tradebook_files (List[str]): List of paths to the tradebook files
+        manual_trades_file (str): Path to the manual trades file
+    Returns:
+        List[str]: Symbols whose trades changed, these are also marked dirty in the ledger
+    """
+    ingested_sources = get_ledger_sources()
+    current_sources = tradebook_files + ([manual_trades_file] if manual_trades_file != "" else [])
+
+    dirty_symbols = set()
+    for source in ingested_sources.keys() - set(current_sources):
+        dirty_symbols.update(remove_source_from_ledger(source))
+
+    fingerprints = {file_path: get_file_fingerprint(file_path) for file_path in current_sources}
+    changed_files = [file_path for file_path in tradebook_files if ingested_sources.get(file_path) != fingerprints[file_path]]
+    for file_path, trade_batches in stream_tradebook_files(changed_files):     # Files are parsed concurrently, then ingested one by one
+        dirty_symbols.update(ingest_trades_into_ledger(
+            file_path, fingerprints[file_path], (to_ledger_frame(trades_df) for trades_df in trade_batches)
         ))
 
-    if manual_trades_file != "":
-        other_trades = load_manual_trades(manual_trades_file)
-        tradebook.extend(other_trades)
-        tradebook.sort(key=lambda t: t.timestamp)
-    return tradebook
+    if manual_trades_file != "" and ingested_sources.get(manual_trades_file) != fingerprints[manual_trades_file]:
+        # Manual trades have no order ids, so the file is replaced as a whole
+        dirty_symbols.update(ingest_trades_into_ledger(
+            manual_trades_file, fingerprints[manual_trades_file], [to_ledger_frame(load_manual_trades_frame(manual_trades_file))], replace=True
+        ))
+    return sorted(dirty_symbols)
+
+def load_tradebook_from_ledger() -> TradeTable:
+    """
+    Load the tradebook from the persistent trade ledger, see `sync_trade_ledger`.
+    Returns:
+        TradeTable: Columnar table of the tradebook, iterating yields Trade objects in timestamp order
+    """
+    return TradeTable.from_frame(get_trades_from_ledger())
 
-def generate_adjusted_tradebook(tradebook: List[Trade], stock_info_store: Dict[str, StockInfo]) -> List[Trade]:
+def get_adjusted_tradebook_cache_key(source_files: List[str], stock_info_store: Dict[str, StockInfo]) -> str:
+    """
+    Compute the cache key of the adjusted tradebook. The key is a hash of the contents of the tradebook
+    and manual trades files together with the split data of every stock, so the cache is reused across
+    days and invalidated as soon as any of its inputs change.
+    Args:
+        source_files (List[str]): Paths to the tradebook files and the manual trades file
+        stock_info_store (Dict[str, StockInfo]): Dictionary containing stock info for each symbol
+    Returns:
+        str: Hex digest identifying the inputs
+    """
+    digest = hashlib.sha256(f"v{ADJUSTED_TRADEBOOK_CACHE_VERSION}".encode())
+    for file_path in source_files:
+        digest.update(file_path.encode())
+        with open(file_path, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+
+    for symbol in sorted(stock_info_store):
+        for split in sorted(stock_info_store[symbol].stock_splits, key=lambda split: split.split_date):
+            digest.update(f"{symbol},{split.split_date},{split.ratio};".encode())
+    return digest.hexdigest()
+
+def compute_split_bonus_quantities(trades: TradeTable, split_timestamps: np.ndarray, split_ratios: np.ndarray) -> np.ndarray:
+    """
+    Compute the bonus shares issued to a position by each stock split.
+    The position before every split is read from the cumulative sum of signed trade quantities at the
+    split's `searchsorted` location, so the cost is O(trades + splits) for the symbol. A split only
+    issues bonus shares while the position is long, and bonus shares of earlier splits are part of
+    the position seen by later ones.
+    Args:
+        trades (TradeTable): Trades of a single symbol, sorted by timestamp
+        split_timestamps (np.ndarray): Sorted int64 nanosecond timestamps of the splits
+        split_ratios (np.ndarray): Ratio of every split
+    Returns:
+        np.ndarray: Bonus quantity for every split, 0 where no shares were issued
+    """
+    signed_quantities = np.where(trades.types == BUY, trades.quantities, np.where(trades.types == SELL, -trades.quantities, 0))
+    positions = np.concatenate([[0.0], np.cumsum(signed_quantities)])
+    positions_at_split = positions[np.searchsorted(trades.timestamps, split_timestamps, side="right")]     # Trades at the split time come first
+
+    bonus_quantities = np.zeros(len(split_ratios))
+    issued_bonus = 0.0
+    for ind in range(len(split_ratios)):
+        position = positions_at_split[ind] + issued_bonus
+        if position > 0:
+            bonus_quantities[ind] = position * (split_ratios[ind] - 1)    # Split ratio - 1
+            issued_bonus += bonus_quantities[ind]
+    return bonus_quantities
+
+def generate_adjusted_tradebook(tradebook: TradeTable, stock_info_store: Dict[str, StockInfo], source_files: List[str]) -> TradeTable:
     """
     Generate an adjusted tradebook by accounting for stock splits and bonus shares.
+    The result is cached in metadata/ as a .npz file keyed by the hash of all its inputs.
     Args:
-        tradebook (List[Trade]): List of Trade objects representing the tradebook
+        tradebook (TradeTable): Table of trades representing the tradebook
         stock_info_store (Dict[str, StockInfo]): Dictionary containing stock info for each symbol
+        source_files (List[str]): Paths to the tradebook files and the manual trades file the tradebook was loaded from
     Returns:
-        List[Trade]: List of Trade objects representing the adjusted tradebook
-    """
-    if os.path.exists(f'metadata/adjusted_tradebook_{DATE_TODAY}.csv'):
-        tradebook = pd.read_csv(f'metadata/adjusted_tradebook_{DATE_TODAY}.csv')
-        adjusted_tradebook = []
-        for entry in tradebook.iterrows():
-            adjusted_tradebook.append(Trade(
-                order_id = entry[1]['order_id'],
-                symbol = entry[1]['symbol'],
-                quantity = entry[1]['quantity'],
-                price = entry[1]['price'],
-                typ = entry[1]['type'],
-                timestamp = datetime.datetime.strptime(entry[1]['date'], "%Y-%m-%d %H:%M:%S"),
-                remarks = entry[1]['remarks'] if not pd.isna(entry[1]['remarks']) else ""
-            ))
-        return adjusted_tradebook
-
-    tradebook_copy = tradebook.copy()
-    for stock in stock_info_store.values():
-        for split in stock.stock_splits:
-            tradebook_copy.append(Trade(
-                order_id = uuid4(), 
-                symbol = stock.symbol, 
-                quantity = 0, 
-                price = split.ratio, 
-                typ = 'bonus', 
-                timestamp = datetime.datetime.combine(split.split_date, datetime.time(0, 0, 0))))
-    
-    tradebook_copy.sort(key=lambda t: t.timestamp)
-
-    adjusted_tradebook = []
-    holdings = defaultDict(int)  # Track current holdings for each symbol
-
-    for trade in tradebook_copy:
-        if trade.typ == 'buy':
-            holdings[trade.symbol] += trade.quantity
-            adjusted_tradebook.append(trade)
-        
-        elif trade.typ == 'sell':
-            holdings[trade.symbol] -= trade.quantity
-            adjusted_tradebook.append(trade)
-        
-        elif trade.typ == 'bonus':
-            if holdings[trade.symbol] > 0:
-                bonus_quantity = holdings[trade.symbol] * (trade.price - 1)     # Split ratio - 1
-                holdings[trade.symbol] += bonus_quantity
-                adjusted_tradebook.append(Trade(
-                    order_id = uuid4(),
-                    symbol = trade.symbol, 
-                    quantity = bonus_quantity, 
-                    price = 0, 
-                    typ = 'bonus', 
-                    timestamp = trade.timestamp, 
-                    remarks="bonus shares"))
-
-    # Save adjusted_tradebook to a CSV file
-    with open(f'metadata/adjusted_tradebook_{DATE_TODAY}.csv', mode='w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(['order_id', 'symbol', 'quantity', 'price', 'type', 'date', 'remarks'])
-        for entry in adjusted_tradebook:
-            writer.writerow([entry.order_id, entry.symbol, entry.quantity, entry.price, entry.typ, entry.timestamp.strftime("%Y-%m-%d %H:%M:%S"), entry.remarks])
-
-    return adjusted_tradebook
\ No newline at end of file
+        TradeTable: Table of trades representing the adjusted tradebook
+    """
+    cache_path = f"{ADJUSTED_TRADEBOOK_CACHE_PREFIX}{get_adjusted_tradebook_cache_key(source_files, stock_info_store)}.npz"
+    if os.path.exists(cache_path):
+        try:
+            return TradeTable.load_npz(cache_path)
+        except Exception as e:
+            print(f"Error loading adjusted tradebook cache {cache_path}: {e}")
+
+    bonus_symbols, bonus_quantities, bonus_timestamps = [], [], []
+    for symbol, stock in stock_info_store.items():
+        if not stock.stock_splits:
+            continue
+        splits = sorted(stock.stock_splits, key=lambda split: split.split_date)
+        split_timestamps = np.array([split.split_date for split in splits], dtype="datetime64[ns]").view(np.int64)
+        split_ratios = np.array([split.ratio for split in splits], dtype=np.float64)
+
+        quantities = compute_split_bonus_quantities(tradebook.for_symbol(symbol), split_timestamps, split_ratios)
+        issued = quantities > 0
+        bonus_symbols.extend([symbol] * int(issued.sum()))
+        bonus_quantities.append(quantities[issued])
+        bonus_timestamps.append(split_timestamps[issued])
+
+    number_of_bonuses = len(bonus_symbols)
+    # Stable ids keep the digests of the holding states valid when the adjusted tradebook is rebuilt
+    bonus_dates = np.datetime_as_string(np.concatenate([np.zeros(0, dtype=np.int64), *bonus_timestamps]).view("datetime64[ns]"), unit="D")
+    bonus_order_ids = [f"bonus:{symbol}:{date}" for symbol, date in zip(bonus_symbols, bonus_dates)]
+    adjusted_tradebook = TradeTable.from_columns(
+        order_ids = np.concatenate([tradebook.order_ids, np.array(bonus_order_ids, dtype=object)]),
+        symbols = np.concatenate([tradebook.symbol_names[tradebook.symbol_codes], np.array(bonus_symbols, dtype=object)]),
+        quantities = np.concatenate([tradebook.quantities, *bonus_quantities]),
+        prices = np.concatenate([tradebook.prices, np.zeros(number_of_bonuses)]),
+        types = np.concatenate([np.asarray(TRADE_TYPES, dtype=object)[tradebook.types], np.full(number_of_bonuses, 'bonus', dtype=object)]),
+        timestamps = np.concatenate([tradebook.timestamps, *bonus_timestamps]).view("datetime64[ns]"),
+        remarks = np.concatenate([tradebook.remarks, np.full(number_of_bonuses, "bonus shares", dtype=object)])
+    )   # Bonus rows come after trades with the same timestamp, as the split applies to the position at that time
+    save_adjusted_tradebook_cache(adjusted_tradebook, cache_path)
+    return adjusted_tradebook
+
+def save_adjusted_tradebook_cache(adjusted_tradebook: TradeTable, cache_path: str):
+    """
+    Atomically write the adjusted tradebook cache and remove caches of older inputs.
+    Args:
+        adjusted_tradebook (TradeTable): Adjusted tradebook to cache
+        cache_path (str): Path of the cache file
+    """
+    try:
+        adjusted_tradebook.save_npz(f"{cache_path}.tmp")
+        os.replace(f"{cache_path}.tmp", cache_path)
+        for stale_path in glob.glob(f"{ADJUSTED_TRADEBOOK_CACHE_PREFIX}*"):
+            if stale_path != cache_path:
+                os.remove(stale_path)
+    except OSError as e:
+        print(f"Error saving adjusted tradebook cache {cache_path}: {e}")
\ No newline at end of file
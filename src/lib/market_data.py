@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import random
+from functools import lru_cache
+from typing import Protocol
+import pandas as pd
+
+from src.lib.rate_limiter import RateLimiter
+
+MARKET_DATA_FIXTURES_ENV = "PORTFOLIO360_MARKET_DATA_FIXTURES"   # Serve market data from recorded fixtures in this directory
+HISTORY_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+TICKER_CACHE_SIZE = 256     # yfinance Tickers kept alive, enough for every symbol being fetched concurrently
+
+rate_limiter = RateLimiter(requests_per_second=10)   # Per host limit shared by all fetcher threads
+
+class MarketDataProvider(Protocol):
+    """
+    Source of market data used by src.lib.get_stock_info.
+    Tickers are provider symbols such as "INFY.NS" or "^NSEI". Dates in the returned series are naive
+    and in exchange local time.
+    """
+    host: str
+
+    def get_info(self, ticker: str) -> dict:
+        """Fundamentals of the ticker in the yfinance `info` layout, empty if unknown."""
+        ...
+
+    def get_splits(self, ticker: str) -> pd.Series:
+        """Split ratios indexed by split date."""
+        ...
+
+    def get_dividends(self, ticker: str) -> pd.Series:
+        """Dividend amounts indexed by ex-date."""
+        ...
+
+    def get_price_history(self, ticker: str, period: str = "5y", start: str = None) -> pd.DataFrame:
+        """
+        Daily Open, High, Low, Close, Volume bars indexed by date, from `start` if given else for `period`.
+        Prices are adjusted for splits but not for dividends, so a close times the split-adjusted quantity
+        is the market value of the position on that day.
+        """
+        ...
+
+    def get_index_history(self, ticker: str, period: str = "5y", start: str = None) -> pd.DataFrame:
+        """Daily bars of a market index, in the same layout as `get_price_history`."""
+        ...
+
+def _naive_index(data):
+    if isinstance(data.index, pd.DatetimeIndex) and data.index.tz is not None:
+        data.index = data.index.tz_localize(None)
+    data.index.name = "Date"
+    return data
+
+def _period_offset(period: str) -> pd.DateOffset:
+    """
+    Convert a yfinance period such as "5d", "6mo" or "5y" into a DateOffset.
+    """
+    for suffix, unit in (("mo", "months"), ("d", "days"), ("y", "years")):
+        if period.endswith(suffix):
+            return pd.DateOffset(**{unit: int(period[:-len(suffix)])})
+    raise ValueError(f"Unsupported period {period}")
+
+@lru_cache(maxsize=TICKER_CACHE_SIZE)
+def _yfinance_ticker(ticker: str):
+    """
+    Shared yfinance Ticker of a symbol. The Ticker caches the full history it downloads for splits and
+    dividends, so the calls for one symbol reuse a single download.
+    """
+    import yfinance as yf
+    return yf.Ticker(ticker)
+
+class YFinanceProvider:
+    """
+    Market data from Yahoo Finance through yfinance.
+    """
+    host = "finance.yahoo.com"
+
+    def _ticker(self, ticker: str):
+        rate_limiter.wait(self.host)
+        return _yfinance_ticker(ticker)
+
+    def get_info(self, ticker: str) -> dict:
+        return self._ticker(ticker).info
+
+    def get_splits(self, ticker: str) -> pd.Series:
+        return _naive_index(self._ticker(ticker).get_splits())
+
+    def get_dividends(self, ticker: str) -> pd.Series:
+        return _naive_index(self._ticker(ticker).get_dividends())
+
+    def get_price_history(self, ticker: str, period: str = "5y", start: str = None) -> pd.DataFrame:
+        # auto_adjust would also scale the closes before every ex-date down by the dividend
+        history = self._ticker(ticker).history(start=start, auto_adjust=False) if start else self._ticker(ticker).history(period=period, auto_adjust=False)
+        return _naive_index(history[HISTORY_COLUMNS])
+
+    def get_index_history(self, ticker: str, period: str = "5y", start: str = None) -> pd.DataFrame:
+        return self.get_price_history(ticker, period=period, start=start)
+
+class FixtureProvider:
+    """
+    Market data served from recorded JSON snapshots, one `<ticker>.json` file per ticker in a directory,
+    as written by `record_fixture`. Unknown tickers have empty data, nothing touches the network.
+    """
+    host = "fixtures"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _load(self, ticker: str) -> dict:
+        path = os.path.join(self.directory, f"{ticker}.json")
+        if not os.path.exists(path):
+            return {}
+        with open(path) as file:
+            return json.load(file)
+
+    def _series(self, ticker: str, key: str) -> pd.Series:
+        values = self._load(ticker).get(key, {})
+        return _naive_index(pd.Series(list(values.values()), index=pd.to_datetime(list(values.keys())), dtype=float))
+
+    def get_info(self, ticker: str) -> dict:
+        return self._load(ticker).get("info", {})
+
+    def get_splits(self, ticker: str) -> pd.Series:
+        return self._series(ticker, "splits").rename("Stock Splits")
+
+    def get_dividends(self, ticker: str) -> pd.Series:
+        return self._series(ticker, "dividends").rename("Dividends")
+
+    def get_price_history(self, ticker: str, period: str = "5y", start: str = None) -> pd.DataFrame:
+        history = pd.DataFrame(self._load(ticker).get("history", {}), columns=["Date"] + HISTORY_COLUMNS)
+        history["Date"] = pd.to_datetime(history["Date"])
+        history = history.set_index("Date").sort_index()
+        if start:
+            return history[history.index >= pd.Timestamp(start)]
+        if history.empty or period == "max":
+            return history
+        return history[history.index > history.index[-1] - _period_offset(period)]
+
+    def get_index_history(self, ticker: str, period: str = "5y", start: str = None) -> pd.DataFrame:
+        return self.get_price_history(ticker, period=period, start=start)
+
+class LatencyProvider:
+    """
+    Wraps another provider and sleeps before every call, to load test the fetchers without a network.
+    """
+    def __init__(self, provider: MarketDataProvider, latency: float, jitter: float = 0.0):
+        self.provider = provider
+        self.latency = latency
+        self.jitter = jitter
+        self.host = provider.host
+
+    def _delay(self):
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+
+    def get_info(self, ticker: str) -> dict:
+        self._delay()
+        return self.provider.get_info(ticker)
+
+    def get_splits(self, ticker: str) -> pd.Series:
+        self._delay()
+        return self.provider.get_splits(ticker)
+
+    def get_dividends(self, ticker: str) -> pd.Series:
+        self._delay()
+        return self.provider.get_dividends(ticker)
+
+    def get_price_history(self, ticker: str, period: str = "5y", start: str = None) -> pd.DataFrame:
+        self._delay()
+        return self.provider.get_price_history(ticker, period=period, start=start)
+
+    def get_index_history(self, ticker: str, period: str = "5y", start: str = None) -> pd.DataFrame:
+        self._delay()
+        return self.provider.get_index_history(ticker, period=period, start=start)
+
+def record_fixture(provider: MarketDataProvider, ticker: str, directory: str, period: str = "5y"):
+    """
+    Record the market data of a ticker into a JSON snapshot served by FixtureProvider.
+    Args:
+        provider (MarketDataProvider): Provider to record from, usually YFinanceProvider.
+        ticker (str): Provider symbol of the stock or index.
+        directory (str): Directory of the fixture files.
+        period (str): Length of the recorded price history.
+    """
+    history = provider.get_price_history(ticker, period=period).reset_index()
+    history["Date"] = history["Date"].dt.strftime("%Y-%m-%d")
+    fixture = {
+        "info": provider.get_info(ticker),
+        "splits": {date.strftime("%Y-%m-%d"): ratio for date, ratio in provider.get_splits(ticker).items()},
+        "dividends": {date.strftime("%Y-%m-%d"): amount for date, amount in provider.get_dividends(ticker).items()},
+        "history": history.to_dict(orient="list")
+    }
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f"{ticker}.json"), "w") as file:
+        json.dump(fixture, file, default=str)
+
+_provider = None
+
+def get_market_data_provider() -> MarketDataProvider:
+    """
+    Provider used by the market data fetchers. Defaults to Yahoo Finance, or to recorded fixtures when
+    the PORTFOLIO360_MARKET_DATA_FIXTURES environment variable points at a fixture directory.
+    """
+    global _provider
+    if _provider is None:
+        fixtures_directory = os.environ.get(MARKET_DATA_FIXTURES_ENV)
+        _provider = FixtureProvider(fixtures_directory) if fixtures_directory else YFinanceProvider()
+    return _provider
+
+def set_market_data_provider(provider: MarketDataProvider):
+    """
+    Replace the provider used by the market data fetchers, e.g. with a LatencyProvider in load tests.
+    """
+    global _provider
+    _provider = provider
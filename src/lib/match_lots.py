@@ -0,0 +1,50 @@
+from collections import deque
+from typing import Deque, Iterable, List, Tuple
+
+from src.models.trade import Trade
+from src.models.lot import OpenLot, RealizedLot
+
+def _is_buy(trade: Trade) -> bool:
+    return trade.typ in ["buy", "bonus"]
+
+def _realize(opening: OpenLot, closing: Trade, quantity: float) -> RealizedLot:
+    buy, sell = (opening.trade, closing) if _is_buy(opening.trade) else (closing, opening.trade)
+    return RealizedLot(
+        symbol = closing.symbol,
+        quantity = quantity,
+        buy_date = buy.timestamp,
+        sell_date = sell.timestamp,
+        cost = quantity * buy.price,
+        proceeds = quantity * sell.price,
+        holding_period = closing.timestamp - opening.trade.timestamp
+    )
+
+def match_lots(trades: Iterable[Trade], open_lots: Deque[OpenLot] = None) -> Tuple[Deque[OpenLot], List[RealizedLot]]:
+    """
+    Match trades against the open lots in FIFO order.
+    Open lots are all on the same side (long or short). A trade on the same side opens a new lot, a
+    trade on the other side closes the oldest lots first and opens a lot on its own side with any
+    quantity left over. Trades are never modified, the unmatched quantity is tracked on the lots.
+    Args:
+        trades (Iterable[Trade]): Trades of a single symbol in timestamp order
+        open_lots (Deque[OpenLot]): Lots still open before the trades, modified in place. Empty if not given.
+    Returns:
+        Deque[OpenLot]: Lots still open after the trades, oldest first
+        List[RealizedLot]: Lots closed by the trades, in the order they were closed
+    """
+    open_lots = deque() if open_lots is None else open_lots
+    realized_lots = []
+    for trade in trades:
+        remaining = trade.quantity
+        while remaining > 0 and open_lots and _is_buy(open_lots[0].trade) != _is_buy(trade):
+            oldest = open_lots[0]
+            matched_quantity = min(oldest.quantity, remaining)
+            realized_lots.append(_realize(oldest, trade, matched_quantity))
+            oldest.quantity -= matched_quantity
+            remaining -= matched_quantity
+            if oldest.quantity == 0:
+                open_lots.popleft()
+
+        if remaining > 0:
+            open_lots.append(OpenLot(trade=trade, quantity=remaining))
+    return open_lots, realized_lots
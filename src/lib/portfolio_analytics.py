@@ -0,0 +1,356 @@
+import datetime
+from functools import cached_property
+from typing import Dict, List
+import numpy as np
+
+from src.models.holding import Holding
+from src.models.index_series import INDEX_NAMES, IndexSeries, date_array
+from src.models.portfolio import Portfolio
+from src.models.portfolio_valuation import PortfolioValuation
+from src.lib.generate_holdings import RISK_FREE_RATE
+
+TRADING_DAYS = 252              # Trading days per year, used to annualize daily statistics
+CONCENTRATION_HOLDINGS = 5      # Largest holdings counted by the concentration ratio
+DIVIDEND_WINDOW = datetime.timedelta(days=365)      # Dividends counted by the dividend yields
+FUNDAMENTALS = (
+    "market_cap", "price_to_sales_trailing_12_months", "price_to_book", "trailing_pe", "forward_pe", "trailing_eps",
+    "forward_eps", "beta", "debt_to_equity", "enterprise_to_revenue", "enterprise_to_ebitda", "revenue_growth",
+    "gross_margins", "ebitda_margins", "operating_margins", "eps_current_year", "target_mean_price", "dividend_yield"
+)
+
+def _ratio(numerator: float, denominator: float) -> float:
+    """
+    numerator / denominator as a float, 0 when the denominator is 0 or not finite.
+    """
+    return float(numerator / denominator) if denominator and np.isfinite(denominator) else 0.0
+
+class PortfolioAnalytics:
+    """
+    Portfolio level metrics computed from the holdings, their fundamentals and the daily valuation.
+
+    Every intermediate series (current values, weights, fundamentals, daily returns, benchmark returns)
+    is a cached property computed once on first use, so each metric only pays for what it adds on top.
+    Cross-sectional metrics are weighted by the current value of each holding and return metrics use the
+    daily time-weighted returns of the valuation, so cash moved in or out by trades is not counted as return.
+    """
+    def __init__(self, holdings: List[Holding], valuation: PortfolioValuation, index_series: IndexSeries,
+                 benchmark: str = "nifty50", risk_free_rate: float = RISK_FREE_RATE, today: datetime.date = None):
+        """
+        Args:
+            holdings (List[Holding]): Current and past holdings
+            valuation (PortfolioValuation): Daily valuation of the holdings
+            index_series (IndexSeries): Daily closes of the indices
+            benchmark (str): Index in INDEX_NAMES the risk and performance metrics are measured against
+            risk_free_rate (float): Annual risk-free return
+            today (datetime.date): Date the trailing dividend window ends on, defaults to today
+        """
+        self.holdings = holdings
+        self.valuation = valuation
+        self.index_series = index_series
+        self.benchmark = benchmark
+        self.risk_free_rate = risk_free_rate
+        self.today = today or datetime.date.today()
+
+    # Holdings ===================================================================
+
+    @cached_property
+    def current_holdings(self) -> List[Holding]:
+        """
+        Open holdings with a known current price.
+        """
+        return [holding for holding in self.holdings if holding.quantity != 0 and holding.stock_info is not None]
+
+    @cached_property
+    def values(self) -> np.ndarray:
+        """
+        Current value of every current holding.
+        """
+        return np.array([holding.quantity * holding.current_price for holding in self.current_holdings], dtype=np.float64)
+
+    @cached_property
+    def weights(self) -> np.ndarray:
+        """
+        Share of every current holding in the current value of the portfolio.
+        """
+        exposure = np.abs(self.values)
+        total = exposure.sum()
+        return exposure / total if total else exposure
+
+    @cached_property
+    def fundamentals(self) -> Dict[str, np.ndarray]:
+        """
+        The numeric StockInfo fields in FUNDAMENTALS of every current holding, one float array per field
+        with missing values as NaN.
+        """
+        rows = np.array([[getattr(holding.stock_info, name) for name in FUNDAMENTALS] for holding in self.current_holdings], dtype=np.float64)
+        rows = rows.reshape(len(self.current_holdings), len(FUNDAMENTALS))
+        return {name: rows[:, column] for column, name in enumerate(FUNDAMENTALS)}
+
+    def weighted_average(self, values: np.ndarray, skip_zero: bool = True) -> float:
+        """
+        Value weighted average of a per holding array.
+        Holdings without a value (NaN, or 0 with `skip_zero` since missing fundamentals are stored as 0)
+        are left out and the weights of the others renormalized.
+        """
+        known = np.isfinite(values) & ((values != 0) if skip_zero else True)
+        return _ratio(np.dot(self.weights[known], values[known]), self.weights[known].sum())
+
+    def weighted_harmonic_average(self, values: np.ndarray) -> float:
+        """
+        Value weighted harmonic average of a per holding ratio, e.g. the P/E of the portfolio as a whole:
+        value of the holdings divided by the earnings attributable to them. Loss makers are left out.
+        """
+        known = np.isfinite(values) & (values > 0)
+        return _ratio(self.weights[known].sum(), np.sum(self.weights[known] / values[known]))
+
+    def allocation(self, name: str) -> Dict[str, Dict[str, float]]:
+        """
+        Current value and weight of the current holdings grouped by a StockInfo field such as sector.
+        """
+        labels = np.array([getattr(holding.stock_info, name) or "Unknown" for holding in self.current_holdings], dtype=object)
+        if len(labels) == 0:
+            return {}
+        groups, inverse = np.unique(labels.astype(str), return_inverse=True)
+        values = np.bincount(inverse, weights=self.values, minlength=len(groups))
+        weights = np.bincount(inverse, weights=self.weights, minlength=len(groups))
+        counts = np.bincount(inverse, minlength=len(groups))
+        return {
+            group: {"value": float(value), "weight": float(weight), "holdings": float(count)}
+            for group, value, weight, count in sorted(zip(groups.tolist(), values, weights, counts), key=lambda row: -row[2])
+        }
+
+    @cached_property
+    def trailing_dividends(self) -> np.ndarray:
+        """
+        Dividends per share of every current holding with an ex-date in the last year.
+        """
+        columns = [np.full(len(holding.stock_info.dividends), column) for column, holding in enumerate(self.current_holdings)]
+        dividends = [dividend for holding in self.current_holdings for dividend in holding.stock_info.dividends]
+        if not dividends:
+            return np.zeros(len(self.current_holdings))
+        ex_dates = date_array([dividend.ex_date for dividend in dividends])
+        amounts = np.array([dividend.amount for dividend in dividends], dtype=np.float64)
+        recent = (ex_dates > np.datetime64(self.today - DIVIDEND_WINDOW, "D")) & (ex_dates <= np.datetime64(self.today, "D"))
+        return np.bincount(np.concatenate(columns)[recent], weights=amounts[recent], minlength=len(self.current_holdings))
+
+    @staticmethod
+    def growth_rate(new: np.ndarray, old: np.ndarray) -> np.ndarray:
+        """
+        Relative change from old to new per holding, NaN where old is missing.
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(old != 0, (new - old) / np.abs(old), np.nan)
+
+    # Returns ====================================================================
+
+    @cached_property
+    def return_rows(self) -> np.ndarray:
+        """
+        Valuation rows which have a daily return, i.e. days following a day with a positive portfolio value.
+        """
+        return np.flatnonzero(self.valuation.total[:-1] > 0) + 1
+
+    @cached_property
+    def daily_returns(self) -> np.ndarray:
+        """
+        Time-weighted daily returns of the portfolio.
+        The return of a day is the change in value of the positions held at the previous close, so
+        trades only count from the day after they are made and new money is not counted as return.
+        """
+        quantities, closes = self.valuation.quantities, self.valuation.closes
+        if len(quantities) < 2:
+            return np.array([])
+        priced = ~np.isnan(closes[:-1])
+        carried = np.where(priced, quantities[:-1] * np.nan_to_num(closes[1:]), 0.0).sum(axis=1)
+        rows = self.return_rows
+        return carried[rows - 1] / self.valuation.total[rows - 1] - 1
+
+    @cached_property
+    def benchmark_returns(self) -> np.ndarray:
+        """
+        Daily returns of the benchmark index over the same days as the daily returns.
+        """
+        if len(self.index_series) == 0 or len(self.return_rows) == 0:
+            return np.zeros(len(self.daily_returns))
+        closes = self.index_series.prices[self.index_series.asof_rows(self.valuation.dates), INDEX_NAMES.index(self.benchmark)]
+        rows = self.return_rows
+        return closes[rows] / closes[rows - 1] - 1
+
+    @cached_property
+    def daily_risk_free_rate(self) -> float:
+        return (1 + self.risk_free_rate) ** (1 / TRADING_DAYS) - 1
+
+    @cached_property
+    def excess_returns(self) -> np.ndarray:
+        return self.daily_returns - self.daily_risk_free_rate
+
+    @cached_property
+    def active_returns(self) -> np.ndarray:
+        return self.daily_returns - self.benchmark_returns
+
+    @cached_property
+    def growth(self) -> np.ndarray:
+        """
+        Growth of one unit invested in the portfolio, after every daily return.
+        """
+        return np.cumprod(1 + self.daily_returns)
+
+    def annualize(self, returns: np.ndarray) -> float:
+        """
+        Compound annual growth rate of a series of daily returns.
+        """
+        if len(returns) == 0:
+            return 0.0
+        return float(np.prod(1 + returns) ** (TRADING_DAYS / len(returns)) - 1)
+
+    # Metrics ====================================================================
+
+    @cached_property
+    def standard_deviation(self) -> float:
+        """
+        Standard deviation of the daily returns.
+        """
+        return float(np.std(self.daily_returns, ddof=1)) if len(self.daily_returns) > 1 else 0.0
+
+    @cached_property
+    def annualized_volatility(self) -> float:
+        return self.standard_deviation * np.sqrt(TRADING_DAYS)
+
+    @cached_property
+    def annualized_return(self) -> float:
+        return self.annualize(self.daily_returns)
+
+    @cached_property
+    def sharpe_ratio(self) -> float:
+        if len(self.excess_returns) < 2:
+            return 0.0
+        return _ratio(self.excess_returns.mean() * np.sqrt(TRADING_DAYS), np.std(self.excess_returns, ddof=1))
+
+    @cached_property
+    def sortino_ratio(self) -> float:
+        """
+        Annualized mean excess return over the annualized downside deviation below the risk-free return.
+        """
+        if len(self.excess_returns) < 2:
+            return 0.0
+        downside_deviation = np.sqrt(np.mean(np.minimum(self.excess_returns, 0) ** 2))
+        return _ratio(self.excess_returns.mean() * np.sqrt(TRADING_DAYS), downside_deviation)
+
+    @cached_property
+    def beta(self) -> float:
+        """
+        Sensitivity of the daily returns to the daily returns of the benchmark.
+        """
+        if len(self.daily_returns) < 2:
+            return 0.0
+        covariance = np.cov(self.daily_returns, self.benchmark_returns)
+        return _ratio(covariance[0, 1], covariance[1, 1])
+
+    @cached_property
+    def alpha(self) -> float:
+        """
+        Jensen's alpha: annualized return in excess of the return the CAPM expects for the beta.
+        """
+        if len(self.daily_returns) < 2:
+            return 0.0
+        benchmark_return = self.annualize(self.benchmark_returns)
+        return self.annualized_return - (self.risk_free_rate + self.beta * (benchmark_return - self.risk_free_rate))
+
+    @cached_property
+    def max_drawdown(self) -> float:
+        """
+        Largest fall from a peak of the growth of the portfolio, as a positive fraction of the peak.
+        """
+        if len(self.growth) == 0:
+            return 0.0
+        peaks = np.maximum.accumulate(np.concatenate(([1.0], self.growth)))[1:]
+        return float(-np.min(np.minimum(self.growth / peaks - 1, 0)))
+
+    @cached_property
+    def tracking_error(self) -> float:
+        if len(self.active_returns) < 2:
+            return 0.0
+        return float(np.std(self.active_returns, ddof=1) * np.sqrt(TRADING_DAYS))
+
+    @cached_property
+    def information_ratio(self) -> float:
+        if len(self.active_returns) < 2:
+            return 0.0
+        return _ratio(self.active_returns.mean() * TRADING_DAYS, self.tracking_error)
+
+    @cached_property
+    def turnover_ratio(self) -> float:
+        """
+        Lesser of the value bought and the value sold over the last year, over the average portfolio value.
+        The quantities of the valuation are in split-adjusted shares, so bonus shares are not counted as bought.
+        """
+        quantities, closes = self.valuation.quantities, self.valuation.closes
+        if len(quantities) < 2:
+            return 0.0
+        window = slice(max(len(quantities) - TRADING_DAYS, 1), len(quantities))
+        traded = np.diff(quantities, axis=0)[window.start - 1:] * np.nan_to_num(closes[window])
+        bought, sold = traded[traded > 0].sum(), -traded[traded < 0].sum()
+        return _ratio(min(bought, sold), self.valuation.total[window].mean())
+
+    def portfolio(self) -> Portfolio:
+        """
+        Portfolio with every metric filled in.
+        """
+        total_investment = float(sum(holding.investment for holding in self.current_holdings))
+        current_value = float(self.values.sum())
+        unrealized_profit = current_value - total_investment
+        realized_profit = float(sum(holding.realized_profit for holding in self.holdings))
+        trailing_dividends = float(np.dot(self.trailing_dividends, [holding.quantity for holding in self.current_holdings])) if self.current_holdings else 0.0
+        trailing_eps, forward_eps = self.fundamentals["trailing_eps"], self.fundamentals["forward_eps"]
+        dividend_yields = self.fundamentals["dividend_yield"]
+
+        return Portfolio(
+            stocks = [holding.stock_info for holding in self.current_holdings],
+            holdings = self.holdings,
+
+            total_investment = total_investment,
+            current_value = current_value,
+            profit_loss = unrealized_profit + realized_profit,
+            yield_on_cost = _ratio(trailing_dividends, total_investment),
+
+            dividend_yield = _ratio(trailing_dividends, current_value),
+            average_dividend_yield = float(np.nanmean(dividend_yields)) if np.isfinite(dividend_yields).any() else 0.0,
+            weighted_average_dividend_yield = self.weighted_average(dividend_yields, skip_zero=False),
+
+            trailing_pe = self.weighted_harmonic_average(self.fundamentals["trailing_pe"]),
+            forward_pe = self.weighted_harmonic_average(self.fundamentals["forward_pe"]),
+            weighted_average_price_to_book = self.weighted_average(self.fundamentals["price_to_book"]),
+            weighted_average_price_to_sales = self.weighted_average(self.fundamentals["price_to_sales_trailing_12_months"]),
+            weighted_average_enterprise_to_revenue = self.weighted_average(self.fundamentals["enterprise_to_revenue"]),
+            weighted_average_enterprise_to_ebitda = self.weighted_average(self.fundamentals["enterprise_to_ebitda"]),
+            weighted_average_target_price = self.weighted_average(self.fundamentals["target_mean_price"]),
+
+            beta = self.beta,
+            weighted_average_beta = self.weighted_average(self.fundamentals["beta"]),
+            sharpe_ratio = self.sharpe_ratio,
+            sortino_ratio = self.sortino_ratio,
+            alpha = self.alpha,
+            standard_deviation = self.standard_deviation,
+            max_drawdown = self.max_drawdown,
+            annualized_volatility = self.annualized_volatility,
+            tracking_error = self.tracking_error,
+
+            annualized_return = self.annualized_return,
+            information_ratio = self.information_ratio,
+            turnover_ratio = self.turnover_ratio,
+
+            sector_weights = self.allocation("sector"),
+            industry_weights = self.allocation("industry"),
+            concentration_ratio = float(np.sort(self.weights)[::-1][:CONCENTRATION_HOLDINGS].sum()),
+            weighted_average_market_cap = self.weighted_average(self.fundamentals["market_cap"]),
+
+            weighted_average_ebitda_margin = self.weighted_average(self.fundamentals["ebitda_margins"]),
+            weighted_average_operating_margin = self.weighted_average(self.fundamentals["operating_margins"]),
+            weighted_average_gross_margin = self.weighted_average(self.fundamentals["gross_margins"]),
+
+            weighted_average_revenue_growth = self.weighted_average(self.fundamentals["revenue_growth"]),
+            weighted_average_eps_growth = self.weighted_average(self.growth_rate(forward_eps, trailing_eps)),
+            weighted_average_earnings_growth = self.weighted_average(self.growth_rate(self.fundamentals["eps_current_year"], trailing_eps)),
+
+            weighted_average_debt_to_equity = self.weighted_average(self.fundamentals["debt_to_equity"])
+        )
@@ -0,0 +1,26 @@
+import time
+import threading
+from collections import defaultdict
+
+class RateLimiter:
+    """
+    Thread-safe rate limiter which spaces out requests made to the same host.
+    Every host gets its own schedule, so requests to different hosts never wait on each other.
+    """
+    def __init__(self, requests_per_second: float):
+        self.interval = 1 / requests_per_second
+        self.lock = threading.Lock()
+        self.next_slot = defaultdict(float)
+
+    def wait(self, host: str):
+        """
+        Block until a request to the host is allowed.
+        Args:
+            host (str): Host the request is made to.
+        """
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot[host])
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
@@ -0,0 +1,319 @@
+import os
+import functools
+import tempfile
+import multiprocessing
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterator, List, Tuple
+
+TRADEBOOK_CSV_DTYPES = {
+    'symbol': 'category',
+    'trade_type': 'category',
+    'quantity': np.float64,     # Kept as float64 like TradeLedger.quantity, exports may write "10.0" and corporate actions fractions
+    'price': np.float64,
+    'trade_id': str,
+    'order_id': str,
+    'order_execution_time': str,
+}   # Columns read from a tradebook export, the others are skipped by the parser
+TRADEBOOK_CHUNK_ROWS = 250_000      # Rows parsed, sorted and spilled at a time
+MERGE_BUFFER_ROWS = 500_000         # Rows buffered across all runs while merging
+MERGE_MIN_BLOCK_ROWS = 1024         # Smallest block read from a run, keeps the rounds of a merge of many runs large enough
+MERGE_FAN_IN = 64                   # Runs merged at a time, bounds the buffer to MERGE_FAN_IN * MERGE_MIN_BLOCK_ROWS rows
+
+PARALLEL_PARSE_THRESHOLD = 64 * 2 ** 20     # Bytes of CSV, smaller tradebook sets are parsed in-process, spawning the pool takes about a second
+POOL_START_METHOD = "spawn"     # Files are parsed from the controller's worker thread, forking a threaded process can deadlock
+
+RUN_COLUMNS = ('order_id', 'trade_id', 'symbol', 'quantity', 'price', 'typ', 'timestamp')
+
+def read_tradebook_chunks(file_path: str, chunk_rows: int = TRADEBOOK_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Read a tradebook export in chunks with an explicit dtype schema.
+    Args:
+        file_path (str): Path to the tradebook file
+        chunk_rows (int): Number of rows per chunk
+    Yields:
+        pd.DataFrame: Chunks in file order with the columns listed in TRADEBOOK_COLUMNS, symbols and trade
+            types as categoricals, quantities as float64 and timestamps as datetime64[ns]
+    Raises:
+        ValueError: If a column of TRADEBOOK_CSV_DTYPES is missing or a value does not parse, naming the file
+    """
+    missing_columns = [column for column in TRADEBOOK_CSV_DTYPES if column not in pd.read_csv(file_path, nrows=0).columns]
+    if missing_columns:
+        raise ValueError(f"Tradebook {file_path} is missing the columns {missing_columns}, expected an export with {list(TRADEBOOK_CSV_DTYPES)}")
+    try:
+        for chunk in pd.read_csv(file_path, usecols=list(TRADEBOOK_CSV_DTYPES), dtype=TRADEBOOK_CSV_DTYPES, chunksize=chunk_rows):
+            symbols, codes = np.unique(chunk['symbol'].cat.categories.str.split('-').str[0], return_inverse=True)    # Normalize symbols once per category
+            yield pd.DataFrame({
+                'order_id': chunk['order_id'],
+                'trade_id': chunk['trade_id'],
+                'symbol': pd.Categorical.from_codes(codes[chunk['symbol'].cat.codes], categories=symbols),
+                'quantity': chunk['quantity'],
+                'price': chunk['price'],
+                'typ': chunk['trade_type'],
+                'timestamp': pd.to_datetime(chunk['order_execution_time'], format="%Y-%m-%dT%H:%M:%S"),
+                'remarks': ""
+            })
+    except ValueError as e:
+        raise ValueError(f"Error reading tradebook {file_path}: {e}") from e
+
+def write_sorted_run(chunk: pd.DataFrame, run_path: str) -> int:
+    """
+    Sort a chunk by timestamp and spill it to disk as one .npy file per column, which the merge reads back
+    block by block. Text columns are stored as fixed width unicode so any range of rows can be read directly.
+    Args:
+        chunk (pd.DataFrame): Chunk with the columns listed in RUN_COLUMNS
+        run_path (str): Path prefix of the run files
+    Returns:
+        int: Number of rows in the run
+    """
+    timestamps = chunk['timestamp'].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    order = np.argsort(timestamps, kind="stable")    # Equal timestamps keep their file order
+    columns = {
+        'order_id': chunk['order_id'].to_numpy(dtype=str),
+        'trade_id': chunk['trade_id'].to_numpy(dtype=str),
+        'symbol': chunk['symbol'].to_numpy(dtype=str),
+        'quantity': chunk['quantity'].to_numpy(dtype=np.float64),
+        'price': chunk['price'].to_numpy(dtype=np.float64),
+        'typ': chunk['typ'].to_numpy(dtype=str),
+        'timestamp': timestamps,
+    }
+    for name in RUN_COLUMNS:
+        np.save(f"{run_path}_{name}.npy", columns[name][order])
+    return len(chunk)
+
+class SortedRun:
+    """
+    Reader of a run written by `write_sorted_run`.
+    Rows are read from the column files on demand rather than memory mapped, so rows already merged do
+    not stay resident in the page cache mappings of the process.
+    """
+    __slots__ = ('paths', 'dtypes', 'offsets', 'rows')
+
+    def __init__(self, run_path: str):
+        self.paths, self.dtypes, self.offsets = {}, {}, {}
+        for name in RUN_COLUMNS:
+            self.paths[name] = f"{run_path}_{name}.npy"
+            with open(self.paths[name], "rb") as file:
+                version = np.lib.format.read_magic(file)
+                shape, _, self.dtypes[name] = (np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0)(file)
+                self.offsets[name] = file.tell()
+        self.rows = shape[0]
+
+    def read(self, name: str, start: int, end: int) -> np.ndarray:
+        """
+        Rows start to end of a column.
+        """
+        dtype = self.dtypes[name]
+        return np.fromfile(self.paths[name], dtype=dtype, count=end - start, offset=self.offsets[name] + start * dtype.itemsize)
+
+    def read_block(self, start: int, block_rows: int) -> Dict[str, np.ndarray]:
+        """
+        Columns of the block of `block_rows` rows from `start`, extended to the end of its last group of equal timestamps.
+        """
+        end = min(start + block_rows, self.rows)
+        timestamps = self.read('timestamp', start, end)
+        while end < self.rows:
+            following = self.read('timestamp', end, min(end + block_rows, self.rows))
+            group_end = int(np.searchsorted(following, timestamps[-1], side="right"))
+            timestamps = np.concatenate([timestamps, following[:group_end]])
+            end += group_end
+            if group_end < len(following):
+                break
+        block = {name: self.read(name, start, end) for name in RUN_COLUMNS if name != 'timestamp'}
+        block['timestamp'] = timestamps
+        return block
+
+    def remove(self):
+        for path in self.paths.values():
+            os.remove(path)
+
+def to_batch(columns: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """
+    Build a trades DataFrame with the columns listed in TRADEBOOK_COLUMNS from merged run columns.
+    """
+    return pd.DataFrame({
+        'order_id': columns['order_id'].astype(object),
+        'trade_id': columns['trade_id'].astype(object),
+        'symbol': pd.Categorical(columns['symbol']),
+        'quantity': columns['quantity'],
+        'price': columns['price'],
+        'typ': pd.Categorical(columns['typ']),
+        'timestamp': columns['timestamp'].view("datetime64[ns]"),
+        'remarks': ""
+    })
+
+def merge_run_columns(runs: List[SortedRun], buffer_rows: int) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    K-way merge of sorted runs by timestamp, reading every run block by block.
+
+    Each round buffers one block per run and emits every buffered row up to the smallest last timestamp
+    of the blocks, which no unread row can precede. Blocks are extended to the end of a group of equal
+    timestamps, so trades executed at the same time are emitted together, in run order.
+    Args:
+        runs (List[SortedRun]): Runs in file and chunk order
+        buffer_rows (int): Number of rows buffered across all runs, split evenly between them
+    Yields:
+        Dict[str, np.ndarray]: Merged columns of every round
+    """
+    block_rows = max(buffer_rows // max(len(runs), 1), MERGE_MIN_BLOCK_ROWS)
+    next_rows = [0] * len(runs)     # First row of every run which has not been buffered yet
+    blocks = [None] * len(runs)     # Buffered rows of every run which have not been emitted yet
+
+    while True:
+        for ind, run in enumerate(runs):
+            if (blocks[ind] is None or len(blocks[ind]['timestamp']) == 0) and next_rows[ind] < run.rows:
+                blocks[ind] = run.read_block(next_rows[ind], block_rows)
+                next_rows[ind] += len(blocks[ind]['timestamp'])
+        active = [ind for ind in range(len(runs)) if blocks[ind] is not None and len(blocks[ind]['timestamp'])]
+        if not active:
+            return
+
+        bound = min(blocks[ind]['timestamp'][-1] for ind in active)
+        slices = []
+        for ind in active:
+            end = int(np.searchsorted(blocks[ind]['timestamp'], bound, side="right"))
+            if end:
+                slices.append({name: values[:end] for name, values in blocks[ind].items()})
+                blocks[ind] = {name: values[end:] for name, values in blocks[ind].items()}
+
+        columns = {name: np.concatenate([block[name] for block in slices]) for name in RUN_COLUMNS}
+        order = np.argsort(columns['timestamp'], kind="stable")     # Ties keep run order
+        yield {name: values[order] for name, values in columns.items()}
+
+def merge_runs_to_disk(run_paths: List[str], merged_path: str, buffer_rows: int) -> str:
+    """
+    Merge sorted runs into a single run on disk, appending every merged round to its column files, and
+    remove the inputs.
+    Args:
+        run_paths (List[str]): Path prefixes of the runs, in file and chunk order
+        merged_path (str): Path prefix of the merged run
+        buffer_rows (int): Number of rows buffered by the merge
+    Returns:
+        str: Path prefix of the merged run
+    """
+    runs = [SortedRun(run_path) for run_path in run_paths]
+    files = {name: open(f"{merged_path}_{name}.npy", "wb") for name in RUN_COLUMNS}
+    try:
+        dtypes = {name: functools.reduce(np.promote_types, [run.dtypes[name] for run in runs]) for name in RUN_COLUMNS}   # Widest text width of the inputs
+        for name, file in files.items():
+            np.lib.format.write_array_header_2_0(file, {
+                'descr': np.lib.format.dtype_to_descr(dtypes[name]), 'fortran_order': False, 'shape': (sum(run.rows for run in runs),)
+            })
+        for columns in merge_run_columns(runs, buffer_rows):
+            for name, file in files.items():
+                columns[name].astype(dtypes[name], copy=False).tofile(file)
+    finally:
+        for file in files.values():
+            file.close()
+    for run in runs:
+        run.remove()
+    return merged_path
+
+def merge_sorted_runs(run_paths: List[str], buffer_rows: int = MERGE_BUFFER_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Merge sorted runs by timestamp into batches of trades.
+    At most MERGE_FAN_IN runs are merged at a time; when there are more, consecutive groups of runs are first
+    merged into longer runs on disk, so the merge buffer stays bounded however many runs there are.
+    Args:
+        run_paths (List[str]): Path prefixes of the runs, in file and chunk order
+        buffer_rows (int): Number of rows buffered across all runs
+    Yields:
+        pd.DataFrame: Batches of trades in timestamp order with the columns listed in TRADEBOOK_COLUMNS
+    """
+    while len(run_paths) > MERGE_FAN_IN:
+        run_paths = [
+            merge_runs_to_disk(run_paths[start:start + MERGE_FAN_IN], f"{run_paths[start]}m", buffer_rows)
+            for start in range(0, len(run_paths), MERGE_FAN_IN)
+        ]   # Groups are consecutive, so ties still resolve in file order
+    for columns in merge_run_columns([SortedRun(run_path) for run_path in run_paths], buffer_rows):
+        yield to_batch(columns)
+
+def parse_workers(tradebook_files: List[str], max_workers: int = None) -> int:
+    """
+    Number of processes to parse the tradebook files with, one per file up to `max_workers` (the number of
+    CPUs by default). Sets smaller than PARALLEL_PARSE_THRESHOLD are parsed in-process, where starting the
+    pool would cost more than it saves.
+    """
+    if sum(os.path.getsize(file_path) for file_path in tradebook_files) < PARALLEL_PARSE_THRESHOLD:
+        return 1
+    return min(max_workers or os.cpu_count() or 1, len(tradebook_files))
+
+def spill_tradebook_file(file_path: str, run_prefix: str, chunk_rows: int = TRADEBOOK_CHUNK_ROWS) -> List[str]:
+    """
+    Parse a tradebook file chunk by chunk and spill every chunk as a sorted run.
+    Runs in the worker processes of `spill_tradebook_files`, only the run paths are sent back.
+    Args:
+        file_path (str): Path to the tradebook file
+        run_prefix (str): Path prefix of the runs of the file
+        chunk_rows (int): Number of rows parsed and sorted at a time
+    Returns:
+        List[str]: Path prefixes of the runs, in file order
+    """
+    run_paths = []
+    for chunk in read_tradebook_chunks(file_path, chunk_rows):
+        run_path = f"{run_prefix}_{len(run_paths)}"
+        if write_sorted_run(chunk, run_path):
+            run_paths.append(run_path)
+    return run_paths
+
+def spill_tradebook_files(tradebook_files: List[str], directory: str, chunk_rows: int = TRADEBOOK_CHUNK_ROWS,
+                          max_workers: int = None) -> List[List[str]]:
+    """
+    Spill tradebook files into sorted runs concurrently, one file per task on a process pool.
+    Args:
+        tradebook_files (List[str]): List of paths to the tradebook files
+        directory (str): Directory the runs are written to
+        chunk_rows (int): Number of rows parsed and sorted at a time
+        max_workers (int): Number of worker processes, defaults to the number of CPUs. 1 disables the pool.
+    Returns:
+        List[List[str]]: Path prefixes of the runs of every file, in the order of `tradebook_files`
+    """
+    run_prefixes = [os.path.join(directory, f"file{ind}") for ind in range(len(tradebook_files))]
+    max_workers = parse_workers(tradebook_files, max_workers)
+    if max_workers <= 1:
+        return [spill_tradebook_file(file_path, run_prefix, chunk_rows) for file_path, run_prefix in zip(tradebook_files, run_prefixes)]
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(POOL_START_METHOD)) as executor:
+        return list(executor.map(spill_tradebook_file, tradebook_files, run_prefixes, repeat(chunk_rows)))
+
+def stream_tradebook(tradebook_files: List[str], chunk_rows: int = TRADEBOOK_CHUNK_ROWS,
+                     buffer_rows: int = MERGE_BUFFER_ROWS, max_workers: int = None) -> Iterator[pd.DataFrame]:
+    """
+    Stream the trades of the tradebook files in order of execution time, with bounded memory.
+    Every file is parsed in chunks, each chunk is sorted and spilled to a temporary run, and the runs are
+    merged block by block, so no more than one chunk per parsing process and the merge buffer are held in
+    memory at a time regardless of the number and size of the files.
+    Args:
+        tradebook_files (List[str]): List of paths to the tradebook files
+        chunk_rows (int): Number of rows parsed and sorted at a time
+        buffer_rows (int): Number of rows buffered by the merge
+        max_workers (int): Number of processes parsing the files, 1 parses them in-process
+    Yields:
+        pd.DataFrame: Batches of trades with the columns listed in TRADEBOOK_COLUMNS, in timestamp order
+            across batches. Trades with equal timestamps keep their file order.
+    """
+    with tempfile.TemporaryDirectory(prefix="tradebook_runs_") as directory:
+        file_runs = spill_tradebook_files(tradebook_files, directory, chunk_rows, max_workers)
+        yield from merge_sorted_runs([run_path for run_paths in file_runs for run_path in run_paths], buffer_rows)
+
+def stream_tradebook_files(tradebook_files: List[str], chunk_rows: int = TRADEBOOK_CHUNK_ROWS,
+                           buffer_rows: int = MERGE_BUFFER_ROWS, max_workers: int = None) -> Iterator[Tuple[str, Iterator[pd.DataFrame]]]:
+    """
+    Stream the trades of every tradebook file separately, e.g. to ingest each file as its own source.
+    All files are parsed concurrently up front, then the runs of each file are merged as it is consumed.
+    Args:
+        tradebook_files (List[str]): List of paths to the tradebook files
+        chunk_rows (int): Number of rows parsed and sorted at a time
+        buffer_rows (int): Number of rows buffered by the merge
+        max_workers (int): Number of processes parsing the files, 1 parses them in-process
+    Yields:
+        Tuple[str, Iterator[pd.DataFrame]]: Path of every file with its batches of trades in timestamp order,
+            the batches must be consumed before the next file is requested
+    """
+    if not tradebook_files:
+        return
+    with tempfile.TemporaryDirectory(prefix="tradebook_runs_") as directory:
+        file_runs = spill_tradebook_files(tradebook_files, directory, chunk_rows, max_workers)
+        for file_path, run_paths in zip(tradebook_files, file_runs):
+            yield file_path, merge_sorted_runs(run_paths, buffer_rows)
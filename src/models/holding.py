@@ -1,10 +1,23 @@
-from typing import List, Tuple
+from typing import List, Sequence, Tuple
 import datetime
 from dataclasses import dataclass, field
+import numpy as np
 
 from src.models.trade import Trade
+from src.models.lot import RealizedLot
 from src.models.stock_info import StockInfo
 
+TREND_DTYPE = np.dtype([('date', 'datetime64[D]'), ('value', np.float64)])     # One (date, value) row per trend point
+
+def make_trend(dates: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Build a trend array from its date and value columns. Rows index like the [date, value] pairs
+    of the list based trends, so `trend[-1][1]` is the latest value.
+    """
+    trend = np.empty(len(values), dtype=TREND_DTYPE)
+    trend['date'] = dates
+    trend['value'] = values
+    return trend
 
 @dataclass
 class Holding:
@@ -21,8 +34,13 @@ class Holding:
     running_ltcg: float = 0
     running_stcg: float = 0
 
+    # Closed lots
+    realized_lots: List[RealizedLot] = field(default_factory=list)
+    realized_ltcg: float = 0
+    realized_stcg: float = 0
+
     # Trade history
-    trades: List[Trade] = field(default_factory=list)
+    trades: Sequence[Trade] = field(default_factory=list)     # List of trades or a TradeTable view
     investment_trend: List[Tuple[datetime.date, float]] = field(default_factory=list)
     quantity_trend: List[Tuple[datetime.date, float]] = field(default_factory=list)
     realized_profit_history: List[Tuple[datetime.datetime, float]] = field(default_factory=list)
@@ -33,10 +51,10 @@ class Holding:
     dividend_income: float = 0
 
     # Performance metrics
-    risk_free_return_trend: List[Tuple[datetime.date, float]] = field(default_factory=list)
-    nifty50_return_trend: List[Tuple[datetime.date, float]] = field(default_factory=list)
-    bsesensex_return_trend: List[Tuple[datetime.date, float]] = field(default_factory=list)
-    niftybank_return_trend: List[Tuple[datetime.date, float]] = field(default_factory=list)
+    risk_free_return_trend: np.ndarray = field(default_factory=lambda: make_trend([], []))
+    nifty50_return_trend: np.ndarray = field(default_factory=lambda: make_trend([], []))
+    bsesensex_return_trend: np.ndarray = field(default_factory=lambda: make_trend([], []))
+    niftybank_return_trend: np.ndarray = field(default_factory=lambda: make_trend([], []))
     
     # Stock information
     stock_info: StockInfo = None
\ No newline at end of file
@@ -0,0 +1,37 @@
+import datetime
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, List, Tuple
+
+from src.models.lot import OpenLot, RealizedLot
+
+@dataclass
+class HoldingState:
+    """
+    Result of replaying the trades of a symbol, persisted so that later runs only replay new trades.
+    Everything which depends on market data (current price, index returns, dividends) is left out
+    and recomputed on every run.
+    """
+    symbol: str = ""
+
+    # Replayed trades
+    trade_count: int = 0                        # Number of trades of the symbol replayed so far
+    digest: str = ""                            # Digest of the replayed trades, see TradeTable.digest
+    last_timestamp: datetime.datetime = None    # Execution time of the last replayed trade
+    split_key: str = ""                         # Splits the trades were adjusted for, see get_split_key
+
+    # Position
+    current_position: str = None
+    quantity: float = 0
+    investment: float = 0
+    buy_average: float = 0
+    realized_profit: float = 0
+
+    # Lots
+    open_lots: Deque[OpenLot] = field(default_factory=deque)
+    realized_lots: List[RealizedLot] = field(default_factory=list)
+
+    # Trade history
+    investment_trend: List[Tuple[datetime.date, float]] = field(default_factory=list)
+    quantity_trend: List[Tuple[datetime.date, float]] = field(default_factory=list)
+    realized_profit_history: List[Tuple[datetime.datetime, float]] = field(default_factory=list)
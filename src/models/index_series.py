@@ -0,0 +1,72 @@
+import datetime
+import numpy as np
+import pandas as pd
+from typing import List, Tuple
+
+INDEX_NAMES = ('nifty50', 'bsesensex', 'niftybank')    # Columns of IndexSeries.prices
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+def date_array(dates: List[datetime.date]) -> np.ndarray:
+    """
+    Convert a list of dates into a datetime64[D] array, through their ordinals which is an order of
+    magnitude faster than letting NumPy parse the date objects.
+    """
+    return (np.fromiter((date.toordinal() for date in dates), dtype=np.int64, count=len(dates)) - EPOCH_ORDINAL).astype("datetime64[D]")
+
+class IndexSeries:
+    """
+    Daily closes of the market indices as NumPy arrays, built once per run and shared by every holding.
+
+    Columns:
+        dates (datetime64[D]): Trading days in ascending order
+        prices (float64): One row per trading day and one column per index in INDEX_NAMES
+    """
+    __slots__ = ('dates', 'prices')
+
+    def __init__(self, dates: np.ndarray, prices: np.ndarray):
+        self.dates = dates
+        self.prices = prices
+
+    @classmethod
+    def from_frame(cls, index_data: pd.DataFrame) -> "IndexSeries":
+        """
+        Build an IndexSeries from a DataFrame with the columns date, nifty50, bsesensex, niftybank.
+        Days on which an index has no close carry the previous close of that index forward.
+        """
+        if index_data.empty:
+            return cls(np.array([], dtype="datetime64[D]"), np.empty((0, len(INDEX_NAMES))))
+        index_data = index_data.sort_values('date').drop_duplicates(subset=['date'], keep='last')
+        prices = index_data[list(INDEX_NAMES)].astype(np.float64).ffill().bfill()
+        return cls(
+            dates = pd.to_datetime(index_data['date']).to_numpy(dtype="datetime64[D]"),
+            prices = prices.to_numpy()
+        )
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @property
+    def last_date(self) -> datetime.date:
+        """
+        Latest trading day with index data.
+        """
+        return self.dates[-1].astype(datetime.date)
+
+    def asof_rows(self, dates) -> np.ndarray:
+        """
+        Row of the latest trading day on or before each date.
+        Dates before the first trading day map to the first row, so periods before the index history
+        starts contribute no index return.
+        Args:
+            dates (array-like): Dates to look up as datetime.date or datetime64 values, in any order
+        Returns:
+            np.ndarray: Row index into `dates` and `prices` for every date
+        """
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        return np.maximum(np.searchsorted(self.dates, dates, side="right") - 1, 0)
+
+    def asof(self, date: datetime.date) -> Tuple[float, ...]:
+        """
+        Closes of every index on the latest trading day on or before the date, in INDEX_NAMES order.
+        """
+        return tuple(self.prices[self.asof_rows([date])[0]].tolist())
@@ -0,0 +1,29 @@
+import datetime
+from dataclasses import dataclass
+
+from src.models.trade import Trade
+
+LONG_TERM_HOLDING_PERIOD = datetime.timedelta(days=365)     # Lots held longer than this are long-term
+
+@dataclass
+class OpenLot:
+    trade: Trade        # Trade which opened the lot, never modified
+    quantity: float     # Quantity of the trade which is not matched yet
+
+@dataclass
+class RealizedLot:
+    symbol: str                         # NSE symbol for the stock
+    quantity: float                     # Matched quantity
+    buy_date: datetime.datetime         # Execution time of the buy (or bonus) side
+    sell_date: datetime.datetime        # Execution time of the sell side
+    cost: float                         # Quantity times the buy price
+    proceeds: float                     # Quantity times the sell price
+    holding_period: datetime.timedelta  # Time between opening and closing the lot
+
+    @property
+    def gain(self) -> float:
+        return self.proceeds - self.cost
+
+    @property
+    def is_long_term(self) -> bool:
+        return self.holding_period > LONG_TERM_HOLDING_PERIOD
@@ -0,0 +1,25 @@
+from typing import List
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+
+@dataclass
+class PortfolioValuation:
+    """
+    Daily mark-to-market value of every position, on a dense axis of trading days.
+    Matrices have one row per date and one column per symbol.
+    """
+    dates: np.ndarray           # Trading days as datetime64[D], ascending
+    symbols: List[str]          # Column labels of the matrices
+    quantities: np.ndarray      # Quantity held at the end of every day, in shares after all later splits
+    closes: np.ndarray          # Split-adjusted close of every day, carried forward over days without a bar, NaN before the first bar
+    values: np.ndarray          # Quantity times close, zero where the close is unknown
+    total: np.ndarray           # Value of the whole portfolio on every day
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Values as a DataFrame indexed by date, with one column per symbol and a `total` column.
+        """
+        frame = pd.DataFrame(self.values, index=pd.DatetimeIndex(self.dates, name="date"), columns=self.symbols)
+        frame["total"] = self.total
+        return frame
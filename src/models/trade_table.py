@@ -0,0 +1,338 @@
+import datetime
+import hashlib
+import numpy as np
+import pandas as pd
+from typing import Iterable, Iterator, List, Tuple
+
+from src.models.trade import Trade
+
+TRADE_TYPES = ('buy', 'sell', 'bonus')     # Trade type codes stored in TradeTable.types
+BUY, SELL, BONUS = range(len(TRADE_TYPES))
+
+EPOCH = datetime.datetime(1970, 1, 1)
+ITER_CHUNK_SIZE = 65536
+
+def _to_datetime(timestamp: int) -> datetime.datetime:
+    """
+    Convert an int64 nanosecond timestamp into a naive datetime.
+    """
+    return EPOCH + datetime.timedelta(microseconds=int(timestamp) // 1000)
+
+def _to_quantity(quantity: float):
+    """
+    Quantities are stored as float64 (bonus shares can be fractional), but whole quantities are
+    handed out as int so the Trade views look like the trades read from the tradebook.
+    """
+    return int(quantity) if quantity.is_integer() else quantity
+
+class TradeTable:
+    """
+    Columnar, NumPy backed storage for a tradebook.
+
+    Rows are stored grouped by symbol and sorted by timestamp within each symbol, so the trades of a
+    symbol are a contiguous slice of every column and `for_symbol` returns zero-copy views.
+    Integer indexing and iteration follow the global timestamp order and produce `Trade` objects
+    lazily, so existing callers that expect a List[Trade] keep working.
+
+    Columns:
+        order_ids (object): Order id of every trade
+        symbol_codes (int32): Index of the symbol in `symbol_names`
+        quantities (float64): Traded quantity, always positive
+        prices (float64): Trade price
+        types (int8): Index of the trade type in TRADE_TYPES
+        timestamps (int64): Execution time in nanoseconds since epoch
+        remarks (object): Free text remarks
+    """
+    __slots__ = ('symbol_names', 'order_ids', 'symbol_codes', 'quantities', 'prices', 'types', 'timestamps', 'remarks', '_order', '_offsets')
+
+    def __init__(self, symbol_names: np.ndarray, order_ids: np.ndarray, symbol_codes: np.ndarray, quantities: np.ndarray,
+                 prices: np.ndarray, types: np.ndarray, timestamps: np.ndarray, remarks: np.ndarray):
+        """
+        Wrap columns which are already in storage order (grouped by symbol code, sorted by timestamp).
+        Use `from_columns`, `from_frame` or `from_trades` to build a table from unsorted data.
+        """
+        self.symbol_names = symbol_names
+        self.order_ids = order_ids
+        self.symbol_codes = symbol_codes
+        self.quantities = quantities
+        self.prices = prices
+        self.types = types
+        self.timestamps = timestamps
+        self.remarks = remarks
+        self._order = None
+        self._offsets = None
+
+    @classmethod
+    def from_columns(cls, order_ids: Iterable, symbols: Iterable[str], quantities: Iterable[float], prices: Iterable[float],
+                     types: Iterable[str], timestamps: Iterable, remarks: Iterable[str]) -> "TradeTable":
+        """
+        Build a TradeTable from per-row columns in any order.
+        Trades of the same symbol with equal timestamps keep their relative input order.
+        Args:
+            order_ids (Iterable): Order id of every trade
+            symbols (Iterable[str]): Symbol of every trade
+            quantities (Iterable[float]): Quantity of every trade
+            prices (Iterable[float]): Price of every trade
+            types (Iterable[str]): Trade type of every trade, one of TRADE_TYPES
+            timestamps (Iterable): Execution time of every trade, anything accepted by pd.to_datetime
+            remarks (Iterable[str]): Remarks of every trade
+        Returns:
+            TradeTable: Table containing the given trades
+        """
+        symbols = pd.Categorical(np.asarray(symbols, dtype=object))
+        type_codes = pd.Categorical(np.asarray(types, dtype=object), categories=TRADE_TYPES).codes
+        if (type_codes < 0).any():
+            raise ValueError(f"Unknown trade type, expected one of {TRADE_TYPES}")
+
+        symbol_codes = symbols.codes.astype(np.int32)
+        timestamps = pd.to_datetime(pd.Series(timestamps)).to_numpy(dtype="datetime64[ns]").view(np.int64)
+        storage_order = np.lexsort((timestamps, symbol_codes))
+
+        remarks = pd.Series(remarks, dtype=object).fillna("").to_numpy(dtype=object)
+        return cls(
+            symbol_names = np.asarray(symbols.categories, dtype=object),
+            order_ids = np.asarray(order_ids, dtype=object)[storage_order],
+            symbol_codes = symbol_codes[storage_order],
+            quantities = np.asarray(quantities, dtype=np.float64)[storage_order],
+            prices = np.asarray(prices, dtype=np.float64)[storage_order],
+            types = type_codes.astype(np.int8)[storage_order],
+            timestamps = timestamps[storage_order],
+            remarks = remarks[storage_order]
+        )
+
+    @classmethod
+    def from_frame(cls, trades_df: pd.DataFrame) -> "TradeTable":
+        """
+        Build a TradeTable from a DataFrame with the columns order_id, symbol, quantity, price, typ, timestamp, remarks.
+        """
+        return cls.from_columns(
+            order_ids = trades_df['order_id'].to_numpy(dtype=object),
+            symbols = trades_df['symbol'].to_numpy(dtype=object),
+            quantities = trades_df['quantity'].to_numpy(),
+            prices = trades_df['price'].to_numpy(),
+            types = trades_df['typ'].to_numpy(dtype=object),
+            timestamps = trades_df['timestamp'],
+            remarks = trades_df['remarks'].to_numpy(dtype=object)
+        )
+
+    @classmethod
+    def concat(cls, tables: List["TradeTable"]) -> "TradeTable":
+        """
+        Merge tables which are each in storage order into one table, without sorting the rows again.
+        Stable sorts detect the tables as presorted runs, so grouping by symbol merges one run per table
+        and ordering the trades of a symbol merges its runs by timestamp. Trades of a symbol with equal
+        timestamps keep the order of the tables.
+        """
+        tables = [table for table in tables if len(table)]
+        if not tables:
+            return cls.from_columns([], [], [], [], [], [], [])
+        symbol_names = np.unique(np.concatenate([table.symbol_names for table in tables]))
+        symbol_codes = np.concatenate([
+            np.searchsorted(symbol_names, table.symbol_names).astype(np.int32)[table.symbol_codes] for table in tables
+        ])
+        timestamps = np.concatenate([table.timestamps for table in tables])
+
+        storage_order = np.argsort(symbol_codes, kind="stable")
+        offsets = np.searchsorted(symbol_codes[storage_order], np.arange(len(symbol_names) + 1))
+        for code in range(len(symbol_names)):
+            rows = storage_order[offsets[code]:offsets[code + 1]]
+            storage_order[offsets[code]:offsets[code + 1]] = rows[np.argsort(timestamps[rows], kind="stable")]
+
+        return cls(
+            symbol_names = symbol_names,
+            order_ids = np.concatenate([table.order_ids for table in tables])[storage_order],
+            symbol_codes = symbol_codes[storage_order],
+            quantities = np.concatenate([table.quantities for table in tables])[storage_order],
+            prices = np.concatenate([table.prices for table in tables])[storage_order],
+            types = np.concatenate([table.types for table in tables])[storage_order],
+            timestamps = timestamps[storage_order],
+            remarks = np.concatenate([table.remarks for table in tables])[storage_order]
+        )
+
+    @classmethod
+    def from_trades(cls, trades: List[Trade]) -> "TradeTable":
+        """
+        Build a TradeTable from a list of Trade objects.
+        """
+        return cls.from_columns(
+            order_ids = [trade.order_id for trade in trades],
+            symbols = [trade.symbol for trade in trades],
+            quantities = [trade.quantity for trade in trades],
+            prices = [trade.price for trade in trades],
+            types = [trade.typ for trade in trades],
+            timestamps = [trade.timestamp for trade in trades],
+            remarks = [trade.remarks for trade in trades]
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Convert the table into a DataFrame in timestamp order.
+        """
+        order = self.order
+        return pd.DataFrame({
+            'order_id': self.order_ids[order],
+            'symbol': self.symbol_names[self.symbol_codes[order]],
+            'quantity': self.quantities[order],
+            'price': self.prices[order],
+            'typ': np.asarray(TRADE_TYPES, dtype=object)[self.types[order]],
+            'timestamp': self.timestamps[order].view("datetime64[ns]"),
+            'remarks': self.remarks[order]
+        })
+
+    def save_npz(self, path: str):
+        """
+        Save the table columns into an uncompressed .npz file.
+        Order ids and remarks are stored as fixed width unicode so the file can be loaded without pickle.
+        Args:
+            path (str): Path of the .npz file
+        """
+        with open(path, "wb") as file:
+            np.savez(
+                file,
+                symbol_names = self.symbol_names.astype(str),
+                order_ids = self.order_ids.astype(str),
+                symbol_codes = self.symbol_codes,
+                quantities = self.quantities,
+                prices = self.prices,
+                types = self.types,
+                timestamps = self.timestamps,
+                remarks = self.remarks.astype(str)
+            )
+
+    @classmethod
+    def load_npz(cls, path: str) -> "TradeTable":
+        """
+        Load a table saved with `save_npz`.
+        Args:
+            path (str): Path of the .npz file
+        Returns:
+            TradeTable: Table with the saved columns
+        """
+        with np.load(path) as columns:
+            return cls(
+                symbol_names = columns['symbol_names'].astype(object),
+                order_ids = columns['order_ids'].astype(object),
+                symbol_codes = columns['symbol_codes'],
+                quantities = columns['quantities'],
+                prices = columns['prices'],
+                types = columns['types'],
+                timestamps = columns['timestamps'],
+                remarks = columns['remarks'].astype(object)
+            )
+
+    @property
+    def order(self) -> np.ndarray:
+        """
+        Storage row indices in global timestamp order.
+        """
+        if self._order is None:
+            self._order = np.argsort(self.timestamps, kind="stable")
+        return self._order
+
+    @property
+    def offsets(self) -> np.ndarray:
+        """
+        Start offset of every symbol code in storage order, followed by the number of rows.
+        The trades of symbol code `c` are rows offsets[c]:offsets[c + 1].
+        """
+        if self._offsets is None:
+            self._offsets = np.searchsorted(self.symbol_codes, np.arange(len(self.symbol_names) + 1))
+        return self._offsets
+
+    def symbols(self) -> List[str]:
+        """
+        Symbols which have at least one trade in the table.
+        """
+        return self.symbol_names[np.diff(self.offsets) > 0].tolist()
+
+    def _slice(self, start: int, end: int) -> "TradeTable":
+        view = TradeTable(
+            symbol_names = self.symbol_names,
+            order_ids = self.order_ids[start:end],
+            symbol_codes = self.symbol_codes[start:end],
+            quantities = self.quantities[start:end],
+            prices = self.prices[start:end],
+            types = self.types[start:end],
+            timestamps = self.timestamps[start:end],
+            remarks = self.remarks[start:end]
+        )
+        view._order = np.arange(end - start)    # A single symbol slice is already in timestamp order
+        return view
+
+    def for_symbol(self, symbol: str) -> "TradeTable":
+        """
+        Zero-copy view of the trades of a single symbol, in timestamp order.
+        Args:
+            symbol (str): NSE symbol of the stock
+        Returns:
+            TradeTable: View over the trades of the symbol, empty if the symbol has no trades
+        """
+        code = np.searchsorted(self.symbol_names, symbol)
+        if code == len(self.symbol_names) or self.symbol_names[code] != symbol:
+            return self._slice(0, 0)
+        return self._slice(self.offsets[code], self.offsets[code + 1])
+
+    def tail(self, start: int) -> "TradeTable":
+        """
+        Zero-copy view of the rows from `start` on in storage order. For a single symbol view these are
+        the trades after the first `start` trades.
+        """
+        return self._slice(start, len(self))
+
+    def groups(self) -> Iterator[Tuple[str, "TradeTable"]]:
+        """
+        Iterate over (symbol, view) pairs for every symbol with trades.
+        """
+        offsets = self.offsets
+        for code, symbol in enumerate(self.symbol_names):
+            if offsets[code + 1] > offsets[code]:
+                yield symbol, self._slice(offsets[code], offsets[code + 1])
+
+    def digest(self, end: int = None) -> str:
+        """
+        SHA-256 digest of the first `end` rows in storage order (all rows if not given). Used to detect
+        whether trades which were already processed have changed since.
+        """
+        end = len(self) if end is None else end
+        digest = hashlib.sha256()
+        digest.update(self.order_ids[:end].astype(str).tobytes())
+        digest.update(self.symbol_names[self.symbol_codes[:end]].astype(str).tobytes())
+        for column in (self.quantities, self.prices, self.types, self.timestamps):
+            digest.update(np.ascontiguousarray(column[:end]).tobytes())
+        return digest.hexdigest()
+
+    def _row(self, index: int) -> Trade:
+        return Trade(
+            order_id = self.order_ids[index],
+            symbol = self.symbol_names[self.symbol_codes[index]],
+            quantity = _to_quantity(self.quantities[index]),
+            price = float(self.prices[index]),
+            typ = TRADE_TYPES[self.types[index]],
+            timestamp = _to_datetime(self.timestamps[index]),
+            remarks = self.remarks[index]
+        )
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def __getitem__(self, position: int) -> Trade:
+        return self._row(self.order[position])
+
+    def __iter__(self) -> Iterator[Trade]:
+        order = self.order
+        for start in range(0, len(order), ITER_CHUNK_SIZE):
+            rows = order[start:start + ITER_CHUNK_SIZE]
+            timestamps = self.timestamps[rows].astype("datetime64[ns]").astype("datetime64[us]").astype(object)
+            for order_id, code, quantity, price, typ, timestamp, remarks in zip(
+                self.order_ids[rows], self.symbol_codes[rows].tolist(), self.quantities[rows].tolist(),
+                self.prices[rows].tolist(), self.types[rows].tolist(), timestamps, self.remarks[rows]
+            ):
+                yield Trade(
+                    order_id = order_id,
+                    symbol = self.symbol_names[code],
+                    quantity = _to_quantity(quantity),
+                    price = price,
+                    typ = TRADE_TYPES[typ],
+                    timestamp = timestamp,
+                    remarks = remarks
+                )
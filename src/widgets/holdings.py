@@ -5,7 +5,6 @@ from PyQt5.QtGui import QColor, QBrush, QFont, QPainter
 
 from src.models.holding import Holding
 from src.widgets.price_bar import PriceBarWidget  # Import the PriceBarWidget
-from src.widgets.profit_bar_chart import ProfitBarChart  # Import the ProfitBarChart widget
 
 class ProfitLossDelegate(QStyledItemDelegate):
     """
@@ -31,8 +30,9 @@ class HoldingsWidget(QWidget):
         # Initialize stock_info_widgets dictionary
         self.stock_info_widgets = {}
 
-        # Initialize the ProfitBarChart widget
-        self.profit_bar_chart = ProfitBarChart([])
+        # The ProfitBarChart widget is created when the first holding is shown, since QtChart is slow to import
+        self.profit_bar_chart = None
+        self.profit_bar_chart_layout = QVBoxLayout()
 
         # Main layout with QSplitter for adjustable widths
         main_layout = QVBoxLayout(self)
@@ -238,7 +238,7 @@ class HoldingsWidget(QWidget):
         tab1_widget = QWidget()
         tab1_layout = QVBoxLayout(tab1_widget)
         tab1_layout.addLayout(self.symbol_and_profit_layout)
-        tab1_layout.addWidget(self.profit_bar_chart)  # Use the initialized widget
+        tab1_layout.addLayout(self.profit_bar_chart_layout, stretch=1)
         self.details_tabs.addTab(tab1_widget, "Overview")
 
         # Tab 2: StockInfo details
@@ -630,7 +630,7 @@ class HoldingsWidget(QWidget):
             trade_prices = holding.trades
         )
 
-        self.profit_bar_chart.update_data(holding.realized_profit_history)
+        self._get_profit_bar_chart().update_data(holding.realized_profit_history)
 
         # Update Tab 2 with StockInfo details
         stock_info = holding.stock_info
@@ -641,6 +641,16 @@ class HoldingsWidget(QWidget):
         # Update Tab 3 with Running Info details
         self._update_running_info_tab(holding)
 
+    def _get_profit_bar_chart(self):
+        """
+        Get the ProfitBarChart widget, creating it on first use.
+        """
+        if self.profit_bar_chart is None:
+            from src.widgets.profit_bar_chart import ProfitBarChart
+            self.profit_bar_chart = ProfitBarChart([])
+            self.profit_bar_chart_layout.addWidget(self.profit_bar_chart)
+        return self.profit_bar_chart
+
     def _add_stock_info_row(self, layout, attr):
         """
         Helper method to add a row for a StockInfo attribute.
@@ -0,0 +1,75 @@
+"""
+Tests of the local price history: a split which lands between two refreshes must not leave the bars
+stored before it on the old split basis.
+Run from the repository root:
+    python -m pytest tests
+"""
+import sys
+import json
+import datetime
+import pytest
+
+from src.database import create_tables
+from src.database.connection import close_connections
+from src.lib import market_data
+from src.lib.market_data import FixtureProvider
+from src.lib.generate_holdings import get_split_key
+from src.lib.get_stock_info import get_closes_store
+from src.lib.generate_valuation import generate_portfolio_valuation
+from src.models.holding import Holding
+from tests.test_split_adjustment import make_stock_info
+
+pytestmark = pytest.mark.skipif(sys.version_info < (3, 12), reason="the database layer needs sqlite3 autocommit (Python 3.12)")
+
+START = datetime.date(2020, 1, 1)
+SPLIT_DATE = datetime.date(2020, 1, 11)
+
+def write_fixture(directory, closes):
+    """
+    Write the history of ABC.NS with the given closes on consecutive days from START.
+    """
+    dates = [(START + datetime.timedelta(days=day)).strftime("%Y-%m-%d") for day in range(len(closes))]
+    history = {"Date": dates, "Open": closes, "High": closes, "Low": closes, "Close": closes, "Volume": [0] * len(closes)}
+    (directory / "ABC.NS.json").write_text(json.dumps({"history": history}))
+
+@pytest.fixture
+def fixtures(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "metadata").mkdir()
+    (tmp_path / "fixtures").mkdir()
+    monkeypatch.setattr(market_data, "_provider", FixtureProvider(str(tmp_path / "fixtures")))
+    create_tables()
+    yield tmp_path / "fixtures"
+    close_connections()
+
+def test_split_between_refreshes_rebases_the_stored_bars(fixtures):
+    write_fixture(fixtures, [100.0] * 10)
+    unsplit_key = get_split_key(make_stock_info("ABC", []))
+    dates, closes = get_closes_store({"ABC": "ABC.NS"}, START, {"ABC": unsplit_key})["ABC"]
+    assert len(dates) == 10 and (closes == 100).all()
+
+    # The provider now has five more days and adjusts the whole history for a 2:1 split
+    write_fixture(fixtures, [50.0] * 15)
+    split_key = get_split_key(make_stock_info("ABC", [(SPLIT_DATE, 2.0)]))
+    dates, closes = get_closes_store({"ABC": "ABC.NS"}, START, {"ABC": split_key})["ABC"]
+    assert len(dates) == 15 and (closes == 50).all()
+
+def test_unchanged_splits_only_append(fixtures):
+    write_fixture(fixtures, [100.0] * 10)
+    get_closes_store({"ABC": "ABC.NS"}, START)
+    # A fresh history with the same splits is read from the database, the provider is not asked again
+    write_fixture(fixtures, [70.0] * 15)
+    dates, closes = get_closes_store({"ABC": "ABC.NS"}, START)["ABC"]
+    assert len(dates) == 10 and (closes == 100).all()
+
+def test_valuation_is_continuous_across_a_split_between_refreshes(fixtures):
+    write_fixture(fixtures, [100.0] * 10)
+    holding = Holding(symbol="ABC", stock_info=make_stock_info("ABC", []), quantity_trend=[[START, 10]])
+    assert (generate_portfolio_valuation([holding]).total == 1000).all()
+
+    # The split doubles the shares held and the provider halves every close before it
+    write_fixture(fixtures, [50.0] * 15)
+    holding = Holding(symbol="ABC", stock_info=make_stock_info("ABC", [(SPLIT_DATE, 2.0)]),
+                      quantity_trend=[[START, 10], [SPLIT_DATE, 20]])
+    valuation = generate_portfolio_valuation([holding])
+    assert len(valuation.dates) == 15 and (valuation.total == 1000).all()
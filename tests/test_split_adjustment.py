@@ -0,0 +1,141 @@
+"""
+Property test of the vectorized split adjustment: on randomized books and splits (seeded, so failures
+reproduce) generate_adjusted_tradebook must issue the same bonus shares as the loop it replaced.
+Run from the repository root:
+    python -m pytest tests
+"""
+import datetime
+import dataclasses
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.models.trade import Trade
+from src.models.trade_table import TradeTable
+from src.models.stock_info import StockInfo, StockSplit
+from src.lib.get_tradebook import generate_adjusted_tradebook
+
+SPLIT_RATIOS = [1.5, 2.0, 3.0, 5.0, 10.0]
+FIRST_DAY = datetime.date(2020, 1, 1)
+
+def legacy_adjusted_tradebook(tradebook, stock_info_store):
+    """
+    The previous adjustment: append a marker trade for every split, re-sort the whole book and walk it.
+    """
+    tradebook_copy = list(tradebook)
+    for stock in stock_info_store.values():
+        for split in stock.stock_splits:
+            tradebook_copy.append(Trade(order_id="", symbol=stock.symbol, quantity=0, price=split.ratio, typ='bonus',
+                                        timestamp=datetime.datetime.combine(split.split_date, datetime.time(0, 0, 0))))
+    tradebook_copy.sort(key=lambda trade: trade.timestamp)
+
+    adjusted_tradebook = []
+    holdings = defaultdict(int)
+    for trade in tradebook_copy:
+        if trade.typ == 'buy':
+            holdings[trade.symbol] += trade.quantity
+            adjusted_tradebook.append(trade)
+        elif trade.typ == 'sell':
+            holdings[trade.symbol] -= trade.quantity
+            adjusted_tradebook.append(trade)
+        elif trade.typ == 'bonus' and holdings[trade.symbol] > 0:
+            bonus_quantity = holdings[trade.symbol] * (trade.price - 1)
+            holdings[trade.symbol] += bonus_quantity
+            adjusted_tradebook.append(Trade(order_id="", symbol=trade.symbol, quantity=bonus_quantity, price=0, typ='bonus',
+                                            timestamp=trade.timestamp, remarks="bonus shares"))
+    return adjusted_tradebook
+
+def make_stock_info(symbol: str, splits) -> StockInfo:
+    fields = {field.name: 0 for field in dataclasses.fields(StockInfo) if field.name not in ('stock_splits', 'dividends')}
+    fields.update(symbol=symbol, symbol_yf=f"{symbol}.NS", name=symbol, city="", industry="", sector="")
+    return StockInfo(**fields, stock_splits=[StockSplit(split_date, ratio) for split_date, ratio in splits], dividends=[])
+
+def make_tradebook(rows) -> TradeTable:
+    """
+    Build a TradeTable from (symbol, typ, quantity, timestamp) rows.
+    """
+    return TradeTable.from_frame(pd.DataFrame({
+        'order_id': [str(ind) for ind in range(len(rows))],
+        'symbol': [row[0] for row in rows],
+        'quantity': np.array([row[2] for row in rows], dtype=np.float64),
+        'price': np.full(len(rows), 100.0),
+        'typ': [row[1] for row in rows],
+        'timestamp': pd.to_datetime([row[3] for row in rows]),
+        'remarks': [""] * len(rows)
+    }))
+
+def random_book(seed: int):
+    """
+    Random trades and splits over a few symbols. Trades fall on few days, about half of them at midnight,
+    so many share the timestamp of a split. Sells may take the position flat or short.
+    """
+    rng = np.random.default_rng(seed)
+    symbols = [f"SYM{ind}" for ind in range(rng.integers(1, 4))]
+    rows = []
+    for _ in range(rng.integers(0, 40)):
+        day = FIRST_DAY + datetime.timedelta(days=int(rng.integers(0, 30)))
+        time = datetime.time(0, 0) if rng.random() < 0.5 else datetime.time(int(rng.integers(9, 16)), int(rng.integers(0, 60)))
+        rows.append((str(rng.choice(symbols)), str(rng.choice(['buy', 'sell'], p=[0.6, 0.4])), int(rng.integers(1, 50)),
+                     datetime.datetime.combine(day, time)))
+    stock_info_store = {}
+    for symbol in symbols:
+        split_days = rng.choice(30, size=rng.integers(0, 4), replace=False)
+        splits = [(FIRST_DAY + datetime.timedelta(days=int(day)), float(rng.choice(SPLIT_RATIOS))) for day in split_days]
+        stock_info_store[symbol] = make_stock_info(symbol, splits)
+    return rows, stock_info_store
+
+def assert_same_adjustment(rows, stock_info_store, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "metadata").mkdir(exist_ok=True)
+    source_file = tmp_path / "tradebook.csv"
+    source_file.write_text(repr(rows))     # Only part of the cache key
+
+    tradebook = make_tradebook(rows)
+    adjusted_tradebook = generate_adjusted_tradebook(tradebook, stock_info_store, [str(source_file)])
+    expected = legacy_adjusted_tradebook(tradebook, stock_info_store)
+    for symbol in stock_info_store:
+        actual_trades = [(trade.typ, trade.timestamp, trade.price) for trade in adjusted_tradebook.for_symbol(symbol)]
+        expected_trades = [(trade.typ, trade.timestamp, trade.price) for trade in expected if trade.symbol == symbol]
+        assert actual_trades == expected_trades
+        actual_quantities = [trade.quantity for trade in adjusted_tradebook.for_symbol(symbol)]
+        expected_quantities = [trade.quantity for trade in expected if trade.symbol == symbol]
+        assert actual_quantities == pytest.approx(expected_quantities)
+
+@pytest.mark.parametrize("seed", range(200))
+def test_random_books_match_legacy_loop(seed, tmp_path, monkeypatch):
+    assert_same_adjustment(*random_book(seed), tmp_path, monkeypatch)
+
+def test_split_while_flat_issues_no_bonus(tmp_path, monkeypatch):
+    rows = [
+        ("ABC", "buy", 10, datetime.datetime(2020, 1, 1, 10)),
+        ("ABC", "sell", 10, datetime.datetime(2020, 1, 2, 10)),
+        ("ABC", "buy", 5, datetime.datetime(2020, 1, 5, 10)),
+    ]
+    stock_info_store = {"ABC": make_stock_info("ABC", [(datetime.date(2020, 1, 3), 2.0)])}
+    assert_same_adjustment(rows, stock_info_store, tmp_path, monkeypatch)
+    adjusted_tradebook = generate_adjusted_tradebook(make_tradebook(rows), stock_info_store, [str(tmp_path / "tradebook.csv")])
+    assert [trade.typ for trade in adjusted_tradebook] == ["buy", "sell", "buy"]
+
+def test_trades_at_split_timestamp_count_towards_the_split(tmp_path, monkeypatch):
+    rows = [
+        ("ABC", "buy", 10, datetime.datetime(2020, 1, 1, 10)),
+        ("ABC", "buy", 4, datetime.datetime(2020, 1, 3, 0)),
+        ("ABC", "sell", 2, datetime.datetime(2020, 1, 3, 0)),
+    ]
+    stock_info_store = {"ABC": make_stock_info("ABC", [(datetime.date(2020, 1, 3), 2.0)])}
+    assert_same_adjustment(rows, stock_info_store, tmp_path, monkeypatch)
+    adjusted_tradebook = generate_adjusted_tradebook(make_tradebook(rows), stock_info_store, [str(tmp_path / "tradebook.csv")])
+    assert [(trade.typ, trade.quantity) for trade in adjusted_tradebook][-1] == ("bonus", 12)
+
+def test_compounding_splits(tmp_path, monkeypatch):
+    rows = [
+        ("ABC", "buy", 10, datetime.datetime(2020, 1, 1, 10)),
+        ("ABC", "sell", 5, datetime.datetime(2020, 1, 4, 10)),
+    ]
+    stock_info_store = {"ABC": make_stock_info("ABC", [(datetime.date(2020, 1, 2), 2.0), (datetime.date(2020, 1, 3), 5.0),
+                                                       (datetime.date(2020, 1, 5), 1.5)])}
+    assert_same_adjustment(rows, stock_info_store, tmp_path, monkeypatch)
+    adjusted_tradebook = generate_adjusted_tradebook(make_tradebook(rows), stock_info_store, [str(tmp_path / "tradebook.csv")])
+    # 10 shares become 20, then 100, 5 are sold and the last split adds half of the remaining 95
+    assert [trade.quantity for trade in adjusted_tradebook if trade.typ == "bonus"] == [10, 80, 47.5]